@@ -0,0 +1,82 @@
+"""Throughput of the backtest runner for a growing number of worker processes
+
+A synthetic history of trading days, each one a trade log with trades for the sample
+stocks, is written to a temporary directory and replayed by
+super_simple_stocks_backtest.backtest with each of the given numbers of processes.
+
+Usage::
+
+    $ python -m benchmarks.backtest --days 20 --trades 200000 --processes 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (BuySellIndicator,
+                                 TradeLogWriter,
+                                 sample_stocks,
+                                 to_epoch_ns)
+from super_simple_stocks_backtest import backtest
+
+
+def write_history(directory: str,
+                  days: int,
+                  n: int,
+                  seed: int=0):
+    """Writes a trade log with n random trades for each of a number of trading days.
+    :param directory: The directory to write the logs to
+    :param days: The number of days
+    :param n: The number of trades per day, spread over eight hours
+    :param seed: The seed of the random values
+    """
+    rng = random.Random(seed)
+    ticker_symbols = [stock.ticker_symbol for stock in sample_stocks()]
+    sides = [indicator.value for indicator in BuySellIndicator]
+    step = 8 * 3600 * 10**9 // n
+    for day in range(days):
+        start = datetime(1929, 10, 1, 9, 30) + timedelta(days=day)
+        writer = TradeLogWriter(os.path.join(directory,
+                                             start.strftime('%Y-%m-%d') + '.log'))
+        start = to_epoch_ns(start)
+        writer.write([rng.choice(ticker_symbols) for _ in range(n)],
+                     [start + i * step for i in range(n)],
+                     [rng.randint(1, 1000) for _ in range(n)],
+                     [rng.uniform(50.0, 150.0) for _ in range(n)],
+                     [rng.choice(sides) for _ in range(n)])
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', type=int, default=20)
+    parser.add_argument('--trades', type=int, default=200000, help='trades per day')
+    parser.add_argument('--interval', type=float, default=60.0,
+                        help='seconds between samples')
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_history(directory, args.days, args.trades)
+
+        baseline = None
+        for processes in args.processes:
+            start = time.perf_counter()
+            samples = sum(1 for _ in backtest(directory,
+                                              sample_stocks(),
+                                              timedelta(seconds=args.interval),
+                                              processes))
+            seconds = time.perf_counter() - start
+            baseline = baseline or seconds
+            print('{name:<14} {trades:>12.0f} trades/s {samples:>8} samples '
+                  '{speedup:>6.2f}x'.format(name='processes={}'.format(processes),
+                                            trades=args.days * args.trades / seconds,
+                                            samples=samples,
+                                            speedup=baseline / seconds))
+
+
+if __name__ == '__main__':
+    main()
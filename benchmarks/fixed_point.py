@@ -0,0 +1,110 @@
+"""Speed and accuracy of float prices against fixed-point prices
+
+The same synthetic history is recorded into a float stock and into a fixed-point stock,
+see Stock.price_scale, and Stock.price is queried along it. Besides the throughput of
+both, the largest relative error of each against exact rational arithmetic is reported.
+The trades are chosen so that the window sums grow large, which is where floats drift.
+
+Usage::
+
+    $ python -m benchmarks.fixed_point --trades 1000000
+"""
+
+import argparse
+import bisect
+import random
+import time
+from datetime import datetime, timedelta
+from fractions import Fraction
+from itertools import accumulate
+
+from super_simple_stocks import (TickerSymbol,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 Trade)
+
+
+PRICE_SCALE = 10000
+
+
+class FixedPointCommonStock(CommonStock):
+    price_scale = PRICE_SCALE
+
+
+def generate_trades(n: int,
+                    seed: int=0) -> [Trade]:
+    """
+    :return: n random trades, one every millisecond, with prices of four decimals
+    """
+    rng = random.Random(seed)
+    start = datetime(1929, 10, 24, 9, 30)
+    indicators = list(BuySellIndicator)
+    return [Trade(TickerSymbol.TEA,
+                  start + timedelta(milliseconds=i),
+                  rng.randint(1, 10**6),
+                  rng.randint(1, 10**7) / PRICE_SCALE,
+                  rng.choice(indicators))
+            for i in range(n)]
+
+
+def run(stock, trades: [Trade], times: [datetime]) -> (float, float, list):
+    """
+    :return: The number of trades per second recorded, the number of prices per second
+        obtained, and the prices.
+    """
+    start = time.perf_counter()
+    for trade in trades:
+        stock.record_trade(trade)
+    record_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    prices = [stock.price(current_time) for current_time in times]
+    price_seconds = time.perf_counter() - start
+
+    return len(trades) / record_seconds, len(times) / price_seconds, prices
+
+
+def exact_prices(trades: [Trade], times: [datetime], interval: timedelta) -> [Fraction]:
+    """
+    :return: The prices for times computed with integer arithmetic, taking the prices per
+        share as the decimals they were generated from
+    """
+    timestamps = [trade.timestamp for trade in trades]
+    total_ticks = list(accumulate(trade.total_price_ticks(PRICE_SCALE)
+                                  for trade in reversed(trades)))
+    quantities = list(accumulate(trade.quantity for trade in reversed(trades)))
+    prices = []
+    for current_time in times:
+        suffix = len(trades) - 1 - bisect.bisect_left(timestamps, current_time - interval)
+        prices.append(Fraction(total_ticks[suffix], quantities[suffix] * PRICE_SCALE))
+    return prices
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=1000,
+                        help='number of prices checked against exact arithmetic')
+    args = parser.parse_args()
+
+    trades = generate_trades(args.trades)
+    step = max(1, len(trades) // args.queries)
+    times = [trade.timestamp for trade in trades[step - 1::step]]
+
+    interval = CommonStock.price_time_interval
+    exact = exact_prices(trades, times, interval)
+
+    for name, stock in (('float', CommonStock(TickerSymbol.TEA, 100.0, 8.0)),
+                        ('fixed-point', FixedPointCommonStock(TickerSymbol.TEA, 100.0, 8.0))):
+        record_rate, price_rate, prices = run(stock, trades, times)
+        error = max(abs(Fraction(price) - exact_price) / exact_price
+                    for price, exact_price in zip(prices, exact))
+        print('{name:<12} {record:>10.0f} trades/s {price:>10.0f} prices/s '
+              'max relative error {error:.3e}'.format(name=name,
+                                                      record=record_rate,
+                                                      price=price_rate,
+                                                      error=float(error)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Ingestion throughput of the sharded exchange for a growing number of shards
+
+A synthetic history of trades for all the ticker symbols is ingested in batches, first
+into a single-process GlobalBeverageCorporationExchange and then into a
+ShardedGlobalBeverageCorporationExchange with each of the given numbers of shards. Each
+run ends with an all_share_index call, which waits for every shard to catch up.
+
+The calling process of a sharded exchange validates and packs every trade before any
+shard sees it, so its throughput alone, which is measured first by buffering the whole
+history without sending it, bounds that of every number of shards. Speedups over the
+single process can only be expected while there are spare CPUs for the shards.
+
+By default the five sample stocks are traded. A larger universe of stocks with ticker
+symbols registered at run time may be traded instead.
+
+Usage::
+
+    $ python -m benchmarks.sharding --trades 2000000 --shards 1 2 4 8
+    $ python -m benchmarks.sharding --trades 2000000 --symbols 5000
+"""
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime
+
+from super_simple_stocks import (Stock,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 GlobalBeverageCorporationExchange,
+                                 from_epoch_ns,
+                                 intern_ticker_symbol,
+                                 sample_stocks,
+                                 to_epoch_ns)
+from super_simple_stocks_sharding import ShardedGlobalBeverageCorporationExchange
+
+
+def generate_stocks(symbols: int=None) -> [Stock]:
+    """
+    :param symbols: The number of stocks, None for the sample stocks
+    :return: The stocks to trade
+    """
+    if symbols is None:
+        return sample_stocks()
+    return [CommonStock(intern_ticker_symbol('S{:05d}'.format(i)), 100.0, 8.0)
+            for i in range(symbols)]
+
+
+def generate_columns(n: int,
+                     stocks: [Stock],
+                     seed: int=0) -> tuple:
+    """
+    :param n: The number of trades to generate
+    :param stocks: The stocks to trade
+    :param seed: The seed of the random values
+    :return: The columns of n random trades in chronological order, as taken by ingest
+    """
+    rng = random.Random(seed)
+    start = to_epoch_ns(datetime(1929, 10, 24, 9, 30))
+    ticker_symbols = [stock.ticker_symbol for stock in stocks]
+    indicators = list(BuySellIndicator)
+    return ([rng.choice(ticker_symbols) for _ in range(n)],
+            [start + i * 1000 for i in range(n)],
+            [rng.randint(1, 1000) for _ in range(n)],
+            [rng.uniform(50.0, 150.0) for _ in range(n)],
+            [rng.choice(indicators) for _ in range(n)])
+
+
+def run(exchange, columns: tuple, batch_size: int) -> float:
+    """
+    :return: The number of trades per second ingested by exchange
+    """
+    n = len(columns[0])
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        exchange.ingest(*(column[i:i + batch_size] for column in columns))
+    exchange.all_share_index(from_epoch_ns(columns[1][-1]))
+    return n / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=2000000)
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--symbols', type=int,
+                        help='number of stocks, instead of the sample stocks')
+    args = parser.parse_args()
+
+    columns = generate_columns(args.trades, generate_stocks(args.symbols))
+    print('{cpus} CPUs'.format(cpus=os.cpu_count()))
+
+    baseline = run(GlobalBeverageCorporationExchange(generate_stocks(args.symbols)),
+                   columns,
+                   args.batch_size)
+    print('{name:<16} {throughput:>12.0f} trades/s'.format(name='single process',
+                                                           throughput=baseline))
+
+    with ShardedGlobalBeverageCorporationExchange(generate_stocks(args.symbols),
+                                                  shards=1,
+                                                  batch_size=args.trades + 1) as exchange:
+        start = time.perf_counter()
+        for i in range(0, args.trades, args.batch_size):
+            exchange.ingest(*(column[i:i + args.batch_size] for column in columns))
+        bound = args.trades / (time.perf_counter() - start)
+    print('{name:<16} {throughput:>12.0f} trades/s {speedup:>6.2f}x'.format(
+        name='calling process',
+        throughput=bound,
+        speedup=bound / baseline))
+
+    for shards in args.shards:
+        with ShardedGlobalBeverageCorporationExchange(generate_stocks(args.symbols),
+                                                      shards=shards,
+                                                      batch_size=args.batch_size) as exchange:
+            throughput = run(exchange, columns, args.batch_size)
+            print('{name:<16} {throughput:>12.0f} trades/s {speedup:>6.2f}x'.format(
+                name='shards={shards} ({processes})'.format(shards=shards,
+                                                            processes=exchange.shards),
+                throughput=throughput,
+                speedup=throughput / baseline))
+
+
+if __name__ == '__main__':
+    main()
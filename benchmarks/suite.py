@@ -0,0 +1,295 @@
+"""Timings of the hot paths of super_simple_stocks for growing trade histories
+
+Every benchmark is run for each of the given numbers of trades, on synthetic trades
+generated from a fixed seed, and timed as the best of a number of repetitions. For n
+trades, each benchmark performs n operations, e.g. records n trades or queries n prices
+along a history of n trades. Building the input, e.g. the trades to record or the
+history to query, is not timed.
+
+The results are printed as JSON, so that those of two commits can be compared::
+
+    $ python -m benchmarks.suite --trades 1000 10000 100000 --output before.json
+    $ git checkout other-commit
+    $ python -m benchmarks.suite --trades 1000 10000 100000 --compare before.json
+
+Sizes up to 10000000 trades are supported, at the cost of minutes and gigabytes.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (TickerSymbol,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 Trade,
+                                 TradeRecord,
+                                 GlobalBeverageCorporationExchange,
+                                 sample_stocks,
+                                 to_epoch_ns,
+                                 to_ticks)
+
+
+START = datetime(1929, 10, 24, 9, 30)
+
+
+def generate_trade_values(n: int,
+                          ticker_symbols: [TickerSymbol]=(TickerSymbol.TEA,),
+                          late_fraction: float=0.0,
+                          seed: int=0) -> [tuple]:
+    """
+    :param n: The number of trades to generate
+    :param ticker_symbols: The ticker symbols to spread the trades over
+    :param late_fraction: The fraction of trades that arrive up to an hour late
+    :param seed: The seed of the random values
+    :return: The arguments of n random trades, one every millisecond, in arrival order
+    """
+    rng = random.Random(seed)
+    indicators = list(BuySellIndicator)
+    values = []
+    for i in range(n):
+        timestamp = START + timedelta(milliseconds=i)
+        if rng.random() < late_fraction:
+            timestamp -= timedelta(seconds=rng.uniform(0.0, 3600.0))
+        values.append((rng.choice(ticker_symbols),
+                       timestamp,
+                       rng.randint(1, 1000),
+                       round(rng.uniform(50.0, 150.0), 2),
+                       rng.choice(indicators)))
+    return values
+
+
+def generate_trades(*args, **kwargs) -> [Trade]:
+    """
+    :return: The trades whose arguments are generated by generate_trade_values
+    """
+    return [Trade(*values) for values in generate_trade_values(*args, **kwargs)]
+
+
+def query_times(n: int) -> [datetime]:
+    """
+    :return: n points of time moving forward along a history of n trades
+    """
+    return [START + timedelta(milliseconds=i) for i in range(n)]
+
+
+def recorded_stock(n: int) -> CommonStock:
+    stock = CommonStock(TickerSymbol.TEA, 100.0, 8.0)
+    stock.record_trades(generate_trades(n))
+    return stock
+
+
+def recorded_exchange(n: int) -> GlobalBeverageCorporationExchange:
+    exchange = GlobalBeverageCorporationExchange(sample_stocks())
+    exchange.record_trades(generate_trades(n, ticker_symbols=list(TickerSymbol)))
+    return exchange
+
+
+# Each benchmark takes a number of trades, builds its input and returns the callable
+# to be timed. It is built again for every repetition.
+
+def trade_construction(n: int):
+    values = generate_trade_values(n)
+    return lambda: [Trade(*trade_values) for trade_values in values]
+
+
+def generate_trade_records(n: int, **kwargs) -> [TradeRecord]:
+    """
+    :return: The records, with prices in cents, of the trades whose arguments are
+        generated by generate_trade_values
+    """
+    return [TradeRecord(ticker_symbol.id,
+                        to_epoch_ns(timestamp),
+                        quantity,
+                        to_ticks(price_per_share, 100),
+                        buy_sell_indicator.value)
+            for ticker_symbol, timestamp, quantity, price_per_share, buy_sell_indicator
+            in generate_trade_values(n, **kwargs)]
+
+
+def trade_from_record(n: int):
+    records = generate_trade_records(n)
+    return lambda: [Trade.from_record(record, 100) for record in records]
+
+
+def stock_record_trade(n: int, late_fraction: float=0.0):
+    stock = CommonStock(TickerSymbol.TEA, 100.0, 8.0)
+    trades = generate_trades(n, late_fraction=late_fraction)
+
+    def run():
+        for trade in trades:
+            stock.record_trade(trade)
+    return run
+
+
+def stock_record_trade_out_of_order(n: int):
+    return stock_record_trade(n, late_fraction=0.1)
+
+
+def stock_price(n: int):
+    stock = recorded_stock(n)
+    times = query_times(n)
+
+    def run():
+        for current_time in times:
+            stock.price(current_time)
+    return run
+
+
+def stock_ticker_price(n: int):
+    stock = recorded_stock(n)
+
+    def run():
+        for _ in range(n):
+            stock.ticker_price
+    return run
+
+
+def stock_price_earnings_ratio(n: int):
+    stock = recorded_stock(n)
+
+    def run():
+        for _ in range(n):
+            stock.price_earnings_ratio
+    return run
+
+
+def exchange_record_trade(n: int, late_fraction: float=0.0):
+    exchange = GlobalBeverageCorporationExchange(sample_stocks())
+    trades = generate_trades(n,
+                             ticker_symbols=list(TickerSymbol),
+                             late_fraction=late_fraction)
+
+    def run():
+        for trade in trades:
+            exchange.record_trade(trade)
+    return run
+
+
+def exchange_record_trade_out_of_order(n: int):
+    return exchange_record_trade(n, late_fraction=0.1)
+
+
+def exchange_ingest_records(n: int):
+    exchange = GlobalBeverageCorporationExchange(sample_stocks())
+    records = generate_trade_records(n, ticker_symbols=list(TickerSymbol))
+    return lambda: exchange.ingest_records(records, 100)
+
+
+def exchange_all_share_index(n: int):
+    exchange = recorded_exchange(n)
+    times = query_times(n)
+
+    def run():
+        for current_time in times:
+            exchange.all_share_index(current_time)
+    return run
+
+
+def exchange_all_share_index_with_trades(n: int):
+    exchange = GlobalBeverageCorporationExchange(sample_stocks())
+    trades = generate_trades(n, ticker_symbols=list(TickerSymbol))
+
+    def run():
+        for trade in trades:
+            exchange.record_trade(trade)
+            exchange.all_share_index(trade.timestamp)
+    return run
+
+
+BENCHMARKS = (
+    ('Trade', trade_construction),
+    ('Trade.from_record', trade_from_record),
+    ('Stock.record_trade', stock_record_trade),
+    ('Stock.record_trade out of order', stock_record_trade_out_of_order),
+    ('Stock.price', stock_price),
+    ('Stock.ticker_price', stock_ticker_price),
+    ('Stock.price_earnings_ratio', stock_price_earnings_ratio),
+    ('GBCE.record_trade', exchange_record_trade),
+    ('GBCE.record_trade out of order', exchange_record_trade_out_of_order),
+    ('GBCE.ingest_records', exchange_ingest_records),
+    ('GBCE.all_share_index', exchange_all_share_index),
+    ('GBCE.all_share_index after each trade', exchange_all_share_index_with_trades),
+)
+
+
+def measure(benchmark, n: int, repeat: int) -> float:
+    """
+    :return: The best of repeat timings of benchmark for n trades, in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        run = benchmark(n)
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def commit() -> str:
+    """
+    :return: The commit checked out in the working directory, None if unknown
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              check=True).stdout.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='numbers of trades to run every benchmark for')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--benchmarks', nargs='+',
+                        help='names of the benchmarks to run, all of them by default')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--compare', help='JSON results of a previous run to compare to')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = {(result['benchmark'], result['trades']): result['seconds']
+                        for result in json.load(file)['results']}
+
+    results = []
+    for name, benchmark in BENCHMARKS:
+        if args.benchmarks is not None and name not in args.benchmarks:
+            continue
+        for n in args.trades:
+            seconds = measure(benchmark, n, args.repeat)
+            results.append({'benchmark': name,
+                            'trades': n,
+                            'seconds': seconds,
+                            'operations_per_second': n / seconds})
+            previous = baseline.get((name, n))
+            print('{name:<40} {n:>9} {rate:>12.0f} ops/s{change}'.format(
+                name=name,
+                n=n,
+                rate=n / seconds,
+                change='' if previous is None else ' {:>6.2f}x'.format(previous / seconds)),
+                file=sys.stderr)
+
+    report = {'commit': commit(),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'repeat': args.repeat,
+              'results': results}
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Trades per second built and ingested from raw values, with and without validation
+
+A synthetic history is generated as raw integers: ticker symbol ids, timestamps in
+nanoseconds from the epoch, quantities, prices in ticks and buy/sell indicator values.
+Building trades from them is timed with the checked initializer of Trade, with
+Trade.from_record and as bare TradeRecord tuples. Recording them into an exchange is
+timed with record_trades, ingest and ingest_records, the latter both validating the
+records and trusting them, and again for stocks in fixed-point mode with the price scale
+of the records, whose prices ingest_records stores without conversion.
+
+Usage::
+
+    $ python -m benchmarks.trade_construction --trades 1000000
+"""
+
+import argparse
+import gc
+import random
+import time
+from datetime import datetime
+
+from super_simple_stocks import (BuySellIndicator,
+                                 CommonStock,
+                                 GlobalBeverageCorporationExchange,
+                                 TICKER_SYMBOLS,
+                                 Trade,
+                                 TradeRecord,
+                                 from_epoch_ns,
+                                 sample_stocks,
+                                 to_epoch_ns,
+                                 validate_trade_records)
+
+
+PRICE_SCALE = 100
+
+
+class FixedPointCommonStock(CommonStock):
+    price_scale = PRICE_SCALE
+
+
+def fixed_point_stocks() -> [CommonStock]:
+    """
+    :return: Stocks in fixed-point mode with the ticker symbols of the sample stocks
+    """
+    return [FixedPointCommonStock(stock.ticker_symbol, stock.par_value, stock.dividend)
+            for stock in sample_stocks()]
+
+
+def generate_records(n: int,
+                     seed: int=0) -> [TradeRecord]:
+    """
+    :return: The records of n random trades of the sample stocks, one every millisecond
+    """
+    rng = random.Random(seed)
+    start = to_epoch_ns(datetime(1929, 10, 24, 9, 30))
+    ticker_ids = [stock.ticker_symbol.id for stock in sample_stocks()]
+    sides = [indicator.value for indicator in BuySellIndicator]
+    return [TradeRecord(rng.choice(ticker_ids),
+                        start + i * 10**6,
+                        rng.randint(1, 1000),
+                        rng.randint(5000, 15000),
+                        rng.choice(sides))
+            for i in range(n)]
+
+
+def timed(function) -> float:
+    """
+    :return: The seconds taken by a call to function, with the garbage collector off
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        function()
+        return time.perf_counter() - start
+    finally:
+        gc.enable()
+
+
+def construction(records: [TradeRecord]) -> [(str, float)]:
+    values = [tuple(record) for record in records]
+
+    def checked():
+        return [Trade(TICKER_SYMBOLS[ticker_id],
+                      from_epoch_ns(timestamp),
+                      quantity,
+                      price / PRICE_SCALE,
+                      BuySellIndicator(side))
+                for ticker_id, timestamp, quantity, price, side in values]
+
+    return [('Trade', timed(checked)),
+            ('Trade.from_record', timed(lambda: [Trade.from_record(record, PRICE_SCALE)
+                                                 for record in records])),
+            ('TradeRecord._make', timed(lambda: [TradeRecord._make(value)
+                                                 for value in values])),
+            ('validate_trade_records', timed(lambda: validate_trade_records(records)))]
+
+
+def ingestion(records: [TradeRecord]) -> [(str, float)]:
+    trades = [Trade.from_record(record, PRICE_SCALE) for record in records]
+    columns = ([trade.ticker_symbol for trade in trades],
+               [record.timestamp for record in records],
+               [record.quantity for record in records],
+               [trade.price_per_share for trade in trades],
+               [record.side for record in records])
+
+    def run(stocks, method, *args):
+        exchange = GlobalBeverageCorporationExchange(stocks())
+        return timed(lambda: getattr(exchange, method)(*args))
+
+    results = []
+    for suffix, stocks in (('', sample_stocks), (' fixed-point', fixed_point_stocks)):
+        results += [
+            ('GBCE.record_trades' + suffix, run(stocks, 'record_trades', trades)),
+            ('GBCE.ingest' + suffix, run(stocks, 'ingest', *columns)),
+            ('GBCE.ingest_records' + suffix,
+             run(stocks, 'ingest_records', records, PRICE_SCALE)),
+            ('GBCE.ingest_records validated' + suffix,
+             run(stocks, 'ingest_records', records, PRICE_SCALE, True))]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=1000000)
+    args = parser.parse_args()
+
+    records = generate_records(args.trades)
+    for name, seconds in construction(records) + ingestion(records):
+        print('{name:<44} {rate:>12.0f} trades/s'.format(name=name,
+                                                        rate=args.trades / seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Memory used per trade by the different ways of holding a trade history
+
+Three representations of the same synthetic history are measured with tracemalloc:
+
+- A list of trades with an instance __dict__, as Trade used to be.
+- A list of instances of Trade, which now declares __slots__.
+- A TradeStore, which keeps the trades in parallel arrays of machine values.
+
+Usage::
+
+    $ python -m benchmarks.trade_memory --trades 10000000
+"""
+
+import argparse
+import gc
+import tracemalloc
+from datetime import datetime, timedelta
+
+from super_simple_stocks import TickerSymbol, BuySellIndicator, Trade, TradeStore
+
+
+class DictTrade:
+
+    """A trade that keeps its attributes in an instance __dict__"""
+
+    def __init__(self,
+                 ticker_symbol: TickerSymbol,
+                 timestamp: datetime,
+                 quantity: int,
+                 price_per_share: float,
+                 buy_sell_indicator: BuySellIndicator):
+        self.ticker_symbol = ticker_symbol
+        self.timestamp = timestamp
+        self.quantity = quantity
+        self.price_per_share = price_per_share
+        self.buy_sell_indicator = buy_sell_indicator
+
+
+def generate_trade_values(n: int):
+    """
+    :param n: The number of trades to generate
+    :return: An iterator over the arguments of n distinct trades in chronological order
+    """
+    start = datetime(1929, 10, 24, 9, 30)
+    sides = (BuySellIndicator.BUY, BuySellIndicator.SELL)
+    for i in range(n):
+        yield (TickerSymbol.TEA,
+               start + timedelta(microseconds=i),
+               1 + i % 1000,
+               50.0 + (i % 997) / 100,
+               sides[i % 2])
+
+
+def measure(build, n: int) -> float:
+    """
+    :param build: A callable that builds a history of n trades
+    :param n: The number of trades
+    :return: The number of bytes allocated per trade by the history
+    """
+    gc.collect()
+    tracemalloc.start()
+    history = build(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return size / n
+
+
+def build_dict_trades(n: int) -> list:
+    return [DictTrade(*values) for values in generate_trade_values(n)]
+
+
+def build_slotted_trades(n: int) -> list:
+    return [Trade(*values) for values in generate_trade_values(n)]
+
+
+def build_trade_store(n: int) -> TradeStore:
+    store = TradeStore(TickerSymbol.TEA)
+    for values in generate_trade_values(n):
+        store.add(Trade(*values))
+    return store
+
+
+BUILDERS = (
+    ('list of __dict__ trades', build_dict_trades),
+    ('list of __slots__ trades', build_slotted_trades),
+    ('columnar TradeStore', build_trade_store),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trades', type=int, default=10000000,
+                        help='number of trades in the history')
+    args = parser.parse_args()
+
+    for name, build in BUILDERS:
+        bytes_per_trade = measure(build, args.trades)
+        print('{name:<28} {bytes:>8.1f} bytes/trade'.format(name=name,
+                                                              bytes=bytes_per_trade))
+
+
+if __name__ == '__main__':
+    main()
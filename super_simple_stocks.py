@@ -1,15 +1,33 @@
 import enum
 import abc
+import asyncio
+import bisect
+import heapq
+import math
+import mmap
+import numbers
 import operator
+import os
+import struct
+import threading
 
-from datetime import datetime, timedelta
-from functools import reduce
+from array import array
+from collections import namedtuple
+from collections.abc import Sequence
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, count, repeat, starmap
 
 
 @enum.unique
 class TickerSymbol(enum.Enum):
 
-    """Unique identifier for one of the traded stocks"""
+    """Unique identifier for one of the traded stocks
+
+    .. note:: These are the ticker symbols of the original listings. Any other one is
+        obtained at run time by means of intern_ticker_symbol, which also gives back
+        these members for their names.
+    """
 
     TEA = 1
     POP = 2
@@ -17,6 +35,126 @@ class TickerSymbol(enum.Enum):
     GIN = 4
     JOE = 5
 
+    @property
+    def id(self) -> int:
+        """
+        :return: The dense integer id of this ticker symbol, see TickerSymbolRegistry
+        """
+        return self.value - 1
+
+
+class DynamicTickerSymbol:
+
+    """A ticker symbol registered at run time
+
+    Instances are interned by TickerSymbolRegistry, so that there is only one instance
+    per name and, like members of TickerSymbol, they may be compared by identity.
+    They are not to be built directly, see intern_ticker_symbol.
+    """
+
+    __slots__ = ('name', 'id')
+
+    def __init__(self,
+                 name: str,
+                 id: int):
+        """
+        :param name: The name of the ticker symbol
+        :param id: Its dense integer id
+        """
+        self.name = name
+        self.id = id
+
+    def __repr__(self) -> str:
+        return "<DynamicTickerSymbol.{name}: {id}>".format(name=self.name, id=self.id)
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __reduce__(self):
+        # Unpickling interns the name again, in the registry of the receiving process.
+        return intern_ticker_symbol, (self.name,)
+
+
+class TickerSymbolRegistry:
+
+    """The set of all the ticker symbols, each one with a dense integer id
+
+    Ids are assigned in order of registration, starting from 0 with the members of
+    TickerSymbol, so that they may be used to index arrays, e.g. of stocks. A ticker
+    symbol, and its id, stays registered for the lifetime of the process even if its
+    stock is delisted, so ids are never reused.
+
+    .. note:: Ids are only meaningful within a process. Ticker symbols are to be sent
+        to other processes or stored by name.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ticker_symbols = []
+        self._by_name = {}
+        for ticker_symbol in TickerSymbol:
+            self._register(ticker_symbol)
+
+    def _register(self, ticker_symbol):
+        self._ticker_symbols.append(ticker_symbol)
+        self._by_name[ticker_symbol.name] = ticker_symbol
+
+    def intern(self,
+               name: str):
+        """
+        :param name: The name of a ticker symbol
+        :return: The only ticker symbol with that name, registered first if need be. For
+            the names of the members of TickerSymbol, the member itself.
+        :raise ValueError:
+        """
+        ticker_symbol = self._by_name.get(name)
+        if ticker_symbol is not None:
+            return ticker_symbol
+        elif not isinstance(name, str) or len(name) == 0:
+            msg = "Argument name={name!r} should be a non empty string.".format(name=name)
+            raise ValueError(msg)
+
+        with self._lock:
+            ticker_symbol = self._by_name.get(name)
+            if ticker_symbol is None:
+                ticker_symbol = DynamicTickerSymbol(name, len(self._ticker_symbols))
+                self._register(ticker_symbol)
+            return ticker_symbol
+
+    def get(self,
+            name: str):
+        """
+        :param name: The name of a ticker symbol
+        :return: The ticker symbol with that name, None if it is not registered
+        """
+        return self._by_name.get(name)
+
+    def __getitem__(self, id: int):
+        """
+        :param id: The id of a registered ticker symbol
+        :return: The ticker symbol
+        :raise IndexError:
+        """
+        if id < 0:
+            raise IndexError("Ticker symbol ids are not negative")
+        return self._ticker_symbols[id]
+
+    def __len__(self) -> int:
+        return len(self._ticker_symbols)
+
+
+TICKER_SYMBOLS = TickerSymbolRegistry()
+
+
+def intern_ticker_symbol(name: str):
+    """
+    :param name: The name of a ticker symbol
+    :return: The ticker symbol with that name in TICKER_SYMBOLS, see
+        TickerSymbolRegistry.intern.
+    :raise ValueError:
+    """
+    return TICKER_SYMBOLS.intern(name)
+
 
 @enum.unique
 class BuySellIndicator(enum.Enum):
@@ -27,9 +165,27 @@ class BuySellIndicator(enum.Enum):
     SELL = 2
 
 
+_BUY_SELL_INDICATORS = {indicator.value: indicator for indicator in BuySellIndicator}
+
+# Enum.value is a property, while _value_ is a plain attribute that is read in C.
+_indicator_value = operator.attrgetter('_value_')
+
+
 class Trade:
 
-    """A change of ownership of a collection of shares at a definite price per share"""
+    """A change of ownership of a collection of shares at a definite price per share
+
+    .. note:: Trade declares __slots__, so that its instances do not carry a __dict__.
+    .. note:: Trade.unchecked and Trade.from_record build trades without checking their
+        values, for data that has already been validated in bulk, e.g. by means of
+        validate_trade_records.
+    """
+
+    __slots__ = ('ticker_symbol',
+                 'timestamp',
+                 'quantity',
+                 'price_per_share',
+                 'buy_sell_indicator')
 
     def __init__(self,
                  ticker_symbol: TickerSymbol,
@@ -47,10 +203,10 @@ class Trade:
         self.ticker_symbol = ticker_symbol
         self.timestamp = timestamp
 
-        if quantity > 0:
+        if isinstance(quantity, numbers.Integral) and quantity > 0:
             self.quantity = quantity
         else:
-            msg = "The quantity of shares has to be positive."
+            msg = "The quantity of shares has to be a positive integer."
             raise ValueError(msg)
 
         if price_per_share >= 0.0:
@@ -61,6 +217,62 @@ class Trade:
 
         self.buy_sell_indicator = buy_sell_indicator
 
+    @classmethod
+    def unchecked(cls,
+                  ticker_symbol: TickerSymbol,
+                  timestamp: datetime,
+                  quantity: int,
+                  price_per_share: float,
+                  buy_sell_indicator: BuySellIndicator) -> 'Trade':
+        """
+        :return: A trade with the given values, which are not checked. See Trade.
+        """
+        trade = object.__new__(cls)
+        trade.ticker_symbol = ticker_symbol
+        trade.timestamp = timestamp
+        trade.quantity = quantity
+        trade.price_per_share = price_per_share
+        trade.buy_sell_indicator = buy_sell_indicator
+        return trade
+
+    @classmethod
+    def from_record(cls,
+                    record: 'TradeRecord',
+                    price_scale: int) -> 'Trade':
+        """
+        :param record: The raw values of an already validated trade
+        :param price_scale: The number of ticks in a unit of currency of record.price
+        :return: The trade, built without checking its values
+        """
+        ticker_id, timestamp, quantity, price, side = record
+        trade = object.__new__(cls)
+        trade.ticker_symbol = TICKER_SYMBOLS[ticker_id]
+        trade.timestamp = from_epoch_ns(timestamp)
+        trade.quantity = quantity
+        trade.price_per_share = price / price_scale
+        trade.buy_sell_indicator = _BUY_SELL_INDICATORS[side]
+        return trade
+
+    def _key(self) -> tuple:
+        return (self.ticker_symbol,
+                self.timestamp,
+                self.quantity,
+                self.price_per_share,
+                self.buy_sell_indicator)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Trade):
+            return self._key() == other._key()
+        else:
+            return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        return ("Trade(ticker_symbol={0}, timestamp={1!r}, quantity={2}, "
+                "price_per_share={3}, buy_sell_indicator={4})").format(*self._key())
+
     @property
     def total_price(self) -> float:
         """
@@ -68,193 +280,2741 @@ class Trade:
         """
         return self.quantity * self.price_per_share
 
+    def total_price_ticks(self, price_scale: int) -> int:
+        """
+        :param price_scale: The number of ticks in a unit of currency
+        :return: The exact total price of the trade, in ticks. See to_ticks.
+        """
+        return self.quantity * to_ticks(self.price_per_share, price_scale)
+
 
-class Stock(abc.ABC):
+TradeRecord = namedtuple('TradeRecord',
+                         ('ticker_id', 'timestamp', 'quantity', 'price', 'side'))
+TradeRecord.__doc__ = """The raw values of a trade, as plain integers
 
-    """A publicly traded stock
+The id of its ticker symbol, see TickerSymbolRegistry, its timestamp in nanoseconds from
+the epoch, its quantity, its price per share in ticks of a price scale given alongside,
+see to_ticks, and the value of its buy/sell indicator. Being a tuple of small integers,
+it is cheaper to build and to keep than a Trade, and it is recorded by means of
+GlobalBeverageCorporationExchange.ingest_records.
+"""
 
-    This is an abstract class that includes the common interface that both common
-    and preferred stocks share.
 
-    .. note:: The class variable Stock.price_time_interval serves as a configuration value to
-        define the length of the time interval that is significant to calculate the stock
-        price.
+def to_ticks(price: float,
+             price_scale: int) -> int:
+    """
+    :param price: A price, in units of currency
+    :param price_scale: The number of ticks in a unit of currency, e.g. 10000 for ticks
+        of a hundredth of a cent
+    :return: The price as a whole number of ticks, rounded to the nearest one
     """
+    return round(price * price_scale)
 
-    price_time_interval = timedelta(minutes=15)
 
-    def __init__(self,
-                 ticker_symbol: TickerSymbol,
-                 par_value: float):
+def _average_price(total_price,
+                   quantity: int,
+                   price_scale: int) -> float:
+    """
+    :param total_price: A sum of prices times quantities, in ticks if price_scale is not
+        None
+    :param quantity: The sum of the quantities, which must be positive
+    :param price_scale: The number of ticks in a unit of currency, None for float prices
+    :return: The average price, in units of currency. With ticks, this is a quotient of
+        integers, which is correctly rounded by the true division of Python.
+    """
+    if price_scale is None:
+        return total_price / quantity
+    else:
+        return total_price / (quantity * price_scale)
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE_NS = 60 * 10**9
+
+
+def to_epoch_ns(timestamp: datetime) -> int:
+    """
+    :param timestamp: A point in time. Naive datetimes are taken as they are, aware ones
+        are converted to UTC first.
+    :return: The number of nanoseconds elapsed from the epoch until timestamp
+    """
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = timestamp - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+
+def from_epoch_ns(epoch_ns: int) -> datetime:
+    """
+    :param epoch_ns: A number of nanoseconds elapsed from the epoch
+    :return: The naive datetime that corresponds to it, with microsecond resolution
+    """
+    return _EPOCH + timedelta(microseconds=epoch_ns // 1000)
+
+
+class Clock(abc.ABC):
+
+    """A source of the current time for stocks and exchanges
+
+    Stock.price and GlobalBeverageCorporationExchange.all_share_index read the current
+    time from a clock when none is given to them.
+
+    .. note:: Callables registered by means of Clock.add_observer are called with the new
+        time whenever a clock that moves in steps, i.e. not a WallClock, ticks.
+    """
+
+    def __init__(self):
+        self._observers = []
+
+    @abc.abstractmethod
+    def now(self) -> datetime:
         """
-        :param ticker_symbol: The ticker_symbol that identifies this stock
-        :param par_value: The face value per share for this stock
-        .. note:: This initializer also creates the instance variable self.trades,
-            which is to hold a list of recorded instances of Trade.
+        :return: The current time according to this clock
         """
-        self.ticker_symbol = ticker_symbol
-        self.par_value = par_value
+        pass
 
-        self.trades = []
+    def add_observer(self, observer):
+        """Registers a callable to be called with the new time whenever this clock ticks.
+        :param observer: The callable to register
+        """
+        self._observers.append(observer)
 
-    def record_trade(self, trade: Trade):
-        """Records a trade for this stock.
-        :param trade: The trade to be recorded
-        :raise TypeError:
+    def remove_observer(self, observer):
+        """Unregisters a callable registered by means of add_observer.
+        :param observer: The callable to unregister
         :raise ValueError:
         """
-        if not isinstance(trade, Trade):
-            msg = "Argument trade={trade} should be of type Trade.".format(trade=trade)
-            raise TypeError(msg)
-        elif self.ticker_symbol is not trade.ticker_symbol:
-            msg = "Argument trade={trade} does not belong to this stock.".format(trade=trade)
-            raise ValueError(msg)
-        else:
-            self.trades.append(trade)
+        self._observers.remove(observer)
 
-    @property
-    @abc.abstractmethod
-    def dividend(self) -> float:
+    def _notify_observers(self, current_time: datetime):
+        for observer in self._observers:
+            observer(current_time)
+
+    def watch(self, stock):
+        """Called by an exchange with each stock it lists. Does nothing by default.
+        :param stock: The listed stock
         """
-        :return: A ratio that represents the dividend for this stock
+        pass
+
+    def unwatch(self, stock):
+        """Called by an exchange with each stock it delists. Does nothing by default.
+        :param stock: The delisted stock
         """
         pass
 
-    @property
-    def ticker_price(self) -> float:
+
+class WallClock(Clock):
+
+    """The real time, which never goes backwards
+
+    The time is that of datetime.now, the one trades are usually stamped with, so that it
+    follows adjustments of the system time, e.g. by NTP or daylight saving changes. When
+    the system time is set back, the clock stays at the latest time it returned until
+    the system time catches up, so that the pricing windows are not emptied.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._latest = datetime.min
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        current_time = datetime.now()
+        with self._lock:
+            if current_time > self._latest:
+                self._latest = current_time
+            else:
+                current_time = self._latest
+        return current_time
+
+
+WALL_CLOCK = WallClock()
+
+
+class SimulatedClock(Clock):
+
+    """A clock that only moves when told to, e.g. to replay a trading day
+
+    .. note:: The clock may not be moved backwards, since incremental pricing windows
+        are cheapest when time advances monotonically.
+    """
+
+    def __init__(self,
+                 start: datetime):
         """
-        :return: The price per share for the last recorded trade for this stock
-        :raise AttributeError:
-        .. note:: We don't know if the trades will be registered in chronological order.
-            That is why self.trades is explicitly sorted.
+        :param start: The time at which the clock starts
         """
-        if len(self.trades) > 0:
-            by_timestamp = sorted(self.trades,
-                                  key=lambda trade: trade.timestamp,
-                                  reverse=True)
-            return by_timestamp[0].price_per_share
-        else:
-            msg = "The last ticker price is not yet available."
-            raise AttributeError(msg)
+        super().__init__()
+        self._now = start
+        self._lock = threading.Lock()
 
-    @property
-    def dividend_yield(self) -> float:
-        return self.dividend / self.ticker_price
+    def now(self) -> datetime:
+        return self._now
 
-    @property
-    def price_earnings_ratio(self) -> float:
+    def advance(self,
+                delta: timedelta) -> datetime:
+        """Moves the clock forward.
+        :param delta: The non negative amount of time to move it by
+        :return: The new time
+        :raise ValueError:
         """
-        :return: The P/E ratio for this stock
+        if delta < timedelta(0):
+            msg = "Argument delta={delta} should not be negative.".format(delta=delta)
+            raise ValueError(msg)
+        with self._lock:
+            self._now += delta
+            current_time = self._now
+        self._notify_observers(current_time)
+        return current_time
+
+    def advance_to(self,
+                   current_time: datetime) -> datetime:
+        """Moves the clock forward to a given time.
+        :param current_time: The new time, which may not be earlier than the current one
+        :return: The new time
+        :raise ValueError:
         """
-        if self.dividend != 0:
-            return self.ticker_price / self.dividend
-        else:
-            return None
+        with self._lock:
+            if current_time < self._now:
+                msg = "Argument current_time={current_time} is earlier than {now}.".format(
+                    current_time=current_time, now=self._now)
+                raise ValueError(msg)
+            self._now = current_time
+        self._notify_observers(current_time)
+        return current_time
 
-    def price(self,
-              current_time: datetime=datetime.now()) -> float:
+
+class TradeClock(Clock):
+
+    """The "as-of" time of an exchange: the timestamp of the latest trade it recorded
+
+    An exchange built with a TradeClock watches all of its stocks, so that the clock
+    ticks forward whenever trades later than any recorded before arrive. Prices are
+    then those of the market as of its latest trade, whatever the wall time, which suits
+    trades that are replayed or arrive delayed.
+    """
+
+    def __init__(self,
+                 start: datetime=None):
         """
-        :param current_time: The point of time defined as the current one.
-        :return: The average price per share based on trades recorded in the last
-            Stock.price_time_interval. None if there are 0 trades that satisfy this
-            condition.
-        .. note:: Though lean, the way in which significant_trades obtained may be
-            unnecessarily costly, since it traverses all recorded trades and it may
-            be possible to have them already ordered by trade.timestamp.
-        .. note:: The existence of the current_time parameter avoids the inner user
-            of datetime.now, thus keeping referential transparency and moving state out.
+        :param start: The time of the clock before any trade is recorded. If None, now
+            raises ValueError until then.
         """
-        significant_trades = [trade for trade in self.trades
-                              if trade.timestamp >= current_time - self.price_time_interval]
+        super().__init__()
+        self._now_ns = None if start is None else to_epoch_ns(start)
+        self._lock = threading.Lock()
 
-        if len(significant_trades) > 0:
-            trade_prices = (trade.total_price for trade in significant_trades)
-            quantities = (trade.quantity for trade in significant_trades)
-            return sum(trade_prices) / sum(quantities)
-        else:
-            return None
+    def now(self) -> datetime:
+        """
+        :raise ValueError:
+        """
+        now_ns = self._now_ns
+        if now_ns is None:
+            msg = "No trade has been recorded yet."
+            raise ValueError(msg)
+        return from_epoch_ns(now_ns)
 
+    def watch(self, stock):
+        stock.add_observer(self._observe)
+        self._observe(stock)
 
-class CommonStock(Stock):
+    def unwatch(self, stock):
+        stock.remove_observer(self._observe)
 
-    """A common stock"""
+    def _observe(self, stock):
+        timestamps = stock.trades.timestamps
+        if len(timestamps) == 0:
+            return
+        latest_ns = timestamps[-1]
+        with self._lock:
+            if self._now_ns is not None and latest_ns <= self._now_ns:
+                return
+            self._now_ns = latest_ns
+        self._notify_observers(from_epoch_ns(latest_ns))
+
+
+class TradeStore(Sequence):
+
+    """A columnar collection of the trades of a stock, kept in chronological order
+
+    Instead of holding instances of Trade, the trades are stored in parallel arrays of
+    machine values: timestamps as int64 nanoseconds from the epoch, quantities as int64,
+    prices per share as float64 and buy/sell indicators as int8. Instances of Trade are
+    only built when the store is indexed or iterated.
+
+    In fixed-point mode, that is, when a price scale is given, prices are instead stored
+    as int64 numbers of ticks, see to_ticks, so that sums of total prices computed from
+    the columns are exact integers. They are converted back into floats in the instances
+    of Trade built by the store.
+
+    Trades may be added in any order. Each one is inserted at the position given by its
+    timestamp, so that the trades that took place from a given moment on can be found
+    by bisection instead of traversing the whole history.
+
+    .. note:: The arrays self.timestamps, self.quantities, self.prices and self.sides are
+        exposed so that calculations may run on the columns directly. They are not to be
+        modified from outside.
+    """
 
     def __init__(self,
                  ticker_symbol: TickerSymbol,
-                 par_value: float,
-                 last_dividend: float):
+                 price_scale: int=None):
         """
-        :param last_dividend: An absolute value that indicates the last dividend
-            per share for this stock.
+        :param ticker_symbol: The ticker symbol shared by all the trades in the store
+        :param price_scale: The number of ticks in a unit of currency in which prices are
+            stored, or None to store them as floats.
         """
+        self.ticker_symbol = ticker_symbol
+        self.price_scale = price_scale
 
-        super().__init__(ticker_symbol, par_value)
-        self.last_dividend = last_dividend
+        self.timestamps = array('q')
+        self.quantities = array('q')
+        self.prices = array('d' if price_scale is None else 'q')
+        self.sides = array('b')
 
-    @property
-    def dividend(self):
-        return self.last_dividend
+        self._frozen = None
+        self._unchanged = 0
 
+    def price(self, index: int) -> float:
+        """
+        :param index: The position of a trade
+        :return: Its price per share, in units of currency
+        """
+        if self.price_scale is None:
+            return self.prices[index]
+        else:
+            return self.prices[index] / self.price_scale
 
-class PreferredStock(Stock):
+    def _trade(self, index: int) -> Trade:
+        return Trade(ticker_symbol=self.ticker_symbol,
+                     timestamp=from_epoch_ns(self.timestamps[index]),
+                     quantity=self.quantities[index],
+                     price_per_share=self.price(index),
+                     buy_sell_indicator=BuySellIndicator(self.sides[index]))
 
-    """A preferred stock"""
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._trade(i) for i in range(*index.indices(len(self)))]
+        else:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("TradeStore index out of range")
+            return self._trade(index)
 
-    def __init__(self,
-                 ticker_symbol: TickerSymbol,
-                 par_value: float,
-                 fixed_dividend: float):
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def add(self, trade: Trade) -> int:
+        """Inserts a trade at its chronological position.
+        :param trade: The trade to be added
+        :return: The position at which the trade has been inserted
+        :raise TypeError:
+        :raise OverflowError:
+        .. note:: Trades that share a timestamp are kept in the order in which they are
+            added. Trades arriving in order are simply appended.
+        .. note:: If a value of the trade does not fit in its column, e.g. a quantity
+            that is not an integer in a trade built by Trade.unchecked, the columns are
+            left as they were.
         """
-        :param fixed_dividend: A decimal number that expresses the fixed dividend
-            as a ratio of the face value of each share.
+        timestamp = to_epoch_ns(trade.timestamp)
+        price = trade.price_per_share
+        if self.price_scale is not None:
+            price = to_ticks(price, self.price_scale)
+
+        timestamps = self.timestamps
+        n = len(timestamps)
+        position = n
+        try:
+            if n == 0 or timestamp >= timestamps[-1]:
+                timestamps.append(timestamp)
+                self.quantities.append(trade.quantity)
+                self.prices.append(price)
+                self.sides.append(trade.buy_sell_indicator.value)
+            else:
+                position = bisect.bisect_right(timestamps, timestamp)
+                timestamps.insert(position, timestamp)
+                self.quantities.insert(position, trade.quantity)
+                self.prices.insert(position, price)
+                self.sides.insert(position, trade.buy_sell_indicator.value)
+                self._unchanged = min(self._unchanged, position)
+        except Exception:
+            for column in (timestamps, self.quantities, self.prices, self.sides):
+                if len(column) > n:
+                    del column[position]
+            raise
+
+        return position
+
+    def extend(self,
+               timestamps: [int],
+               quantities: [int],
+               prices: [float],
+               sides: [int],
+               in_ticks: bool=False):
+        """Adds a batch of trades given as columns of machine values.
+        :param timestamps: The timestamps of the trades, in nanoseconds from the epoch
+        :param quantities: The amounts of shares exchanged
+        :param prices: The prices per share, in units of currency
+        :param sides: The values of the buy/sell indicators
+        :param in_ticks: Whether prices are instead given as stored, that is, as numbers
+            of ticks in fixed-point mode
+        :raise TypeError:
+        :raise OverflowError:
+        .. note:: The values are not validated, but they are converted into arrays of
+            the types of the columns before any column is changed, so that a batch with
+            a value that does not fit, e.g. a quantity that is not an integer, is
+            rejected as a whole.
+        .. note:: A batch that starts at or after the last stored trade and is itself in
+            chronological order is appended in one go.
+            Otherwise, only the stored trades from its earliest timestamp on are merged
+            with it. As with add, trades that share a timestamp keep the order in which
+            they are added.
         """
+        if len(timestamps) == 0:
+            return
+        elif self.price_scale is not None and not in_ticks:
+            price_scale = self.price_scale
+            prices = [to_ticks(price, price_scale) for price in prices]
 
-        super().__init__(ticker_symbol, par_value)
-        self.fixed_dividend = fixed_dividend
+        timestamps = array('q', timestamps)
+        quantities = array('q', quantities)
+        prices = array(self.prices.typecode, prices)
+        sides = array('b', sides)
 
-    @property
-    def dividend(self):
-        return self.fixed_dividend * self.par_value
+        ordered = all(map(operator.le, timestamps, timestamps[1:]))
+        if ordered and (len(self) == 0 or timestamps[0] >= self.timestamps[-1]):
+            self.timestamps.extend(timestamps)
+            self.quantities.extend(quantities)
+            self.prices.extend(prices)
+            self.sides.extend(sides)
+            return
 
+        position = bisect.bisect_right(self.timestamps, min(timestamps))
+        self._unchanged = min(self._unchanged, position)
+        stored_rows = zip(self.timestamps[position:],
+                          self.quantities[position:],
+                          self.prices[position:],
+                          self.sides[position:])
+        added_rows = sorted(zip(timestamps, quantities, prices, sides),
+                            key=operator.itemgetter(0))
+        merged_rows = list(heapq.merge(stored_rows, added_rows, key=operator.itemgetter(0)))
 
-class GlobalBeverageCorporationExchange:
+        for column, values in zip((self.timestamps, self.quantities, self.prices, self.sides),
+                                  zip(*merged_rows)):
+            del column[position:]
+            column.extend(values)
 
-    """The whole exchange where the trades take place"""
+    def index_since(self, timestamp: datetime) -> int:
+        """
+        :param timestamp: A point in time
+        :return: The position of the first trade that took place at or after timestamp
+        """
+        return bisect.bisect_left(self.timestamps, to_epoch_ns(timestamp))
 
-    def __init__(self,
-                 stocks: [Stock]):
+    def since(self, timestamp: datetime) -> [Trade]:
         """
-        :param stocks: The stocks traded at this exchange.
-        :raise ValueError:
+        :param timestamp: A point in time
+        :return: The trades that took place at or after timestamp, in chronological order
         """
-        if len(stocks) > 0:
-            self.stocks = stocks
-        else:
-            msg = "Argument stocks={stocks} should be a non empty sequence.".format(stocks=stocks)
-            raise ValueError(msg)
+        return self[self.index_since(timestamp):]
 
-    def record_trade(self,
-                     trade: Trade):
-        """Records a trade for the proper stock.
-        :param trade: The trade to record.
+    def remove_oldest(self, n: int) -> tuple:
+        """Removes the n trades that took place first.
+        :param n: The number of trades to remove
+        :return: The columns of the removed trades: timestamps, quantities, prices and
+            buy/sell indicator values. Prices are given as stored, in ticks in
+            fixed-point mode.
         """
-        stock = next(stock for stock in self.stocks
-                     if stock.ticker_symbol is trade.ticker_symbol)
-        stock.record_trade(trade)
+        columns = (self.timestamps, self.quantities, self.prices, self.sides)
+        removed = tuple(column[:n] for column in columns)
+        self._unchanged = 0
+        for column in columns:
+            del column[:n]
+        return removed
 
-    def all_share_index(self,
-                        current_time: datetime=datetime.now()) -> float:
+    def copy(self) -> 'TradeStore':
         """
-        :param current_time: The point of time for which we want to obtain the index.
-        :return: The geometric mean of all stock prices. Returns None if any of them is
-            None.
+        :return: A new store that holds copies of the columns of this one
         """
-        n = len(self.stocks)
-        stock_prices = [stock.price(current_time) for stock in self.stocks]
+        store = TradeStore(self.ticker_symbol, self.price_scale)
+        store.timestamps = self.timestamps[:]
+        store.quantities = self.quantities[:]
+        store.prices = self.prices[:]
+        store.sides = self.sides[:]
+        return store
 
-        if None in stock_prices:
-            return None
+    def freeze(self) -> 'FrozenTradeStore':
+        """
+        :return: A read-only view of the trades stored at this point in time
+        .. note:: The views of a store share append-only copies of its columns. Freezing
+            copies only the trades appended since the previous view was made, as arrays
+            grow in amortized constant time per element, unless
+            trades have been inserted before them or removed since, in which case the
+            columns are copied anew. Earlier views keep the copies they were made from.
+        """
+        columns = (self.timestamps, self.quantities, self.prices, self.sides)
+        frozen = self._frozen
+        if frozen is None or self._unchanged < len(frozen[0]):
+            frozen = tuple(column[:] for column in columns)
         else:
-            product = reduce(operator.mul, stock_prices, 1)
-            return product**(1/n)
+            start = len(frozen[0])
+            for frozen_column, column in zip(frozen, columns):
+                frozen_column.extend(column[start:])
+
+        self._frozen = frozen
+        self._unchanged = len(self)
+        return FrozenTradeStore(self.ticker_symbol, self.price_scale, frozen, len(self))
+
+
+class FrozenTradeStore(Sequence):
+
+    """A read-only view of the trades of a TradeStore at a given point in time, see
+    TradeStore.freeze
+
+    The view holds the first trades of columns that are only ever appended to, so it may
+    be read from any thread without locking while the store keeps changing.
+
+    .. note:: self.timestamps, self.quantities, self.prices and self.sides are copies of
+        the columns of the view. Use columns_since to read only some of the trades.
+    """
+
+    def __init__(self,
+                 ticker_symbol: TickerSymbol,
+                 price_scale: int,
+                 columns: tuple,
+                 length: int):
+        """
+        :param ticker_symbol: The ticker symbol shared by all the trades in the view
+        :param price_scale: The price scale of the store, see TradeStore
+        :param columns: The shared timestamps, quantities, prices and buy/sell indicator
+            values
+        :param length: The number of trades of the columns that belong to the view
+        """
+        self.ticker_symbol = ticker_symbol
+        self.price_scale = price_scale
+        self._columns = columns
+        self._length = length
+
+    @property
+    def timestamps(self) -> array:
+        return self._columns[0][:self._length]
+
+    @property
+    def quantities(self) -> array:
+        return self._columns[1][:self._length]
+
+    @property
+    def prices(self) -> array:
+        return self._columns[2][:self._length]
+
+    @property
+    def sides(self) -> array:
+        return self._columns[3][:self._length]
+
+    def _trade(self, index: int) -> Trade:
+        timestamps, quantities, prices, sides = self._columns
+        price = prices[index]
+        if self.price_scale is not None:
+            price /= self.price_scale
+        return Trade(ticker_symbol=self.ticker_symbol,
+                     timestamp=from_epoch_ns(timestamps[index]),
+                     quantity=quantities[index],
+                     price_per_share=price,
+                     buy_sell_indicator=BuySellIndicator(sides[index]))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._trade(i) for i in range(*index.indices(len(self)))]
+        else:
+            if index < 0:
+                index += len(self)
+            if not 0 <= index < len(self):
+                raise IndexError("FrozenTradeStore index out of range")
+            return self._trade(index)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def index_since(self, timestamp: datetime) -> int:
+        """
+        :param timestamp: A point in time
+        :return: The position of the first trade that took place at or after timestamp
+        """
+        return bisect.bisect_left(self._columns[0], to_epoch_ns(timestamp), 0, self._length)
+
+    def columns_since(self, index: int) -> tuple:
+        """
+        :param index: The position of a trade
+        :return: The timestamps, quantities, prices and buy/sell indicator values of the
+            trades from that position on
+        """
+        return tuple(column[index:self._length] for column in self._columns)
+
+
+class Bar:
+
+    """The open, high, low and close prices and the volume of the trades in a period
+
+    .. note:: The open and close prices are those of the trades with the earliest and
+        latest timestamps, so trades may be added to a bar in any order. Among trades
+        that share a timestamp, the first one added opens and the last one closes.
+    """
+
+    __slots__ = ('start',
+                 'open',
+                 'high',
+                 'low',
+                 'close',
+                 'volume',
+                 'total_price',
+                 'count',
+                 'open_timestamp',
+                 'close_timestamp')
+
+    def __init__(self,
+                 start: int):
+        """
+        :param start: The beginning of the period, in nanoseconds from the epoch
+        """
+        self.start = start
+        self.open = None
+        self.high = None
+        self.low = None
+        self.close = None
+        self.volume = 0
+        self.total_price = 0.0
+        self.count = 0
+        self.open_timestamp = None
+        self.close_timestamp = None
+
+    def add(self,
+            timestamp: int,
+            quantity: int,
+            price: float):
+        """Adds a trade to the bar.
+        :param timestamp: The timestamp of the trade, in nanoseconds from the epoch
+        :param quantity: The amount of shares exchanged
+        :param price: The price per share
+        """
+        if self.count == 0:
+            self.open = self.high = self.low = self.close = price
+            self.open_timestamp = self.close_timestamp = timestamp
+        else:
+            if timestamp < self.open_timestamp:
+                self.open = price
+                self.open_timestamp = timestamp
+            if timestamp >= self.close_timestamp:
+                self.close = price
+                self.close_timestamp = timestamp
+            if price > self.high:
+                self.high = price
+            if price < self.low:
+                self.low = price
+
+        self.volume += quantity
+        self.total_price += quantity * price
+        self.count += 1
+
+    def merge(self,
+              other: 'Bar'):
+        """Adds all the trades in another bar to this one.
+        :param other: The bar to merge into this one
+        """
+        if other.count == 0:
+            return
+        elif self.count == 0:
+            self.open, self.high, self.low, self.close = (other.open, other.high,
+                                                          other.low, other.close)
+            self.open_timestamp = other.open_timestamp
+            self.close_timestamp = other.close_timestamp
+        else:
+            if other.open_timestamp < self.open_timestamp:
+                self.open = other.open
+                self.open_timestamp = other.open_timestamp
+            if other.close_timestamp >= self.close_timestamp:
+                self.close = other.close
+                self.close_timestamp = other.close_timestamp
+            if other.high > self.high:
+                self.high = other.high
+            if other.low < self.low:
+                self.low = other.low
+
+        self.volume += other.volume
+        self.total_price += other.total_price
+        self.count += other.count
+
+    @property
+    def vwap(self) -> float:
+        """
+        :return: The volume weighted average price of the trades in the bar, None if
+            it is empty.
+        """
+        if self.volume > 0:
+            return self.total_price / self.volume
+        else:
+            return None
+
+    def __repr__(self) -> str:
+        return ("Bar(start={0}, open={1}, high={2}, low={3}, close={4}, "
+                "volume={5})").format(self.start, self.open, self.high, self.low,
+                                      self.close, self.volume)
+
+
+class RetentionPolicy:
+
+    """Configuration of how long a stock keeps its raw trades
+
+    Trades older than the interval used by Stock.price, plus a grace period that makes
+    room for late trades, are removed from Stock.trades, so that they are only kept
+    compacted into the bars of Stock.bars. Unless Stock.bar_resolutions includes a
+    resolution of a minute or longer, minute bars are set up for them on the first
+    compaction. Bars shorter than a minute are removed along with them. The trades may be handed over to a spill callable beforehand, e.g. to
+    keep them in a TradeLogWriter.
+    """
+
+    def __init__(self,
+                 grace_period: timedelta=timedelta(minutes=5),
+                 min_batch: int=1024,
+                 spill=None):
+        """
+        :param grace_period: How long trades are kept beyond the interval used by
+            Stock.price
+        :param min_batch: The number of trades to be removed that triggers a
+            compaction, so that its cost is spread over many recorded trades
+        :param spill: A callable to be called with the ticker symbol and the columns of
+            the removed trades (timestamps in nanoseconds from the epoch, quantities,
+            prices and buy/sell indicator values) before they are compacted, or None
+        """
+        self.grace_period = grace_period
+        self.min_batch = min_batch
+        self.spill = spill
+
+
+SideAnalytics = namedtuple('SideAnalytics',
+                           ('buy_volume', 'sell_volume', 'order_flow_imbalance',
+                            'buy_vwap', 'sell_vwap'))
+SideAnalytics.__doc__ = """The trades in the interval used by Stock.price, split by side
+
+The number of shares bought and sold, the order flow imbalance, that is, the difference
+between them divided by their sum, and the volume weighted average price of each side.
+The imbalance and the prices are None when there are no trades to compute them from.
+"""
+
+
+def _side_analytics(buy_total_price,
+                    buy_quantity: int,
+                    sell_total_price,
+                    sell_quantity: int,
+                    price_scale: int) -> SideAnalytics:
+    quantity = buy_quantity + sell_quantity
+    return SideAnalytics(
+        buy_volume=buy_quantity,
+        sell_volume=sell_quantity,
+        order_flow_imbalance=(buy_quantity - sell_quantity) / quantity if quantity > 0 else None,
+        buy_vwap=(_average_price(buy_total_price, buy_quantity, price_scale)
+                  if buy_quantity > 0 else None),
+        sell_vwap=(_average_price(sell_total_price, sell_quantity, price_scale)
+                   if sell_quantity > 0 else None))
+
+
+def _ticker_price(last_trade: Trade,
+                  price_scale: int) -> float:
+    if last_trade is None:
+        msg = "The last ticker price is not yet available."
+        raise AttributeError(msg)
+    elif price_scale is None:
+        return last_trade.price_per_share
+    else:
+        return to_ticks(last_trade.price_per_share, price_scale) / price_scale
+
+
+def _price_ratio(numerator: float,
+                 denominator: float,
+                 price_scale: int) -> float:
+    """
+    :return: The ratio of two amounts of currency. With a price scale, both are rounded
+        to ticks first, and the ratio is a correctly rounded quotient of integers. None
+        if the denominator rounds to 0 ticks, since the ratio is then undefined at that
+        price scale.
+    """
+    if price_scale is None:
+        return numerator / denominator
+
+    denominator_ticks = to_ticks(denominator, price_scale)
+    if denominator_ticks == 0:
+        return None
+    return to_ticks(numerator, price_scale) / denominator_ticks
+
+
+_BUY = BuySellIndicator.BUY.value
+
+
+class Stock(abc.ABC):
+
+    """A publicly traded stock
+
+    This is an abstract class that includes the common interface that both common
+    and preferred stocks share.
+
+    .. note:: The class variable Stock.price_time_interval serves as a configuration value to
+        define the length of the time interval that is significant to calculate the stock
+        price.
+    .. note:: The class variable Stock.bar_resolutions defines the lengths of the bars
+        kept in Stock.bars, from the longest to the shortest. They are used to answer
+        Stock.bar for arbitrary ranges. It is empty by default, since every resolution
+        adds a pass over each recorded trade, and may be set on a subclass, e.g. to
+        (timedelta(hours=1), timedelta(minutes=1), timedelta(seconds=1)). The bars are
+        set up by Stock.__init__, so setting it on a single stock has no effect.
+    .. note:: The class variable Stock.retention_policy, None by default, may be set to an
+        instance of RetentionPolicy, on a subclass or on a single stock before trades are
+        recorded, so that old trades are only kept compacted into bars.
+    .. note:: The class variable Stock.price_scale, None by default, may be set on a
+        subclass to a number of ticks per unit of currency, e.g. 10000, to switch its
+        instances to fixed-point mode. Prices are then stored as whole numbers of ticks
+        and the running sums behind Stock.price are exact integers, so that they do not
+        drift over millions of trades. Prices are rounded to the nearest tick.
+    .. note:: The class variable Stock.clock, WALL_CLOCK by default, is the Clock that
+        Stock.price reads when no current time is given. A
+        GlobalBeverageCorporationExchange sets it to its own clock on the stocks it
+        lists.
+    """
+
+    price_time_interval = timedelta(minutes=15)
+    bar_resolutions = ()
+    retention_policy = None
+    price_scale = None
+    clock = WALL_CLOCK
+
+    def __init__(self,
+                 ticker_symbol: TickerSymbol,
+                 par_value: float,
+                 thread_safe: bool=False):
+        """
+        :param ticker_symbol: The ticker_symbol that identifies this stock
+        :param par_value: The face value per share for this stock
+        :param thread_safe: Whether trades may be recorded and prices obtained from
+            several threads at the same time. If so, these operations are serialized by
+            a lock. See also Stock.snapshot.
+        .. note:: This initializer also creates the instance variable self.trades,
+            which is to hold the recorded trades in a TradeStore.
+        .. note:: The instance variables prefixed with _window hold running sums over
+            the trades in the last interval used by Stock.price, for each side. They are
+            moved along with current_time instead of being recomputed on every call.
+        """
+        self.ticker_symbol = ticker_symbol
+        self.par_value = par_value
+
+        self.trades = TradeStore(ticker_symbol, self.price_scale)
+        self._last_trade = None
+        self._observers = []
+
+        self._lock = threading.RLock() if thread_safe else nullcontext()
+        self._version = 0
+        self._snapshot = None
+
+        self.bars = {resolution: {} for resolution in self.bar_resolutions}
+        self._bar_levels = [(resolution // timedelta(microseconds=1) * 1000,
+                             self.bars[resolution])
+                            for resolution in self.bar_resolutions]
+        self._compacted_until = None
+
+        self._window_start = None
+        self._window_index = 0
+        self._window_buy_total_price = 0
+        self._window_buy_quantity = 0
+        self._window_sell_total_price = 0
+        self._window_sell_quantity = 0
+        self._window_updates = 0
+
+    def record_trade(self, trade: Trade):
+        """Records a trade for this stock.
+        :param trade: The trade to be recorded
+        :raise TypeError:
+        :raise ValueError:
+        """
+        if not isinstance(trade, Trade):
+            msg = "Argument trade={trade} should be of type Trade.".format(trade=trade)
+            raise TypeError(msg)
+        elif self.ticker_symbol is not trade.ticker_symbol:
+            msg = "Argument trade={trade} does not belong to this stock.".format(trade=trade)
+            raise ValueError(msg)
+        else:
+            with self._lock:
+                position = self.trades.add(trade)
+                self._add_to_window(position)
+
+                if self._last_trade is None or trade.timestamp >= self._last_trade.timestamp:
+                    self._last_trade = trade
+
+                if self._bar_levels:
+                    self._add_to_bars((self.trades.timestamps[position],),
+                                      (trade.quantity,),
+                                      (self.trades.prices[position],))
+                self._retain()
+                self._version += 1
+
+            self._notify_observers()
+
+    def add_observer(self, observer):
+        """Registers a callable to be called with this stock whenever trades are recorded.
+        :param observer: The callable to register
+        .. note:: Observers are called once the trades have been recorded, out of the
+            lock of a thread safe stock.
+        """
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        """Unregisters a callable registered by means of add_observer.
+        :param observer: The callable to unregister
+        :raise ValueError:
+        """
+        self._observers.remove(observer)
+
+    def _notify_observers(self):
+        for observer in self._observers:
+            observer(self)
+
+    def record_trades(self, trades: [Trade]):
+        """Records a batch of trades for this stock.
+        :param trades: The trades to be recorded, in any order
+        :raise TypeError:
+        :raise ValueError:
+        .. note:: The whole batch is checked before any trade is recorded, and then
+            stored in one go. Either all the trades are recorded or none is.
+        """
+        trades = list(trades)
+        for trade in trades:
+            if not isinstance(trade, Trade):
+                msg = "Argument trade={trade} should be of type Trade.".format(trade=trade)
+                raise TypeError(msg)
+            elif self.ticker_symbol is not trade.ticker_symbol:
+                msg = "Argument trade={trade} does not belong to this stock.".format(trade=trade)
+                raise ValueError(msg)
+
+        self._record_columns([to_epoch_ns(trade.timestamp) for trade in trades],
+                             [trade.quantity for trade in trades],
+                             [trade.price_per_share for trade in trades],
+                             [trade.buy_sell_indicator.value for trade in trades])
+
+    def _record_columns(self,
+                        timestamps: [int],
+                        quantities: [int],
+                        prices: [float],
+                        sides: [int],
+                        in_ticks: bool=False):
+        """Records a batch of already validated trades given as columns.
+        :param timestamps: The timestamps of the trades, in nanoseconds from the epoch
+        :param quantities: The amounts of shares exchanged
+        :param prices: The prices per share
+        :param sides: The values of the buy/sell indicators
+        :param in_ticks: Whether prices are instead given as stored, that is, as numbers
+            of ticks in fixed-point mode. See TradeStore.extend.
+        """
+        if len(timestamps) == 0:
+            return
+
+        if self.price_scale is not None and not in_ticks:
+            price_scale = self.price_scale
+            prices = [to_ticks(price, price_scale) for price in prices]
+
+        with self._lock:
+            self.trades.extend(timestamps, quantities, prices, sides, in_ticks=True)
+
+            if self._window_start is not None:
+                window_start = self._window_start
+                for timestamp, quantity, price, side in zip(timestamps, quantities,
+                                                            prices, sides):
+                    if timestamp < window_start:
+                        self._window_index += 1
+                    elif side == _BUY:
+                        self._window_buy_total_price += quantity * price
+                        self._window_buy_quantity += quantity
+                    else:
+                        self._window_sell_total_price += quantity * price
+                        self._window_sell_quantity += quantity
+
+            self._last_trade = self.trades[-1]
+            if self._bar_levels:
+                self._add_to_bars(timestamps, quantities, prices)
+            self._retain()
+            self._version += 1
+
+        self._notify_observers()
+
+    def _retain(self):
+        """Compacts the trades that fall out of self.retention_policy, if any.
+        .. note:: Retention is measured from the latest recorded trade, not from the wall
+            clock. Trades are only compacted once there are retention_policy.min_batch of
+            them, so that each compaction shifts the columns of self.trades only once for
+            many recorded trades.
+        """
+        policy = self.retention_policy
+        if policy is None:
+            return
+
+        retention = self.price_time_interval + policy.grace_period
+        horizon = self.trades.timestamps[-1] - retention // timedelta(microseconds=1) * 1000
+        n = bisect.bisect_left(self.trades.timestamps, horizon)
+        if n == 0 or n < policy.min_batch:
+            return
+
+        self._add_minute_bars()
+        timestamps, quantities, prices, sides = self.trades.remove_oldest(n)
+        if policy.spill is not None:
+            if self.price_scale is not None:
+                prices = [price / self.price_scale for price in prices]
+            policy.spill(self.ticker_symbol, timestamps, quantities, prices, sides)
+
+        self._compacted_until = horizon
+        for length, bars in self._bar_levels:
+            if length < _MINUTE_NS:
+                for start in [start for start in bars if start + length <= horizon]:
+                    del bars[start]
+
+        if self._window_start is not None:
+            if self._window_index >= n:
+                self._window_index -= n
+            else:
+                self._window_start = None
+
+    def _add_minute_bars(self):
+        """Sets up minute bars with the trades in self.trades, unless there are bars of
+        a minute or longer already, so that compacted trades are kept in them.
+        """
+        if any(length >= _MINUTE_NS for length, _ in self._bar_levels):
+            return
+
+        level = (_MINUTE_NS, self.bars.setdefault(timedelta(minutes=1), {}))
+        self._bar_levels.insert(0, level)
+        self._add_to_bars(self.trades.timestamps,
+                          self.trades.quantities,
+                          self.trades.prices,
+                          [level])
+
+    def _add_to_bars(self,
+                     timestamps: [int],
+                     quantities: [int],
+                     prices: [float],
+                     levels: list=None):
+        """Adds trades to the bars of every resolution.
+        :param timestamps: The timestamps of the trades, in nanoseconds from the epoch
+        :param quantities: The amounts of shares exchanged
+        :param prices: The prices per share as stored in self.trades, that is, in ticks
+            in fixed-point mode
+        :param levels: The levels of self._bar_levels to add them to, by default all
+        """
+        if self.price_scale is not None:
+            price_scale = self.price_scale
+            prices = [price / price_scale for price in prices]
+
+        for length, bars in self._bar_levels if levels is None else levels:
+            for timestamp, quantity, price in zip(timestamps, quantities, prices):
+                start = timestamp - timestamp % length
+                bar = bars.get(start)
+                if bar is None:
+                    bar = bars[start] = Bar(start)
+                bar.add(timestamp, quantity, price)
+
+    def bar(self,
+            start: datetime,
+            end: datetime) -> Bar:
+        """
+        :param start: The beginning of the range, included
+        :param end: The end of the range, excluded
+        :return: A bar with the open, high, low and close prices, the volume and the
+            volume weighted average price of the trades recorded in the range.
+        .. note:: The range is covered with the longest bars that fit in it. Only its
+            edges are covered with shorter bars and, within the shortest resolution,
+            with the trades in self.trades, so the cost does not depend on the number
+            of trades in the range.
+        .. note:: Once trades have been compacted by self.retention_policy, the bars
+            shorter than a minute and the trades before the horizon are gone. Within that
+            part of the history, a trade is included if the start of its minute bar is
+            in the range.
+        """
+        with self._lock:
+            start = to_epoch_ns(start)
+            result = Bar(start)
+            self._collect_bars(result, start, to_epoch_ns(end), 0)
+            return result
+
+    def _collect_bars(self,
+                      result: Bar,
+                      start: int,
+                      end: int,
+                      level: int):
+        """Merges into result the trades in a range, using the bars of a level or finer.
+        :param result: The bar to merge the trades into
+        :param start: The beginning of the range, in nanoseconds from the epoch, included
+        :param end: The end of the range, in nanoseconds from the epoch, excluded
+        :param level: The index in self._bar_levels of the longest bars to use. The
+            trades in self.trades are used beyond the last level.
+        """
+        if start >= end:
+            return
+        elif level == len(self._bar_levels):
+            timestamps = self.trades.timestamps
+            quantities = self.trades.quantities
+            price = self.trades.price
+            for index in range(bisect.bisect_left(timestamps, start),
+                               bisect.bisect_left(timestamps, end)):
+                result.add(timestamps[index], quantities[index], price(index))
+            return
+
+        length, bars = self._bar_levels[level]
+        first = -(-start // length) * length
+        last = end // length * length
+
+        if first > last:
+            self._collect_partial_bar(result, start, end, level)
+        else:
+            for bar_start in range(first, last, length):
+                bar = bars.get(bar_start)
+                if bar is not None:
+                    result.merge(bar)
+            self._collect_partial_bar(result, start, first, level)
+            self._collect_partial_bar(result, last, end, level)
+
+    def _collect_partial_bar(self,
+                             result: Bar,
+                             start: int,
+                             end: int,
+                             level: int):
+        """Merges into result the trades in a range that lies within a single bar.
+        :param result: The bar to merge the trades into
+        :param start: The beginning of the range, in nanoseconds from the epoch, included
+        :param end: The end of the range, in nanoseconds from the epoch, excluded
+        :param level: The index in self._bar_levels of the level of the bar
+        """
+        if start >= end:
+            return
+
+        length, bars = self._bar_levels[level]
+        bar_start = start - start % length
+        finer_length = (self._bar_levels[level + 1][0] if level + 1 < len(self._bar_levels)
+                        else 0)
+        compacted = (finer_length < _MINUTE_NS and
+                     self._compacted_until is not None and
+                     bar_start < self._compacted_until)
+
+        if not compacted:
+            self._collect_bars(result, start, end, level + 1)
+        elif start <= bar_start < end and bar_start in bars:
+            result.merge(bars[bar_start])
+
+    def _add_to_window(self, position: int):
+        """Updates the running sums of the current window with a new trade.
+        :param position: The position at which the trade has been inserted in self.trades
+        """
+        if self._window_start is None:
+            return
+        elif self.trades.timestamps[position] < self._window_start:
+            # A late trade that falls before the window shifts it one position.
+            self._window_index += 1
+        else:
+            quantity = self.trades.quantities[position]
+            total_price = quantity * self.trades.prices[position]
+            if self.trades.sides[position] == _BUY:
+                self._window_buy_total_price += total_price
+                self._window_buy_quantity += quantity
+            else:
+                self._window_sell_total_price += total_price
+                self._window_sell_quantity += quantity
+
+    def _reset_window(self, window_start: int):
+        """Recomputes the running sums from scratch for the window starting at window_start.
+        :param window_start: The earliest timestamp included in the window, in nanoseconds
+            from the epoch
+        """
+        index = bisect.bisect_left(self.trades.timestamps, window_start)
+        buy_total_price = sell_total_price = 0
+        buy_quantity = sell_quantity = 0
+        for quantity, price, side in zip(self.trades.quantities[index:],
+                                         self.trades.prices[index:],
+                                         self.trades.sides[index:]):
+            if side == _BUY:
+                buy_total_price += quantity * price
+                buy_quantity += quantity
+            else:
+                sell_total_price += quantity * price
+                sell_quantity += quantity
+
+        self._window_start = window_start
+        self._window_index = index
+        self._window_buy_total_price = buy_total_price
+        self._window_buy_quantity = buy_quantity
+        self._window_sell_total_price = sell_total_price
+        self._window_sell_quantity = sell_quantity
+        self._window_updates = 0
+
+    def _move_window(self, window_start: int):
+        """Moves the current window so that it starts at window_start.
+        :param window_start: The earliest timestamp included in the window, in nanoseconds
+            from the epoch
+        .. note:: Trades that age out of the window are subtracted from the running sums
+            and, should window_start move backwards, trades that enter it again are
+            added back. The sums are recomputed from scratch when the window has been
+            emptied, or once the number of incremental updates exceeds its size, so that
+            rounding errors do not build up.
+        """
+        if self._window_start is None:
+            self._reset_window(window_start)
+            return
+
+        timestamps = self.trades.timestamps
+        quantities = self.trades.quantities
+        prices = self.trades.prices
+        sides = self.trades.sides
+        index = self._window_index
+        buy_total_price = self._window_buy_total_price
+        buy_quantity = self._window_buy_quantity
+        sell_total_price = self._window_sell_total_price
+        sell_quantity = self._window_sell_quantity
+        updates = self._window_updates
+
+        if window_start >= self._window_start:
+            while index < len(timestamps) and timestamps[index] < window_start:
+                if sides[index] == _BUY:
+                    buy_total_price -= quantities[index] * prices[index]
+                    buy_quantity -= quantities[index]
+                else:
+                    sell_total_price -= quantities[index] * prices[index]
+                    sell_quantity -= quantities[index]
+                index += 1
+                updates += 1
+        else:
+            while index > 0 and timestamps[index - 1] >= window_start:
+                index -= 1
+                if sides[index] == _BUY:
+                    buy_total_price += quantities[index] * prices[index]
+                    buy_quantity += quantities[index]
+                else:
+                    sell_total_price += quantities[index] * prices[index]
+                    sell_quantity += quantities[index]
+                updates += 1
+
+        if buy_quantity + sell_quantity == 0 or updates > len(timestamps) - index:
+            self._reset_window(window_start)
+        else:
+            self._window_start = window_start
+            self._window_index = index
+            self._window_buy_total_price = buy_total_price
+            self._window_buy_quantity = buy_quantity
+            self._window_sell_total_price = sell_total_price
+            self._window_sell_quantity = sell_quantity
+            self._window_updates = updates
+
+    @property
+    @abc.abstractmethod
+    def dividend(self) -> float:
+        """
+        :return: A ratio that represents the dividend for this stock
+        """
+        pass
+
+    @property
+    def ticker_price(self) -> float:
+        """
+        :return: The price per share for the last recorded trade for this stock
+        :raise AttributeError:
+        .. note:: We don't know if the trades will be registered in chronological order.
+            That is why the trade with the latest timestamp is tracked by record_trade.
+            Among trades that share the latest timestamp, the one recorded last wins.
+        """
+        return _ticker_price(self._last_trade, self.price_scale)
+
+    @property
+    def dividend_yield(self) -> float:
+        return _price_ratio(self.dividend, self.ticker_price, self.price_scale)
+
+    @property
+    def price_earnings_ratio(self) -> float:
+        """
+        :return: The P/E ratio for this stock
+        """
+        dividend = self.dividend
+        if dividend != 0:
+            return _price_ratio(self.ticker_price, dividend, self.price_scale)
+        else:
+            return None
+
+    def price(self,
+              current_time: datetime=None) -> float:
+        """
+        :param current_time: The point of time defined as the current one. By default,
+            the time of Stock.clock.
+        :return: The average price per share based on trades recorded in the last
+            Stock.price_time_interval. None if there are 0 trades that satisfy this
+            condition.
+        .. note:: The sums over the significant trades are kept incrementally, so for
+            a current_time that advances monotonically the amortized cost of this
+            method is constant, regardless of the size of the interval or the history.
+        .. note:: The existence of the current_time parameter avoids the inner user
+            of datetime.now, thus keeping referential transparency and moving state out.
+        """
+        if current_time is None:
+            current_time = self.clock.now()
+        with self._lock:
+            self._move_window(to_epoch_ns(current_time - self.price_time_interval))
+
+            quantity = self._window_buy_quantity + self._window_sell_quantity
+            if quantity > 0:
+                return _average_price(self._window_buy_total_price +
+                                      self._window_sell_total_price,
+                                      quantity,
+                                      self.price_scale)
+            else:
+                return None
+
+    def side_analytics(self,
+                       current_time: datetime=None) -> SideAnalytics:
+        """
+        :param current_time: The point of time defined as the current one. By default,
+            the time of Stock.clock.
+        :return: The volume bought and sold, the order flow imbalance and the volume
+            weighted average price of each side, over the trades recorded in the last
+            Stock.price_time_interval.
+        .. note:: These come from the same running sums as Stock.price, so they cost no
+            additional pass over the trades.
+        """
+        if current_time is None:
+            current_time = self.clock.now()
+        with self._lock:
+            self._move_window(to_epoch_ns(current_time - self.price_time_interval))
+
+            return _side_analytics(self._window_buy_total_price,
+                                   self._window_buy_quantity,
+                                   self._window_sell_total_price,
+                                   self._window_sell_quantity,
+                                   self.price_scale)
+
+    def _price_and_validity(self,
+                            current_time: datetime) -> (float, int, int):
+        """
+        :param current_time: The point of time defined as the current one.
+        :return: The value of Stock.price for current_time, followed by the bounds of the
+            interval of current times, in nanoseconds from the epoch, for which it stays
+            the same as long as no trade is recorded. The lower bound is exclusive and the
+            upper bound inclusive, and None stands for an unbounded side.
+        """
+        with self._lock:
+            price = self.price(current_time)
+
+            timestamps = self.trades.timestamps
+            index = self._window_index
+            interval = self.price_time_interval // timedelta(microseconds=1) * 1000
+            lower_bound = timestamps[index - 1] + interval if index > 0 else None
+            upper_bound = timestamps[index] + interval if index < len(timestamps) else None
+
+        return price, lower_bound, upper_bound
+
+    def price_series(self,
+                     times: [datetime]) -> [float]:
+        """
+        :param times: The points of time for which the price is to be obtained, in any order.
+        :return: The value Stock.price would return for each of the given times.
+        .. note:: This is meant for evaluating many points of time at once, e.g. when
+            backtesting. Suffix sums of total prices and quantities are built once in a
+            single pass over the columns of self.trades, and the start of each interval
+            is then located by bisection, so the cost is O(n + m log n) for n trades and
+            m times. Suffix sums are used instead of prefix sums because the intervals
+            are open ended, which avoids subtracting two large running totals.
+        """
+        with self._lock:
+            timestamps = self.trades.timestamps[:]
+            quantities = self.trades.quantities[:]
+            prices = self.trades.prices[:]
+
+        total_prices = list(accumulate(map(operator.mul,
+                                           reversed(quantities),
+                                           reversed(prices))))
+        total_quantities = list(accumulate(reversed(quantities)))
+        n = len(timestamps)
+
+        series = []
+        for current_time in times:
+            window_start = to_epoch_ns(current_time - self.price_time_interval)
+            index = bisect.bisect_left(timestamps, window_start)
+            if index < n:
+                suffix = n - 1 - index
+                series.append(_average_price(total_prices[suffix],
+                                             total_quantities[suffix],
+                                             self.price_scale))
+            else:
+                series.append(None)
+
+        return series
+
+    def snapshot(self) -> 'StockSnapshot':
+        """
+        :return: An immutable, consistent view of this stock at this point in time.
+        .. note:: The snapshot is only taken again once trades have been recorded, so
+            readers polling a stock that has not changed get the same snapshot without
+            waiting for the lock of a thread safe stock. Taking a new one holds the lock
+            while the trades recorded since the previous snapshot are copied, see
+            TradeStore.freeze.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self._version:
+            return snapshot
+
+        with self._lock:
+            snapshot = StockSnapshot(self)
+            self._snapshot = snapshot
+
+        return snapshot
+
+
+class StockSnapshot:
+
+    """An immutable view of a stock at a given point in time
+
+    Snapshots may be shared among threads and queried without any locking, see
+    Stock.snapshot. Unlike Stock.price, StockSnapshot.price keeps no state between
+    calls and sums the trades in the interval every time.
+    """
+
+    def __init__(self,
+                 stock: Stock):
+        """
+        :param stock: The stock to take the snapshot of
+        """
+        self.ticker_symbol = stock.ticker_symbol
+        self.version = stock._version
+        self.price_time_interval = stock.price_time_interval
+        self.dividend = stock.dividend
+        self.price_scale = stock.price_scale
+        self.trades = stock.trades.freeze()
+        self._last_trade = stock._last_trade
+
+    @property
+    def ticker_price(self) -> float:
+        """
+        :return: Stock.ticker_price when the snapshot was taken
+        :raise AttributeError:
+        """
+        return _ticker_price(self._last_trade, self.price_scale)
+
+    @property
+    def dividend_yield(self) -> float:
+        return _price_ratio(self.dividend, self.ticker_price, self.price_scale)
+
+    @property
+    def price_earnings_ratio(self) -> float:
+        dividend = self.dividend
+        if dividend != 0:
+            return _price_ratio(self.ticker_price, dividend, self.price_scale)
+        else:
+            return None
+
+    def price(self,
+              current_time: datetime) -> float:
+        """
+        :param current_time: The point of time defined as the current one.
+        :return: Stock.price for current_time, as of when the snapshot was taken.
+        """
+        index = self.trades.index_since(current_time - self.price_time_interval)
+        _, quantities, prices, _ = self.trades.columns_since(index)
+
+        if len(quantities) > 0:
+            return _average_price(sum(map(operator.mul, quantities, prices)),
+                                  sum(quantities),
+                                  self.price_scale)
+        else:
+            return None
+
+    def side_analytics(self,
+                       current_time: datetime) -> SideAnalytics:
+        """
+        :param current_time: The point of time defined as the current one.
+        :return: Stock.side_analytics for current_time, as of when the snapshot was taken.
+        """
+        index = self.trades.index_since(current_time - self.price_time_interval)
+        _, quantities, prices, sides = self.trades.columns_since(index)
+        sums = [0, 0, 0, 0]
+        for quantity, price, side in zip(quantities, prices, sides):
+            offset = 0 if side == _BUY else 2
+            sums[offset] += quantity * price
+            sums[offset + 1] += quantity
+
+        return _side_analytics(*sums, self.price_scale)
+
+
+def geometric_mean(values: [float]) -> float:
+    """
+    :param values: A non empty sequence of non negative numbers
+    :return: Their geometric mean, None if any of them is None
+    .. note:: The mean is computed in log space, so that the product of many prices
+        can not overflow.
+    """
+    if None in values:
+        return None
+    elif 0 in values:
+        return 0.0
+    else:
+        return math.exp(math.fsum(map(math.log, values)) / len(values))
+
+
+class CommonStock(Stock):
+
+    """A common stock"""
+
+    def __init__(self,
+                 ticker_symbol: TickerSymbol,
+                 par_value: float,
+                 last_dividend: float,
+                 thread_safe: bool=False):
+        """
+        :param last_dividend: An absolute value that indicates the last dividend
+            per share for this stock.
+        """
+
+        super().__init__(ticker_symbol, par_value, thread_safe)
+        self.last_dividend = last_dividend
+
+    @property
+    def dividend(self):
+        return self.last_dividend
+
+
+class PreferredStock(Stock):
+
+    """A preferred stock"""
+
+    def __init__(self,
+                 ticker_symbol: TickerSymbol,
+                 par_value: float,
+                 fixed_dividend: float,
+                 thread_safe: bool=False):
+        """
+        :param fixed_dividend: A decimal number that expresses the fixed dividend
+            as a ratio of the face value of each share.
+        """
+
+        super().__init__(ticker_symbol, par_value, thread_safe)
+        self.fixed_dividend = fixed_dividend
+
+    @property
+    def dividend(self):
+        return self.fixed_dividend * self.par_value
+
+
+def sample_stocks() -> [Stock]:
+    """
+    :return: The stocks in the sample data of the GBCE assignment
+    """
+    return [CommonStock(TickerSymbol.TEA, 100.0, 0.0),
+            CommonStock(TickerSymbol.POP, 100.0, 8.0),
+            CommonStock(TickerSymbol.ALE, 60.0, 23.0),
+            PreferredStock(TickerSymbol.GIN, 100.0, 0.02),
+            CommonStock(TickerSymbol.JOE, 250.0, 13.0)]
+
+
+def validate_trade_columns(ticker_symbols: [TickerSymbol],
+                           timestamps: [int],
+                           quantities: [int],
+                           prices: [float],
+                           buy_sell_indicators: [BuySellIndicator]) -> [int]:
+    """Checks a batch of trades given as columns with the same rules as Trade.
+    :param ticker_symbols: The ticker symbols of the trades
+    :param timestamps: The timestamps of the trades, in nanoseconds from the epoch
+    :param quantities: The amounts of shares exchanged
+    :param prices: The prices per share
+    :param buy_sell_indicators: The indications to buy or sell
+    :return: The values of the buy/sell indicators
+    :raise ValueError:
+    .. note:: As in validate_trade_records, the checks are mapped over the columns, so
+        that they run in C.
+    """
+    n = len(ticker_symbols)
+    columns = (timestamps, quantities, prices, buy_sell_indicators)
+    if any(len(column) != n for column in columns):
+        msg = "All the columns should have the same length."
+        raise ValueError(msg)
+    elif n == 0:
+        return []
+
+    if not (_all_integral(quantities) and all(map(operator.lt, repeat(0), quantities))):
+        msg = "The quantity of shares has to be a positive integer."
+        raise ValueError(msg)
+    elif not all(map(operator.le, repeat(0.0), prices)):
+        msg = "The price per share can not be negative."
+        raise ValueError(msg)
+
+    if set(map(type, buy_sell_indicators)) == {BuySellIndicator}:
+        return list(map(_indicator_value, buy_sell_indicators))
+
+    side_values = {indicator: BuySellIndicator(indicator).value
+                   for indicator in set(buy_sell_indicators)}
+    return list(map(side_values.__getitem__, buy_sell_indicators))
+
+
+def _all_integral(values: [int]) -> bool:
+    """
+    :return: Whether all the values are integers. Their types are collected first, so
+        that the types rather than the values are checked against numbers.Integral.
+    """
+    return all(issubclass(kind, numbers.Integral) for kind in set(map(type, values)))
+
+
+def validate_trade_records(records: [TradeRecord]):
+    """Checks a batch of trades given as records with the same rules as Trade.
+    :param records: The records of the trades
+    :raise ValueError:
+    .. note:: The checks run over whole columns of the batch rather than trade by trade,
+        and also require every ticker symbol id to be registered.
+    """
+    if len(records) == 0:
+        return
+
+    ticker_ids, _, quantities, prices, sides = zip(*records)
+    _validate_record_columns(ticker_ids, quantities, prices, sides)
+
+
+def _validate_record_columns(ticker_ids: [int],
+                             quantities: [int],
+                             prices: [int],
+                             sides: [int]):
+    """Checks the columns of a non empty batch of records, see validate_trade_records.
+    :raise ValueError:
+    .. note:: The comparisons are mapped over the columns, so that they run in C, and
+        written as in Trade so that NaN fails them.
+    """
+    if min(ticker_ids) < 0 or max(ticker_ids) >= len(TICKER_SYMBOLS):
+        msg = "Every ticker symbol id should be registered."
+        raise ValueError(msg)
+    elif not (_all_integral(quantities) and all(map(operator.lt, repeat(0), quantities))):
+        msg = "The quantity of shares has to be a positive integer."
+        raise ValueError(msg)
+    elif not all(map(operator.le, repeat(0), prices)):
+        msg = "The price per share can not be negative."
+        raise ValueError(msg)
+    elif not set(sides) <= _BUY_SELL_INDICATORS.keys():
+        msg = "Every side should be the value of a BuySellIndicator."
+        raise ValueError(msg)
+
+
+class TradeLogWriter:
+
+    """An append-only binary log of trades
+
+    The log starts with the header TradeLogWriter.magic, followed by fixed-width records
+    of TradeLogWriter.record: the ticker symbol id as a uint32, the timestamp in
+    nanoseconds from the epoch as an int64, the quantity as an int64, the price per share
+    as a float64 and the buy/sell indicator value as an int8, all little-endian and
+    unpadded. It is read back by read_trade_log.
+
+    Since ids are only meaningful within a process, the first trade of each ticker symbol
+    written by a writer is preceded by a record of the same width that defines its id:
+    TradeLogWriter.definition, made of TradeLogWriter.definition_marker, the id and the
+    name in UTF-8, padded with null bytes. A definition applies to the records that
+    follow it, up to the next definition of the same id.
+    """
+
+    magic = b'SSSTRADE\x02'
+    record = struct.Struct('<Iqqdb')
+    definition = struct.Struct('<II21s')
+    definition_marker = 0xFFFFFFFF
+
+    def __init__(self,
+                 path: str):
+        """
+        :param path: The path of the log. It is created if it does not exist, and
+            appended to otherwise.
+        :raise ValueError:
+        """
+        self.path = path
+        self._file = open(path, 'ab')
+        self._defined = set()
+
+        if self._file.tell() == 0:
+            self._file.write(self.magic)
+            self._file.flush()
+        else:
+            with open(path, 'rb') as log:
+                header = log.read(len(self.magic))
+            if header != self.magic:
+                self._file.close()
+                msg = "File {path} is not a trade log.".format(path=path)
+                raise ValueError(msg)
+
+    def write(self,
+              ticker_symbols: [TickerSymbol],
+              timestamps: [int],
+              quantities: [int],
+              prices: [float],
+              sides: [int]):
+        """Appends a batch of trades given as columns.
+        :param ticker_symbols: The ticker symbols of the trades
+        :param timestamps: The timestamps of the trades, in nanoseconds from the epoch
+        :param quantities: The amounts of shares exchanged
+        :param prices: The prices per share
+        :param sides: The values of the buy/sell indicators
+        .. note:: The batch is flushed to the operating system, but not synced to disk.
+            See TradeLogWriter.sync.
+        :raise ValueError:
+        """
+        definitions = []
+        for ticker_symbol in set(ticker_symbols) - self._defined:
+            name = ticker_symbol.name.encode()
+            if len(name) > self.definition.size - 8:
+                msg = "Ticker symbol {name} is too long to be logged.".format(
+                    name=ticker_symbol.name)
+                raise ValueError(msg)
+            definitions.append(self.definition.pack(self.definition_marker,
+                                                    ticker_symbol.id,
+                                                    name))
+
+        ticker_ids = [ticker_symbol.id for ticker_symbol in ticker_symbols]
+        rows = zip(ticker_ids, timestamps, quantities, prices, sides)
+        self._file.write(b''.join(definitions) + b''.join(starmap(self.record.pack, rows)))
+        self._file.flush()
+        self._defined.update(ticker_symbols)
+
+    def sync(self):
+        """Forces the written trades to be stored on disk."""
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_trade_log(path: str) -> tuple:
+    """Reads a trade log written by TradeLogWriter through a memory map.
+    :param path: The path of the log
+    :return: The columns of the logged trades: ticker symbols, timestamps in nanoseconds
+        from the epoch, quantities, prices per share and buy/sell indicator values.
+    :raise ValueError:
+    .. note:: A trailing incomplete record, as left by a crash in the middle of a
+        write, is ignored.
+    """
+    magic = TradeLogWriter.magic
+    record = TradeLogWriter.record
+
+    with open(path, 'rb') as log:
+        size = os.fstat(log.fileno()).st_size
+        if size < len(magic):
+            msg = "File {path} is not a trade log.".format(path=path)
+            raise ValueError(msg)
+
+        with mmap.mmap(log.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if buffer[:len(magic)] != magic:
+                msg = "File {path} is not a trade log.".format(path=path)
+                raise ValueError(msg)
+
+            end = len(magic) + (size - len(magic)) // record.size * record.size
+            with memoryview(buffer)[len(magic):end] as records:
+                rows = list(record.iter_unpack(records))
+                definitions = [(index, TradeLogWriter.definition.unpack_from(
+                                    records, index * record.size))
+                               for index, row in enumerate(rows)
+                               if row[0] == TradeLogWriter.definition_marker]
+
+    columns = ([], [], [], [], [])
+    ticker_symbols = {}
+    start = 0
+    for index, definition in definitions + [(len(rows), None)]:
+        if index > start:
+            ticker_ids, *values = zip(*rows[start:index])
+            try:
+                columns[0].extend([ticker_symbols[ticker_id] for ticker_id in ticker_ids])
+            except KeyError:
+                msg = "File {path} has trades for an undefined ticker symbol id.".format(
+                    path=path)
+                raise ValueError(msg) from None
+            for column, column_values in zip(columns[1:], values):
+                column.extend(column_values)
+        if definition is not None:
+            _, ticker_id, name = definition
+            ticker_symbols[ticker_id] = intern_ticker_symbol(name.rstrip(b'\0').decode())
+        start = index + 1
+
+    return columns
+
+
+AllShareIndexTerms = namedtuple('AllShareIndexTerms',
+                                ('log_sum', 'count', 'none_count', 'zero_count'))
+AllShareIndexTerms.__doc__ = """The terms of the geometric mean of a group of stock prices
+
+The sum of the logs of the positive prices, the number of prices, and the number of them
+that are None or zero. The terms of disjoint groups of stocks may be combined into the
+All Share Index of all of them by means of combine_all_share_index_terms.
+"""
+
+
+StockTable = namedtuple('StockTable',
+                        ('ticker_symbols', 'dividends', 'ticker_prices', 'dividend_yields',
+                         'price_earnings_ratios', 'prices'))
+StockTable.__doc__ = """The metrics of a group of stocks, as parallel columns
+
+For each stock, in the same order as ticker_symbols: its dividend, ticker price, dividend
+yield, P/E ratio and price, that is, the volume weighted average price of its pricing
+window. The values that the properties of Stock would not be able to compute, e.g. the
+ticker price of a stock without trades, or the dividend yield for a price of zero, are
+None.
+"""
+
+
+def combine_all_share_index_terms(terms: [AllShareIndexTerms]) -> float:
+    """
+    :param terms: The terms of disjoint groups of stock prices
+    :return: The geometric mean of all of the prices. None if any of them is None.
+    """
+    if sum(term.none_count for term in terms) > 0:
+        return None
+    elif sum(term.zero_count for term in terms) > 0:
+        return 0.0
+    else:
+        log_sum = math.fsum(term.log_sum for term in terms)
+        return math.exp(log_sum / sum(term.count for term in terms))
+
+
+class AllShareIndexCache:
+
+    """Keeps the GBCE All Share Index up to date between calls
+
+    The price of each stock is remembered along with the interval of current times for
+    which it stays valid, i.e. until its window gains or loses a trade. When the index
+    is requested, only the prices of the stocks that have recorded trades since, or
+    whose window has moved past a trade, are recomputed. The geometric mean is then
+    updated from the difference in their log prices.
+
+    .. note:: The stocks that expire are found by means of two heaps, ordered by the
+        bounds of the intervals in which their prices are valid, so the cost of a call
+        does not depend on the number of stocks whose prices are still valid. Stale heap
+        entries are told apart by a generation number and discarded lazily.
+    .. note:: The running sum of log prices is recomputed from scratch once the number of
+        incremental updates exceeds the number of stocks, so that rounding errors do not
+        build up.
+    .. note:: All the methods hold a lock, so that stocks may be marked as dirty from
+        the threads that record their trades.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stocks = {}
+        self._dirty = set()
+
+        self._prices = {}
+        self._bounds = {}
+        self._generations = {}
+        self._lower_bounds = []
+        self._upper_bounds = []
+        self._pushes = count()
+
+        self._log_sum = 0.0
+        self._none_count = 0
+        self._zero_count = 0
+        self._updates = 0
+        self._changed = None
+
+    def add(self, stock: Stock):
+        """Starts taking a stock into account.
+        :param stock: The stock to add
+        """
+        with self._lock:
+            self._stocks[stock.ticker_symbol] = stock
+            self._generations[stock.ticker_symbol] = 0
+            self._dirty.add(stock.ticker_symbol)
+        stock.add_observer(self.mark_dirty)
+
+    def remove(self, stock: Stock):
+        """Stops taking a stock into account.
+        :param stock: The stock to remove
+        """
+        stock.remove_observer(self.mark_dirty)
+        with self._lock:
+            self._forget(stock.ticker_symbol)
+            del self._stocks[stock.ticker_symbol]
+            del self._generations[stock.ticker_symbol]
+            self._dirty.discard(stock.ticker_symbol)
+            if self._changed is not None:
+                self._changed.discard(stock.ticker_symbol)
+
+    def mark_dirty(self, stock: Stock):
+        """Marks the price of a stock as to be recomputed.
+        :param stock: The stock that has recorded trades
+        """
+        with self._lock:
+            self._dirty.add(stock.ticker_symbol)
+
+    def _forget(self, ticker_symbol: TickerSymbol):
+        if ticker_symbol in self._prices:
+            price = self._prices.pop(ticker_symbol)
+            if price is None:
+                self._none_count -= 1
+            elif price <= 0:
+                self._zero_count -= 1
+            else:
+                self._log_sum -= math.log(price)
+            self._generations[ticker_symbol] += 1
+            self._updates += 1
+
+    def _remember(self,
+                  ticker_symbol: TickerSymbol,
+                  price: float,
+                  lower_bound: int,
+                  upper_bound: int):
+        self._prices[ticker_symbol] = price
+        if price is None:
+            self._none_count += 1
+        elif price <= 0:
+            self._zero_count += 1
+        else:
+            self._log_sum += math.log(price)
+
+        entry = (next(self._pushes), self._generations[ticker_symbol], ticker_symbol)
+        if lower_bound is not None:
+            heapq.heappush(self._lower_bounds, (-lower_bound,) + entry)
+        if upper_bound is not None:
+            heapq.heappush(self._upper_bounds, (upper_bound,) + entry)
+
+    def _expired(self, current_time: int) -> set:
+        """
+        :param current_time: The current time, in nanoseconds from the epoch
+        :return: The ticker symbols whose cached price is not valid at current_time
+        """
+        expired = set()
+        generations = self._generations
+
+        upper_bounds = self._upper_bounds
+        while len(upper_bounds) > 0 and upper_bounds[0][0] < current_time:
+            _, _, generation, ticker_symbol = heapq.heappop(upper_bounds)
+            if generations.get(ticker_symbol) == generation:
+                expired.add(ticker_symbol)
+
+        lower_bounds = self._lower_bounds
+        while len(lower_bounds) > 0 and -lower_bounds[0][0] >= current_time:
+            _, _, generation, ticker_symbol = heapq.heappop(lower_bounds)
+            if generations.get(ticker_symbol) == generation:
+                expired.add(ticker_symbol)
+
+        return expired
+
+    def _refresh(self, current_time: datetime):
+        """Recomputes the prices that are not valid at current_time."""
+        stale = self._dirty | self._expired(to_epoch_ns(current_time))
+        self._dirty = set()
+        if self._changed is not None:
+            self._changed |= stale
+
+        for ticker_symbol in stale:
+            self._forget(ticker_symbol)
+            self._remember(ticker_symbol,
+                           *self._stocks[ticker_symbol]._price_and_validity(current_time))
+
+    def prices(self, current_time: datetime) -> {TickerSymbol: float}:
+        """
+        :param current_time: The point of time for which prices are to be obtained.
+        :return: The value of Stock.price for each stock.
+        """
+        with self._lock:
+            self._refresh(current_time)
+            return dict(self._prices)
+
+    def changes(self, current_time: datetime) -> ({TickerSymbol: float}, float):
+        """
+        :param current_time: The point of time for which prices are to be obtained.
+        :return: The value of Stock.price for each stock whose price has been recomputed
+            since the previous call, by any method, for all of them on the first call,
+            and the All Share Index.
+        .. note:: Stocks are recomputed when they record trades, so this includes every
+            stock whose ticker price may have changed.
+        """
+        with self._lock:
+            if self._changed is None:
+                self._changed = set(self._stocks)
+            terms = self.terms(current_time)
+            changed = self._changed
+            self._changed = set()
+            return ({ticker_symbol: self._prices[ticker_symbol] for ticker_symbol in changed},
+                    combine_all_share_index_terms([terms]))
+
+    def terms(self, current_time: datetime) -> 'AllShareIndexTerms':
+        """
+        :param current_time: The point of time for which we want to obtain the index.
+        :return: The terms of the geometric mean of all stock prices.
+        """
+        with self._lock:
+            self._refresh(current_time)
+
+            if self._updates > len(self._stocks):
+                logs = (math.log(price) for price in self._prices.values()
+                        if price is not None and price > 0)
+                self._log_sum = math.fsum(logs)
+                self._updates = 0
+
+            return AllShareIndexTerms(self._log_sum,
+                                      len(self._stocks),
+                                      self._none_count,
+                                      self._zero_count)
+
+    def value(self, current_time: datetime) -> float:
+        """
+        :param current_time: The point of time for which we want to obtain the index.
+        :return: The geometric mean of all stock prices. None if any of them is None.
+        """
+        return combine_all_share_index_terms([self.terms(current_time)])
+
+
+MarketUpdate = namedtuple('MarketUpdate',
+                          ('time', 'prices', 'ticker_prices', 'all_share_index'))
+MarketUpdate.__doc__ = """A change in the market, as pushed to a Subscription
+
+The time at which the values were computed, the new price and ticker price of each
+stock, by ticker symbol, for the stocks whose values have changed only, and the All
+Share Index. As in StockTable, a ticker price that is not available yet is None.
+"""
+
+
+class Subscription:
+
+    """A stream of the changes in the prices, ticker prices and All Share Index of an
+    exchange, see GlobalBeverageCorporationExchange.subscribe
+
+    Updates are not queued but coalesced: an update that arrives before the previous one
+    has been taken is merged into it, the values of each stock and the index being the
+    latest ones. A slow subscriber thus gets fewer, larger updates, and holds at most one
+    value per stock, instead of stalling the threads that record trades.
+
+    Updates are taken by means of Subscription.get, by iterating over the subscription,
+    or by iterating over it asynchronously from an asyncio event loop. Iteration ends
+    once the subscription is closed.
+
+    .. note:: The number of updates merged into a pending one is counted in
+        Subscription.coalesced.
+    """
+
+    def __init__(self,
+                 ticker_symbols: [TickerSymbol]=None):
+        """
+        :param ticker_symbols: The ticker symbols of the stocks of interest. By default,
+            all of them. Updates that only concern other stocks are left out, although
+            every update carries the All Share Index.
+        """
+        self.ticker_symbols = None if ticker_symbols is None else frozenset(ticker_symbols)
+        self.coalesced = 0
+        self.closed = False
+        self._pending = None
+        self._condition = threading.Condition()
+        self._waiters = []
+        self._on_close = None
+
+    def _offer(self,
+               current_time: datetime,
+               prices: {TickerSymbol: float},
+               ticker_prices: {TickerSymbol: float},
+               all_share_index: float,
+               index_changed: bool):
+        """Merges an update into the pending one, and wakes up the waiting consumers."""
+        if self.ticker_symbols is not None:
+            prices = {ticker_symbol: price for ticker_symbol, price in prices.items()
+                      if ticker_symbol in self.ticker_symbols}
+            ticker_prices = {ticker_symbol: price
+                             for ticker_symbol, price in ticker_prices.items()
+                             if ticker_symbol in self.ticker_symbols}
+        if len(prices) == 0 and len(ticker_prices) == 0 and not index_changed:
+            return
+
+        with self._condition:
+            if self.closed:
+                return
+            elif self._pending is None:
+                self._pending = MarketUpdate(current_time,
+                                             dict(prices),
+                                             dict(ticker_prices),
+                                             all_share_index)
+            else:
+                self._pending.prices.update(prices)
+                self._pending.ticker_prices.update(ticker_prices)
+                self._pending = self._pending._replace(time=current_time,
+                                                       all_share_index=all_share_index)
+                self.coalesced += 1
+            self._wake()
+
+    def _wake(self):
+        """Wakes up the consumers waiting for an update. Called with self._condition held.
+        .. note:: This runs in the threads that record trades, so waiters whose event loop
+            has been closed in the meantime are skipped instead of raising there.
+        """
+        self._condition.notify_all()
+        for loop, waiter in self._waiters:
+            if waiter.done() or loop.is_closed():
+                continue
+            try:
+                loop.call_soon_threadsafe(_resolve, waiter)
+            except RuntimeError:
+                # The loop has been closed since it was checked.
+                pass
+        self._waiters = []
+
+    def get(self,
+            timeout: float=None) -> MarketUpdate:
+        """Takes the pending update, waiting for one if there is none.
+        :param timeout: The maximum number of seconds to wait. By default, no limit.
+        :return: The update. None if the subscription is closed, or if the timeout
+            expires first.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending is not None or self.closed,
+                                     timeout)
+            update = self._pending
+            self._pending = None
+            return update
+
+    def close(self):
+        """Stops receiving updates, and ends the iterations over this subscription."""
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._pending = None
+            self._wake()
+        if self._on_close is not None:
+            self._on_close(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> MarketUpdate:
+        update = self.get()
+        if update is None:
+            raise StopIteration
+        return update
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> MarketUpdate:
+        while True:
+            with self._condition:
+                update = self._pending
+                self._pending = None
+                if update is not None:
+                    return update
+                elif self.closed:
+                    raise StopAsyncIteration
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._condition:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+def _deliver(subscription: Subscription, callback):
+    for update in subscription:
+        callback(update)
+
+
+class UpdatePublisher:
+
+    """Pushes the changes in the market of an exchange to its subscriptions
+
+    The values are computed in the threads that record trades or move the clock of the
+    exchange, from the prices that its AllShareIndexCache has recomputed since the
+    previous publication, so the cost of a publication depends on the number of stocks
+    that have changed, not on the number of listings. Only the values that differ from
+    the ones published last are pushed, and subscriptions coalesce them, so consumers
+    never run in those threads.
+
+    .. note:: Publications happen whenever a stock records trades and whenever the clock
+        of the exchange ticks. A WallClock never ticks, so with it the trades that fall
+        out of the pricing windows are only noticed along with later trades, or by
+        calling GlobalBeverageCorporationExchange.publish_updates.
+    .. note:: The publisher only observes the clock while there are subscriptions, so
+        that a clock shared by many exchanges, such as WALL_CLOCK, does not keep them
+        alive once their subscriptions are closed.
+    """
+
+    def __init__(self,
+                 exchange: 'GlobalBeverageCorporationExchange'):
+        """
+        :param exchange: The exchange whose changes are to be published
+        """
+        self._exchange = exchange
+        self._lock = threading.RLock()
+        self.subscriptions = []
+        self._ticker_prices = {}
+        self._prices = {}
+        self._all_share_index = None
+        self._time = None
+
+        for stock in exchange.stocks:
+            self.add(stock)
+
+    def add(self, stock: Stock):
+        """Starts publishing the changes of a stock.
+        :param stock: The stock to add
+        """
+        stock.add_observer(self._observe)
+
+    def remove(self, stock: Stock):
+        """Stops publishing the changes of a stock.
+        :param stock: The stock to remove
+        """
+        stock.remove_observer(self._observe)
+        with self._lock:
+            self._prices.pop(stock.ticker_symbol, None)
+            self._ticker_prices.pop(stock.ticker_symbol, None)
+
+    def _observe(self, stock: Stock):
+        self.publish(self._exchange.clock.now())
+
+    def _update(self, current_time: datetime) -> tuple:
+        """
+        :return: The prices and ticker prices that differ from the ones published last,
+            the All Share Index and whether it differs from the one published last.
+        """
+        prices, all_share_index = self._exchange._index_cache.changes(current_time)
+        self._time = current_time
+        changed_prices = {}
+        changed_ticker_prices = {}
+        for ticker_symbol, price in prices.items():
+            if ticker_symbol not in self._prices or self._prices[ticker_symbol] != price:
+                self._prices[ticker_symbol] = price
+                changed_prices[ticker_symbol] = price
+
+            last_trade = self._exchange._stocks[ticker_symbol]._last_trade
+            if last_trade is None:
+                ticker_price = None
+            else:
+                ticker_price = _ticker_price(last_trade,
+                                             self._exchange._stocks[ticker_symbol].price_scale)
+            if (ticker_symbol not in self._ticker_prices or
+                    self._ticker_prices[ticker_symbol] != ticker_price):
+                self._ticker_prices[ticker_symbol] = ticker_price
+                changed_ticker_prices[ticker_symbol] = ticker_price
+
+        index_changed = all_share_index != self._all_share_index
+        self._all_share_index = all_share_index
+        return changed_prices, changed_ticker_prices, all_share_index, index_changed
+
+    def publish(self, current_time: datetime):
+        """Pushes the values that have changed up to current_time to the subscriptions.
+        :param current_time: The point of time for which prices are to be obtained.
+        .. note:: Nothing is computed while there are no subscriptions, nor if neither
+            current_time nor any stock has changed since the previous publication, as
+            happens when a tick of the clock has already published the trades that
+            caused it.
+        """
+        with self._lock:
+            index_cache = self._exchange._index_cache
+            if len(self.subscriptions) == 0:
+                return
+            elif (current_time == self._time and
+                  len(index_cache._dirty) == 0 and len(index_cache._changed) == 0):
+                return
+
+            changes = self._update(current_time)
+            if len(changes[0]) > 0 or len(changes[1]) > 0 or changes[3]:
+                for subscription in self.subscriptions:
+                    subscription._offer(current_time, *changes)
+
+    def subscribe(self,
+                  subscription: Subscription,
+                  current_time: datetime=None):
+        """Starts pushing updates to a subscription.
+        :param subscription: The subscription
+        :param current_time: The current point of time, if known. The first update of
+            the subscription then holds the values of all its stocks at that time.
+            Otherwise, it holds those published last.
+        """
+        with self._lock:
+            if current_time is not None:
+                self.publish(current_time)
+                self._update(current_time)
+            if len(self.subscriptions) == 0:
+                self._exchange.clock.add_observer(self.publish)
+            self.subscriptions.append(subscription)
+            if len(self._prices) > 0:
+                subscription._offer(current_time,
+                                    dict(self._prices),
+                                    dict(self._ticker_prices),
+                                    self._all_share_index,
+                                    True)
+        subscription._on_close = self.unsubscribe
+
+    def unsubscribe(self, subscription: Subscription):
+        """Stops pushing updates to a subscription.
+        :param subscription: The subscription
+        """
+        with self._lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+                if len(self.subscriptions) == 0:
+                    self._exchange.clock.remove_observer(self.publish)
+
+
+class GlobalBeverageCorporationExchange:
+
+    """The whole exchange where the trades take place
+
+    .. note:: The stocks are indexed by their ticker symbol, so that routing a trade to
+        its stock takes constant time regardless of the number of listings. They are
+        also kept in a list indexed by the ids of their ticker symbols, see
+        GlobalBeverageCorporationExchange.get_stock_by_id.
+    .. note:: The All Share Index is kept in an AllShareIndexCache, which only recomputes
+        the prices of the stocks that have changed since the previous call.
+    .. note:: The exchange owns a Clock, which defines its "as-of" time, the default
+        current time of its queries. It is also set as Stock.clock on every listed stock.
+    .. note:: Instead of polling, consumers may subscribe to the changes in the prices,
+        ticker prices and All Share Index, see GlobalBeverageCorporationExchange.subscribe.
+    """
+
+    def __init__(self,
+                 stocks: [Stock],
+                 clock: Clock=None):
+        """
+        :param stocks: The stocks traded at this exchange.
+        :param clock: The clock of this exchange. By default, WALL_CLOCK. A
+            SimulatedClock suits replays, and a TradeClock follows the latest trade.
+        :raise ValueError:
+        """
+        if len(stocks) > 0:
+            self.clock = WALL_CLOCK if clock is None else clock
+            self._publisher = None
+            self._stocks = {}
+            self._stocks_by_id = []
+            self._index_cache = AllShareIndexCache()
+            for stock in stocks:
+                self.add_stock(stock)
+            self._trade_log = None
+        else:
+            msg = "Argument stocks={stocks} should be a non empty sequence.".format(stocks=stocks)
+            raise ValueError(msg)
+
+    @property
+    def as_of(self) -> datetime:
+        """
+        :return: The current time according to the clock of this exchange
+        """
+        return self.clock.now()
+
+    @property
+    def stocks(self) -> [Stock]:
+        """
+        :return: The stocks currently listed at this exchange, in order of listing
+        """
+        return list(self._stocks.values())
+
+    def add_stock(self,
+                  stock: Stock):
+        """Lists a new stock at this exchange.
+        :param stock: The stock to list.
+        :raise ValueError:
+        """
+        if stock.ticker_symbol in self._stocks:
+            msg = "A stock with ticker symbol {ticker_symbol} is already listed.".format(
+                ticker_symbol=stock.ticker_symbol)
+            raise ValueError(msg)
+        else:
+            self._stocks[stock.ticker_symbol] = stock
+            ticker_id = stock.ticker_symbol.id
+            if ticker_id >= len(self._stocks_by_id):
+                self._stocks_by_id.extend([None] * (ticker_id + 1 - len(self._stocks_by_id)))
+            self._stocks_by_id[ticker_id] = stock
+            self._index_cache.add(stock)
+            stock.clock = self.clock
+            self.clock.watch(stock)
+            if self._publisher is not None:
+                self._publisher.add(stock)
+
+    def delist_stock(self,
+                     ticker_symbol: TickerSymbol) -> Stock:
+        """Removes a stock from this exchange.
+        :param ticker_symbol: The ticker symbol of the stock to remove.
+        :return: The removed stock.
+        :raise ValueError:
+        """
+        stock = self.get_stock(ticker_symbol)
+        if len(self._stocks) > 1:
+            del self._stocks[ticker_symbol]
+            self._stocks_by_id[ticker_symbol.id] = None
+            self._index_cache.remove(stock)
+            self.clock.unwatch(stock)
+            del stock.clock
+            if self._publisher is not None:
+                self._publisher.remove(stock)
+            return stock
+        else:
+            msg = "The last listed stock {ticker_symbol} can not be delisted.".format(
+                ticker_symbol=ticker_symbol)
+            raise ValueError(msg)
+
+    def get_stock(self,
+                  ticker_symbol: TickerSymbol) -> Stock:
+        """
+        :param ticker_symbol: The ticker symbol of a listed stock.
+        :return: The stock identified by ticker_symbol.
+        :raise ValueError:
+        """
+        try:
+            return self._stocks[ticker_symbol]
+        except KeyError:
+            msg = "No stock with ticker symbol {ticker_symbol} is listed.".format(
+                ticker_symbol=ticker_symbol)
+            raise ValueError(msg) from None
+
+    def get_stock_by_id(self,
+                        ticker_id: int) -> Stock:
+        """
+        :param ticker_id: The id of the ticker symbol of a listed stock.
+        :return: The stock whose ticker symbol has that id.
+        :raise ValueError:
+        .. note:: This is a plain list lookup, for callers that address stocks by the
+            dense ids of TickerSymbolRegistry.
+        """
+        stock = self._stocks_by_id[ticker_id] if 0 <= ticker_id < len(self._stocks_by_id) else None
+        if stock is None:
+            msg = "No stock with ticker symbol id {ticker_id} is listed.".format(
+                ticker_id=ticker_id)
+            raise ValueError(msg)
+        return stock
+
+    def record_trade(self,
+                     trade: Trade):
+        """Records a trade for the proper stock.
+        :param trade: The trade to record.
+        :raise ValueError:
+        """
+        self.get_stock(trade.ticker_symbol).record_trade(trade)
+
+        if self._trade_log is not None:
+            self._trade_log.write([trade.ticker_symbol],
+                                  [to_epoch_ns(trade.timestamp)],
+                                  [trade.quantity],
+                                  [trade.price_per_share],
+                                  [trade.buy_sell_indicator.value])
+
+    def record_trades(self,
+                      trades: [Trade]):
+        """Records a batch of trades, each one for its proper stock.
+        :param trades: The trades to record.
+        :raise TypeError:
+        :raise ValueError:
+        .. note:: The trades are grouped by ticker symbol and each group is recorded in
+            one go. Every ticker symbol is checked before anything is recorded.
+        """
+        trades = list(trades)
+        groups = {}
+        for trade in trades:
+            groups.setdefault(trade.ticker_symbol, []).append(trade)
+
+        stocks = [self.get_stock(ticker_symbol) for ticker_symbol in groups]
+        for stock, group in zip(stocks, groups.values()):
+            stock.record_trades(group)
+
+        if self._trade_log is not None:
+            self._trade_log.write([trade.ticker_symbol for trade in trades],
+                                  [to_epoch_ns(trade.timestamp) for trade in trades],
+                                  [trade.quantity for trade in trades],
+                                  [trade.price_per_share for trade in trades],
+                                  [trade.buy_sell_indicator.value for trade in trades])
+
+    def ingest(self,
+               ticker_symbols: [TickerSymbol],
+               timestamps: [int],
+               quantities: [int],
+               prices: [float],
+               buy_sell_indicators: [BuySellIndicator]):
+        """Records a batch of trades given as columns, each one for its proper stock.
+        :param ticker_symbols: The ticker symbols of the trades.
+        :param timestamps: The timestamps of the trades, in nanoseconds from the epoch.
+        :param quantities: The amounts of shares exchanged.
+        :param prices: The prices per share.
+        :param buy_sell_indicators: The indications to buy or sell.
+        :raise ValueError:
+        .. note:: This is the fastest way to load a large number of trades, since no
+            instance of Trade is built. The columns are validated once for the whole
+            batch, with the same rules as Trade, and nothing is recorded if any value
+            is wrong.
+        """
+        sides = validate_trade_columns(ticker_symbols,
+                                       timestamps,
+                                       quantities,
+                                       prices,
+                                       buy_sell_indicators)
+        if len(sides) == 0:
+            return
+
+        self._record_columns(ticker_symbols, timestamps, quantities, prices, sides)
+
+        if self._trade_log is not None:
+            self._trade_log.write(ticker_symbols, timestamps, quantities, prices, sides)
+
+    def ingest_records(self,
+                       records: [TradeRecord],
+                       price_scale: int,
+                       validated: bool=False):
+        """Records a batch of trades given as records, each one for its proper stock.
+        :param records: The records of the trades.
+        :param price_scale: The number of ticks in a unit of currency of their prices.
+        :param validated: Whether the records have already been checked, e.g. by means of
+            validate_trade_records, so that they are not checked again.
+        :raise ValueError:
+        .. note:: As with ingest, no instance of Trade is built, and nothing is recorded
+            if any value is wrong. Trades are routed to their stocks by ticker symbol id,
+            see GlobalBeverageCorporationExchange.get_stock_by_id.
+        .. note:: The records are sorted by ticker symbol id and split into columns by
+            builtins that run in C rather than by a loop over the records, so that the
+            trades of each stock are contiguous slices of the columns. The prices of
+            stocks in fixed-point mode with the same price scale are stored as given, in
+            ticks, and those of the other stocks are converted once.
+        """
+        if len(records) == 0:
+            return
+
+        columns = tuple(zip(*sorted(records, key=operator.itemgetter(0))))
+        ticker_ids, timestamps, quantities, prices, sides = columns
+        if not validated:
+            _validate_record_columns(ticker_ids, quantities, prices, sides)
+
+        runs = []
+        start = 0
+        while start < len(ticker_ids):
+            end = bisect.bisect_right(ticker_ids, ticker_ids[start], start)
+            runs.append((self.get_stock_by_id(ticker_ids[start]), start, end))
+            start = end
+
+        for stock, start, end in runs:
+            stock_timestamps, stock_quantities, stock_prices, stock_sides = (
+                column[start:end] for column in columns[1:])
+            if stock.price_scale == price_scale:
+                stock._record_columns(stock_timestamps,
+                                      stock_quantities,
+                                      stock_prices,
+                                      stock_sides,
+                                      in_ticks=True)
+            else:
+                stock._record_columns(stock_timestamps,
+                                      stock_quantities,
+                                      list(map(operator.truediv,
+                                               stock_prices,
+                                               repeat(price_scale))),
+                                      stock_sides)
+
+        if self._trade_log is not None:
+            ticker_ids, timestamps, quantities, prices, sides = zip(*records)
+            self._trade_log.write([TICKER_SYMBOLS[ticker_id] for ticker_id in ticker_ids],
+                                  timestamps,
+                                  quantities,
+                                  list(map(operator.truediv, prices, repeat(price_scale))),
+                                  sides)
+
+    def _record_columns(self,
+                        ticker_symbols: [TickerSymbol],
+                        timestamps: [int],
+                        quantities: [int],
+                        prices: [float],
+                        sides: [int]):
+        """Records a batch of already validated trades given as columns.
+        :raise ValueError:
+        .. note:: See ingest. Every ticker symbol is checked before anything is recorded.
+        """
+        groups = {}
+        for index, ticker_symbol in enumerate(ticker_symbols):
+            groups.setdefault(ticker_symbol, []).append(index)
+
+        columns = (timestamps, quantities, prices, sides)
+        stocks = [self.get_stock(ticker_symbol) for ticker_symbol in groups]
+        for stock, indices in zip(stocks, groups.values()):
+            if len(indices) == len(ticker_symbols):
+                stock._record_columns(*columns)
+            else:
+                stock._record_columns(*([column[index] for index in indices]
+                                        for column in columns))
+
+    def open_trade_log(self,
+                       path: str):
+        """Starts appending every trade recorded from now on to a trade log.
+        :param path: The path of the log. See TradeLogWriter.
+        :raise ValueError:
+        """
+        self.close_trade_log()
+        self._trade_log = TradeLogWriter(path)
+
+    def close_trade_log(self):
+        """Stops appending recorded trades to the trade log, if any."""
+        if self._trade_log is not None:
+            self._trade_log.close()
+            self._trade_log = None
+
+    def replay_trade_log(self,
+                         path: str):
+        """Records all the trades in a trade log, e.g. on restart after a crash.
+        :param path: The path of the log. See read_trade_log.
+        :raise ValueError:
+        .. note:: The trades go straight from the log into the columns of the stocks,
+            without instances of Trade being built. They are not appended to the open
+            trade log, if any.
+        """
+        self._record_columns(*read_trade_log(path))
+
+    def all_share_index(self,
+                        current_time: datetime=None) -> float:
+        """
+        :param current_time: The point of time for which we want to obtain the index. By
+            default, GlobalBeverageCorporationExchange.as_of.
+        :return: The geometric mean of all stock prices. Returns None if any of them is
+            None.
+        .. note:: The geometric mean is computed in log space, so that the product of many
+            prices can not overflow. See AllShareIndexCache.
+        """
+        if current_time is None:
+            current_time = self.clock.now()
+        return self._index_cache.value(current_time)
+
+    def subscribe(self,
+                  callback=None,
+                  ticker_symbols: [TickerSymbol]=None) -> Subscription:
+        """Starts pushing the changes in the market to a new subscription.
+        :param callback: A callable to be called with every MarketUpdate, from a thread
+            of its own, until the subscription is closed. If None, updates are to be
+            taken from the subscription itself.
+        :param ticker_symbols: The ticker symbols of the stocks of interest. By default,
+            all of them.
+        :return: The subscription. Its first update holds the current values.
+        .. note:: See UpdatePublisher. Before the first subscription, nothing is
+            computed or published, so recording trades costs nothing extra.
+        .. note:: With a clock that does not tick, such as a WallClock, the trades that
+            fall out of the pricing windows are not pushed until later trades are
+            recorded, unless publish_updates is called periodically, e.g. from a timer.
+        """
+        if self._publisher is None:
+            self._publisher = UpdatePublisher(self)
+
+        subscription = Subscription(ticker_symbols)
+        try:
+            current_time = self.clock.now()
+        except ValueError:
+            current_time = None
+        self._publisher.subscribe(subscription, current_time)
+
+        if callback is not None:
+            thread = threading.Thread(target=_deliver,
+                                      args=(subscription, callback),
+                                      daemon=True)
+            thread.start()
+        return subscription
+
+    def publish_updates(self,
+                        current_time: datetime=None):
+        """Pushes the changes in the market up to a point of time to the subscriptions.
+        :param current_time: The point of time. By default,
+            GlobalBeverageCorporationExchange.as_of.
+        .. note:: This is only needed with clocks that do not tick, such as a WallClock,
+            to push the changes due to trades falling out of the pricing windows, e.g.
+            from a timer.
+        """
+        if self._publisher is not None:
+            self._publisher.publish(self.clock.now() if current_time is None
+                                    else current_time)
+
+    def side_analytics(self,
+                       current_time: datetime=None) -> {TickerSymbol: SideAnalytics}:
+        """
+        :param current_time: The point of time for which analytics are to be obtained. By
+            default, GlobalBeverageCorporationExchange.as_of.
+        :return: For each ticker symbol, the value of Stock.side_analytics.
+        """
+        if current_time is None:
+            current_time = self.clock.now()
+        return {ticker_symbol: stock.side_analytics(current_time)
+                for ticker_symbol, stock in list(self._stocks.items())}
+
+    def stock_table(self,
+                    current_time: datetime) -> StockTable:
+        """
+        :param current_time: The point of time for which prices are to be obtained.
+        :return: The dividend, ticker price, dividend yield, P/E ratio and price of every
+            listed stock, in order of listing.
+        .. note:: This is meant for screening many listings at once. The dividends and
+            last trades of all the stocks are gathered into columns first, and the
+            ratios are then computed column-wise, instead of going through the chain of
+            properties of each stock. Prices are taken from the AllShareIndexCache, so
+            only those of the stocks that have changed are recomputed.
+        """
+        stocks = list(self._stocks.values())
+        prices = self._index_cache.prices(current_time)
+        dividends = [stock.dividend for stock in stocks]
+        price_scales = [stock.price_scale for stock in stocks]
+        ticker_prices = [None if stock._last_trade is None else
+                         _ticker_price(stock._last_trade, price_scale)
+                         for stock, price_scale in zip(stocks, price_scales)]
+
+        dividend_yields = [None if ticker_price is None or ticker_price == 0 else
+                           _price_ratio(dividend, ticker_price, price_scale)
+                           for dividend, ticker_price, price_scale
+                           in zip(dividends, ticker_prices, price_scales)]
+        price_earnings_ratios = [None if ticker_price is None or dividend == 0 else
+                                 _price_ratio(ticker_price, dividend, price_scale)
+                                 for dividend, ticker_price, price_scale
+                                 in zip(dividends, ticker_prices, price_scales)]
+
+        return StockTable(ticker_symbols=[stock.ticker_symbol for stock in stocks],
+                          dividends=dividends,
+                          ticker_prices=ticker_prices,
+                          dividend_yields=dividend_yields,
+                          price_earnings_ratios=price_earnings_ratios,
+                          prices=[prices[stock.ticker_symbol] for stock in stocks])
+
+    def snapshot(self) -> {TickerSymbol: StockSnapshot}:
+        """
+        :return: A snapshot of each listed stock, see Stock.snapshot.
+        """
+        return {ticker_symbol: stock.snapshot()
+                for ticker_symbol, stock in list(self._stocks.items())}
+
+    def all_share_index_terms(self,
+                              current_time: datetime) -> AllShareIndexTerms:
+        """
+        :param current_time: The point of time for which we want to obtain the index.
+        :return: The terms of the geometric mean of all stock prices, to be combined with
+            those of other exchanges by means of combine_all_share_index_terms.
+        """
+        return self._index_cache.terms(current_time)
+
+    def price_series(self,
+                     times: [datetime]) -> {TickerSymbol: [float]}:
+        """
+        :param times: The points of time for which prices are to be obtained.
+        :return: For each ticker symbol, the value Stock.price would return for each of
+            the given times.
+        """
+        times = list(times)
+        return {ticker_symbol: stock.price_series(times)
+                for ticker_symbol, stock in self._stocks.items()}
+
+    def all_share_index_series(self,
+                               times: [datetime]) -> [float]:
+        """
+        :param times: The points of time for which the index is to be obtained.
+        :return: The geometric mean of all stock prices for each of the given times. None
+            for those times at which any of the prices is None.
+        .. note:: See Stock.price_series.
+        """
+        series = self.price_series(times)
+        return [geometric_mean(stock_prices) for stock_prices in zip(*series.values())]
 
@@ -0,0 +1,201 @@
+"""Parallel replays of historical trading days
+
+A history is a directory with a trade log per trading day, see TradeLogWriter, named
+after the day, e.g. ``1929-10-24.log``. Every day is replayed independently in a worker
+process, through a fresh GlobalBeverageCorporationExchange, and sampled at the end of
+every interval: the All Share Index, and the price and ticker price of every stock.
+
+The samples of all the days are streamed in order of day and time, either from the
+backtest generator or into a CSV file.
+
+Usage::
+
+    $ python -m super_simple_stocks_backtest history/ --interval 60 --output samples.csv
+"""
+
+import argparse
+import bisect
+import copy
+import csv
+import operator
+import os
+import sys
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from super_simple_stocks import (TickerSymbol,
+                                 Stock,
+                                 GlobalBeverageCorporationExchange,
+                                 from_epoch_ns,
+                                 read_trade_log,
+                                 sample_stocks)
+
+
+LOG_SUFFIX = '.log'
+
+
+BacktestSample = namedtuple('BacktestSample',
+                            ('day', 'time', 'all_share_index', 'prices', 'ticker_prices'))
+BacktestSample.__doc__ = """The state of the exchange at the end of an interval of a day
+
+The name of the day, the end of the interval, the All Share Index and, by ticker symbol,
+the price and ticker price of every stock. As in StockTable, the values that can not be
+computed, e.g. the ticker price of a stock without trades yet, are None.
+"""
+
+
+def trade_days(directory: str) -> [str]:
+    """
+    :param directory: The directory of a history
+    :return: The paths of the trade logs in it, in order of name, i.e. of day
+    """
+    return [os.path.join(directory, name)
+            for name in sorted(os.listdir(directory))
+            if name.endswith(LOG_SUFFIX)]
+
+
+def replay_day(path: str,
+               stocks: [Stock],
+               interval: timedelta) -> [BacktestSample]:
+    """Replays a trading day through a new exchange.
+    :param path: The path of the trade log of the day
+    :param stocks: The stocks listed during the day, without trades. They are copied,
+        so that they may be used for other days.
+    :param interval: The length of the intervals at whose end the exchange is sampled
+    :return: The samples of the day, from the end of the interval of its first trade to
+        the end of that of its last trade.
+    :raise ValueError:
+    .. note:: The trades of each interval are recorded in one batch, so the cost of a
+        replay is that of ingesting the trades of the day plus that of a
+        GlobalBeverageCorporationExchange.stock_table call per interval.
+    """
+    day = os.path.basename(path)[:-len(LOG_SUFFIX)]
+    columns = read_trade_log(path)
+    timestamps = columns[1]
+    if len(timestamps) == 0:
+        return []
+    elif not all(map(operator.le, timestamps, timestamps[1:])):
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        columns = tuple([column[index] for index in order] for column in columns)
+        timestamps = columns[1]
+
+    exchange = GlobalBeverageCorporationExchange(copy.deepcopy(stocks))
+    interval_ns = interval // timedelta(microseconds=1) * 1000
+    sample_ns = (timestamps[0] // interval_ns + 1) * interval_ns
+
+    samples = []
+    start = 0
+    while start < len(timestamps):
+        end = bisect.bisect_right(timestamps, sample_ns, start)
+        exchange._record_columns(*(column[start:end] for column in columns))
+
+        current_time = from_epoch_ns(sample_ns)
+        table = exchange.stock_table(current_time)
+        samples.append(BacktestSample(day,
+                                      current_time,
+                                      exchange.all_share_index(current_time),
+                                      dict(zip(table.ticker_symbols, table.prices)),
+                                      dict(zip(table.ticker_symbols, table.ticker_prices))))
+        start = end
+        sample_ns += interval_ns
+
+    return samples
+
+
+def backtest(directory: str,
+             stocks: [Stock],
+             interval: timedelta=timedelta(minutes=1),
+             processes: int=None):
+    """Replays every trading day of a history in a pool of worker processes.
+    :param directory: The directory of the history. See trade_days.
+    :param stocks: The stocks listed every day, without trades. See replay_day.
+    :param interval: The length of the intervals at whose end the exchanges are sampled
+    :param processes: The number of worker processes. By default, the number of CPUs.
+    :return: A generator of the samples of all the days, in order of day and time.
+    :raise ValueError:
+    .. note:: Only twice as many days as there are processes are replayed ahead of the
+        day being consumed, so that memory does not grow with the length of the
+        history. Days not yet started are cancelled if the generator is closed early.
+    """
+    if interval <= timedelta(0):
+        msg = "Argument interval={interval} should be positive.".format(interval=interval)
+        raise ValueError(msg)
+    elif processes is not None and processes <= 0:
+        msg = "Argument processes={processes} should be positive.".format(
+            processes=processes)
+        raise ValueError(msg)
+
+    paths = iter(trade_days(directory))
+    processes = processes or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(processes)
+    pending = deque()
+    try:
+        for path in paths:
+            pending.append(pool.submit(replay_day, path, stocks, interval))
+            if len(pending) == 2 * processes:
+                break
+
+        while len(pending) > 0:
+            samples = pending.popleft().result()
+            for path in paths:
+                pending.append(pool.submit(replay_day, path, stocks, interval))
+                break
+            yield from samples
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown()
+
+
+def write_samples(samples,
+                  ticker_symbols: [TickerSymbol],
+                  file):
+    """Writes samples as CSV, one row per sample.
+    :param samples: The samples to write, e.g. from backtest
+    :param ticker_symbols: The ticker symbols of the stocks, in the order of the columns
+    :param file: The text file to write to
+    .. note:: The columns are the day, the time in ISO 8601 format, the All Share Index
+        and, for each ticker symbol, its price and ticker price. None is written as an
+        empty field.
+    """
+    writer = csv.writer(file)
+    header = ['day', 'time', 'all_share_index']
+    for ticker_symbol in ticker_symbols:
+        header.append('{name}_price'.format(name=ticker_symbol.name))
+        header.append('{name}_ticker_price'.format(name=ticker_symbol.name))
+    writer.writerow(header)
+
+    for sample in samples:
+        row = [sample.day, sample.time.isoformat(), sample.all_share_index]
+        for ticker_symbol in ticker_symbols:
+            row.append(sample.prices[ticker_symbol])
+            row.append(sample.ticker_prices[ticker_symbol])
+        writer.writerow('' if value is None else value for value in row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory', help='directory with a trade log per trading day')
+    parser.add_argument('--interval', type=float, default=60.0,
+                        help='seconds between samples')
+    parser.add_argument('--processes', type=int,
+                        help='number of worker processes, the number of CPUs by default')
+    parser.add_argument('--output', help='CSV file to write the samples to, stdout by default')
+    args = parser.parse_args()
+
+    stocks = sample_stocks()
+    samples = backtest(args.directory,
+                       stocks,
+                       timedelta(seconds=args.interval),
+                       args.processes)
+    ticker_symbols = [stock.ticker_symbol for stock in stocks]
+    if args.output is not None:
+        with open(args.output, 'w', newline='') as file:
+            write_samples(samples, ticker_symbols, file)
+    else:
+        write_samples(samples, ticker_symbols, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+"""Optional counters, latency histograms and gauges for the hot paths of a GBCE
+
+Instrumentation is off unless an Instrumentation is enabled. Enabling it replaces the
+instrumented methods of Stock and GlobalBeverageCorporationExchange with timing wrappers,
+and disabling it puts the original methods back, so that there is no cost at all, not
+even a flag check, while it is disabled.
+
+The metrics may be read through the Python API, or rendered in the Prometheus text
+exposition format, either written to a file, e.g. for the textfile collector of the
+node exporter, or served over HTTP on a local socket.
+
+Usage::
+
+    instrumentation = Instrumentation()
+    instrumentation.watch(exchange)
+    with instrumentation:
+        exchange.record_trade(trade)
+        exchange.all_share_index(current_time)
+    instrumentation.write('/var/lib/node_exporter/super_simple_stocks.prom')
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from super_simple_stocks import Stock, GlobalBeverageCorporationExchange
+
+
+# The methods that are timed when instrumentation is enabled, by operation name.
+OPERATIONS = (
+    ('exchange_record_trade', GlobalBeverageCorporationExchange, 'record_trade'),
+    ('exchange_record_trades', GlobalBeverageCorporationExchange, 'record_trades'),
+    ('exchange_ingest', GlobalBeverageCorporationExchange, 'ingest'),
+    ('exchange_ingest_records', GlobalBeverageCorporationExchange, 'ingest_records'),
+    ('all_share_index', GlobalBeverageCorporationExchange, 'all_share_index'),
+    ('stock_record_trade', Stock, 'record_trade'),
+    ('stock_record_trades', Stock, 'record_trades'),
+    ('price', Stock, 'price'),
+    ('ticker_price', Stock, 'ticker_price'),
+    ('window_move', Stock, '_move_window'),
+    ('window_reset', Stock, '_reset_window'),
+)
+
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+
+_PREFIX = 'super_simple_stocks'
+
+
+def _label_value(value: str) -> str:
+    """
+    :param value: The value of a label
+    :return: The value quoted and escaped as in the Prometheus text exposition format
+    """
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '"{escaped}"'.format(escaped=escaped)
+
+
+class Histogram:
+
+    """The distribution of the latencies of an operation, in seconds
+
+    Besides the count per bucket, the number of calls, of calls that raised, and the sum
+    of all latencies are kept.
+    """
+
+    def __init__(self,
+                 buckets: [float]=DEFAULT_BUCKETS):
+        """
+        :param buckets: The increasing upper bounds of the buckets, in seconds. A last
+            unbounded bucket is always added.
+        """
+        self.buckets = tuple(buckets)
+        self._bounds = [int(bucket * 10**9) for bucket in self.buckets]
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+
+    def observe(self,
+                latency: int,
+                failed: bool=False):
+        """Records a call.
+        :param latency: The latency of the call, in nanoseconds
+        :param failed: Whether the call raised an exception
+        """
+        bucket = bisect.bisect_left(self._bounds, latency)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.total += latency / 10**9
+            if failed:
+                self.errors += 1
+
+    def quantile(self,
+                 q: float) -> float:
+        """
+        :param q: A number between 0 and 1
+        :return: An upper bound of the q-quantile of the latencies, in seconds, taken
+            from the buckets. None if there are no calls, inf if it is beyond the last
+            bounded bucket.
+        """
+        with self._lock:
+            counts = list(self.counts)
+        rank = q * sum(counts)
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            if bucket_count > 0 and cumulative >= rank:
+                return bound
+        return None
+
+
+def _timed(function, histogram: Histogram):
+    perf_counter_ns = time.perf_counter_ns
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            histogram.observe(perf_counter_ns() - start, failed=True)
+            raise
+        histogram.observe(perf_counter_ns() - start)
+        return result
+
+    return wrapper
+
+
+class Instrumentation:
+
+    """A set of metrics about the hot paths of the exchanges it watches
+
+    Latency histograms, with their counters, are kept for each operation in OPERATIONS.
+    The gauges, the number of trades held by each stock and the number of them in its
+    current pricing window, are read from the watched exchanges when metrics are
+    rendered, so they cost nothing on the hot paths.
+
+    .. note:: Only one instance may be enabled at a time, since the wrappers are
+        installed on the classes themselves, and thus apply to every exchange and stock.
+        The instance may be used as a context manager, which enables it on entry and
+        disables it on exit.
+    """
+
+    _enabled = None
+    _enabled_lock = threading.Lock()
+
+    def __init__(self,
+                 buckets: [float]=DEFAULT_BUCKETS):
+        """
+        :param buckets: The upper bounds of the buckets of the latency histograms, in
+            seconds.
+        """
+        self.histograms = {operation: Histogram(buckets) for operation, _, _ in OPERATIONS}
+        self._exchanges = []
+        self._originals = []
+
+    @property
+    def enabled(self) -> bool:
+        return Instrumentation._enabled is self
+
+    def enable(self):
+        """Installs the timing wrappers.
+        :raise ValueError:
+        """
+        with Instrumentation._enabled_lock:
+            if Instrumentation._enabled is self:
+                return
+            elif Instrumentation._enabled is not None:
+                msg = "Another instance of Instrumentation is already enabled."
+                raise ValueError(msg)
+
+            for operation, cls, name in OPERATIONS:
+                original = cls.__dict__[name]
+                histogram = self.histograms[operation]
+                if isinstance(original, property):
+                    wrapped = property(_timed(original.fget, histogram),
+                                       doc=original.__doc__)
+                else:
+                    wrapped = _timed(original, histogram)
+                self._originals.append((cls, name, original))
+                setattr(cls, name, wrapped)
+
+            Instrumentation._enabled = self
+
+    def disable(self):
+        """Removes the timing wrappers, so that the original methods are called again."""
+        with Instrumentation._enabled_lock:
+            if Instrumentation._enabled is not self:
+                return
+
+            for cls, name, original in reversed(self._originals):
+                setattr(cls, name, original)
+            self._originals = []
+            Instrumentation._enabled = None
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def watch(self,
+              exchange: GlobalBeverageCorporationExchange):
+        """Adds the stocks of an exchange to the gauges.
+        :param exchange: The exchange to watch
+        """
+        self._exchanges.append(exchange)
+
+    def gauges(self) -> {str: {str: int}}:
+        """
+        :return: For each gauge, its value for the ticker symbol of each stock of the
+            watched exchanges. The trades in the window are those of the interval of the
+            latest price query, and are left out for stocks never queried.
+        """
+        store_trades = {}
+        window_trades = {}
+        for exchange in self._exchanges:
+            for stock in exchange.stocks:
+                name = stock.ticker_symbol.name
+                store_trades[name] = len(stock.trades)
+                if stock._window_start is not None:
+                    window_trades[name] = len(stock.trades) - stock._window_index
+        return {'store_trades': store_trades,
+                'window_trades': window_trades}
+
+    def render(self) -> str:
+        """
+        :return: All the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def metric(name: str, kind: str, help: str):
+            lines.append('# HELP {prefix}_{name} {help}'.format(prefix=_PREFIX,
+                                                                 name=name,
+                                                                 help=help))
+            lines.append('# TYPE {prefix}_{name} {kind}'.format(prefix=_PREFIX,
+                                                                 name=name,
+                                                                 kind=kind))
+
+        def sample(name: str, labels: str, value):
+            lines.append('{prefix}_{name}{{{labels}}} {value}'.format(prefix=_PREFIX,
+                                                                      name=name,
+                                                                      labels=labels,
+                                                                      value=value))
+
+        labels = {operation: 'operation={}'.format(_label_value(operation))
+                  for operation in self.histograms}
+
+        metric('calls_total', 'counter', 'Calls per operation.')
+        for operation, histogram in self.histograms.items():
+            sample('calls_total', labels[operation], histogram.count)
+
+        metric('errors_total', 'counter', 'Calls per operation that raised an exception.')
+        for operation, histogram in self.histograms.items():
+            sample('errors_total', labels[operation], histogram.errors)
+
+        metric('latency_seconds', 'histogram', 'Latency per operation.')
+        for operation, histogram in self.histograms.items():
+            with histogram._lock:
+                counts = list(histogram.counts)
+                total = histogram.total
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                sample('latency_seconds_bucket',
+                       '{labels},le="{le}"'.format(
+                           labels=labels[operation],
+                           le='+Inf' if bound == float('inf') else repr(bound)),
+                       cumulative)
+            sample('latency_seconds_sum', labels[operation], repr(total))
+            sample('latency_seconds_count', labels[operation], cumulative)
+
+        helps = {'store_trades': 'Trades held by each stock.',
+                 'window_trades': 'Trades in the pricing window of each stock.'}
+        for gauge, values in self.gauges().items():
+            metric(gauge, 'gauge', helps[gauge])
+            for name, value in values.items():
+                sample(gauge, 'ticker_symbol={}'.format(_label_value(name)), value)
+
+        return ''.join(line + '\n' for line in lines)
+
+    def write(self,
+              path: str):
+        """Writes the rendered metrics to a file.
+        :param path: The path of the file
+        .. note:: The file is replaced atomically, so readers never see it half written.
+        """
+        temporary_path = '{path}.{pid}.tmp'.format(path=path, pid=os.getpid())
+        with open(temporary_path, 'w') as file:
+            file.write(self.render())
+        os.replace(temporary_path, path)
+
+    def serve(self,
+              host: str='127.0.0.1',
+              port: int=0) -> ThreadingHTTPServer:
+        """Serves the rendered metrics over HTTP from a daemon thread.
+        :param host: The address to bind to, the loopback interface by default
+        :param port: The port to bind to, any free one by default
+        :return: The server, whose server_address holds the actual port. Its shutdown
+            method stops it.
+        """
+        instrumentation = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = instrumentation.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
@@ -0,0 +1,441 @@
+"""An asyncio service that ingests trades into and answers queries about a GBCE
+
+The service speaks a line-based text protocol. Each request is a line of whitespace
+separated fields, and gets exactly one response line, in the order in which requests
+were sent on the connection:
+
+- ``TRADE <ticker symbol> <epoch ns> <quantity> <price per share> <BUY|SELL>``: records a
+  trade. Trades are buffered and ingested in batches, and the ``OK`` response is only
+  sent once the batch that contains the trade has been recorded.
+- ``PRICE <ticker symbol> [<epoch ns>]``: Stock.price at the given time, by
+  default the as-of time of the exchange, see GlobalBeverageCorporationExchange.as_of.
+- ``TICKER_PRICE <ticker symbol>``: Stock.ticker_price.
+- ``DIVIDEND_YIELD <ticker symbol>``: Stock.dividend_yield.
+- ``PE_RATIO <ticker symbol>``: Stock.price_earnings_ratio.
+- ``INDEX [<epoch ns>]``: GlobalBeverageCorporationExchange.all_share_index, at the same
+  default time.
+
+Queries answer ``VALUE <number>``, or ``VALUE NONE`` when the value is None. Wrong
+requests answer ``ERROR <message>``. Before a query is answered, buffered trades are
+recorded, so a connection always sees its own trades.
+
+Usage::
+
+    $ python -m super_simple_stocks_server serve --port 8888
+    $ python -m super_simple_stocks_server load --port 8888 --trades 1000000
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+from datetime import datetime
+from itertools import repeat
+
+from super_simple_stocks import (TickerSymbol,
+                                 BuySellIndicator,
+                                 GlobalBeverageCorporationExchange,
+                                 TICKER_SYMBOLS,
+                                 from_epoch_ns,
+                                 sample_stocks,
+                                 to_epoch_ns)
+
+# The values of the int64 columns of TradeStore.
+_INT64_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+class TradeIngestionServer:
+
+    """Serves a GlobalBeverageCorporationExchange over TCP or Unix sockets
+
+    Trades received from all connections are buffered together and recorded by means of
+    GlobalBeverageCorporationExchange.ingest, either when the buffer holds batch_size
+    trades or every flush_interval seconds, whatever happens first.
+
+    .. note:: Trades are checked one by one before they are buffered, so that a wrong
+        trade fails its own request only. Should a batch still be rejected, its trades
+        are recorded one by one, and only those that are rejected again fail.
+
+    .. note:: Backpressure is applied at two points. Connections stop being read while
+        the buffer holds max_pending trades, and each connection stops being read while
+        max_pending of its responses have not been written, which happens if its client
+        does not read them. In both cases, the kernel socket buffers eventually fill up
+        and the clients block.
+    """
+
+    def __init__(self,
+                 exchange: GlobalBeverageCorporationExchange,
+                 batch_size: int=1000,
+                 flush_interval: float=0.005,
+                 max_pending: int=100000):
+        """
+        :param exchange: The exchange that records the trades and answers the queries
+        :param batch_size: The number of buffered trades that triggers a flush
+        :param flush_interval: The maximum number of seconds a trade stays buffered
+        :param max_pending: The number of buffered trades, or of unwritten responses of
+            a connection, at which reading from connections is paused
+        :raise ValueError:
+        """
+        if batch_size <= 0 or flush_interval <= 0 or max_pending < batch_size:
+            msg = "Arguments should satisfy 0 < batch_size <= max_pending and 0 < flush_interval."
+            raise ValueError(msg)
+
+        self.exchange = exchange
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+
+        self._columns = ([], [], [], [], [])
+        self._acknowledgements = []
+        self._drained = None
+        self._flusher = None
+        self._server = None
+
+        self._queries = {
+            'PRICE': self._price,
+            'TICKER_PRICE': self._ticker_price,
+            'DIVIDEND_YIELD': self._dividend_yield,
+            'PE_RATIO': self._price_earnings_ratio,
+            'INDEX': self._all_share_index,
+        }
+
+    async def start(self,
+                    host: str=None,
+                    port: int=None,
+                    path: str=None):
+        """Starts listening on a TCP address, or on a Unix socket if path is given.
+        :param host: The host to listen on
+        :param port: The TCP port to listen on, 0 for any free one
+        :param path: The path of the Unix socket to listen on
+        """
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._flusher = asyncio.ensure_future(self._flush_periodically())
+
+        if path is not None:
+            self._server = await asyncio.start_unix_server(self._handle, path=path)
+        else:
+            self._server = await asyncio.start_server(self._handle, host=host, port=port)
+
+    @property
+    def sockets(self):
+        return self._server.sockets
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stops listening and records the trades that are still buffered."""
+        self._server.close()
+        await self._server.wait_closed()
+        self._flusher.cancel()
+        self.flush()
+
+    def flush(self):
+        """Records the buffered trades and acknowledges them."""
+        if len(self._acknowledgements) == 0:
+            return
+
+        columns = self._columns
+        acknowledgements = self._acknowledgements
+        self._columns = ([], [], [], [], [])
+        self._acknowledgements = []
+
+        response = self._ingest(columns)
+        if response == 'OK':
+            responses = repeat(response)
+        else:
+            responses = (self._ingest(tuple([value] for value in row))
+                         for row in zip(*columns))
+
+        for acknowledgement, response in zip(acknowledgements, responses):
+            if not acknowledgement.done():
+                acknowledgement.set_result(response)
+
+        self._drained.set()
+
+    def _ingest(self,
+                columns: tuple) -> str:
+        """
+        :param columns: The columns of a batch of trades
+        :return: The response line to the requests of the trades
+        """
+        try:
+            self.exchange.ingest(*columns)
+        except Exception as error:
+            return 'ERROR {error}'.format(error=error)
+        else:
+            return 'OK'
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def _handle(self,
+                      reader: asyncio.StreamReader,
+                      writer: asyncio.StreamWriter):
+        responses = asyncio.Queue(maxsize=self.max_pending)
+        responder = asyncio.ensure_future(self._respond(responses, writer))
+
+        try:
+            while True:
+                await self._drained.wait()
+                line = await reader.readline()
+                if not line:
+                    break
+                await responses.put(self._request(line))
+        except ConnectionError:
+            pass
+        finally:
+            await responses.put(None)
+            await responder
+
+    async def _respond(self,
+                       responses: asyncio.Queue,
+                       writer: asyncio.StreamWriter):
+        try:
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                writer.write((await response).encode() + b'\n')
+                if responses.empty():
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _request(self,
+                 line: bytes) -> asyncio.Future:
+        """
+        :param line: A request line
+        :return: A future for its response line
+        """
+        response = asyncio.get_event_loop().create_future()
+        fields = line.decode().split()
+
+        try:
+            if len(fields) == 0:
+                raise ValueError("Empty request.")
+            elif fields[0] == 'TRADE':
+                self._buffer_trade(fields[1:], response)
+            elif fields[0] in self._queries:
+                self.flush()
+                response.set_result(self._value(self._queries[fields[0]](*fields[1:])))
+            else:
+                raise ValueError("Unknown request {name}.".format(name=fields[0]))
+        except Exception as error:
+            response.set_result('ERROR {error}'.format(error=error))
+
+        return response
+
+    def _buffer_trade(self,
+                      fields: [str],
+                      acknowledgement: asyncio.Future):
+        ticker_name, timestamp, quantity, price_per_share, indicator_name = fields
+        ticker_symbol = self._ticker_symbol(ticker_name)
+        buy_sell_indicator = self._buy_sell_indicator(indicator_name)
+        timestamp = int(timestamp)
+        quantity = int(quantity)
+        price_per_share = float(price_per_share)
+
+        self.exchange.get_stock(ticker_symbol)
+        if timestamp not in _INT64_RANGE:
+            raise ValueError("The timestamp is out of range.")
+        elif quantity <= 0 or quantity not in _INT64_RANGE:
+            raise ValueError("The quantity of shares has to be positive and in range.")
+        elif not (math.isfinite(price_per_share) and price_per_share >= 0.0):
+            raise ValueError("The price per share has to be finite and can not be negative.")
+
+        values = (ticker_symbol, timestamp, quantity, price_per_share, buy_sell_indicator)
+        for column, value in zip(self._columns, values):
+            column.append(value)
+        self._acknowledgements.append(acknowledgement)
+
+        if len(self._acknowledgements) >= self.max_pending:
+            self._drained.clear()
+        if len(self._acknowledgements) == self.batch_size:
+            asyncio.get_event_loop().call_soon(self.flush)
+
+    @staticmethod
+    def _ticker_symbol(name: str) -> TickerSymbol:
+        # Unknown names are not interned, so that requests can not grow the registry.
+        ticker_symbol = TICKER_SYMBOLS.get(name)
+        if ticker_symbol is None:
+            raise ValueError("Unknown ticker symbol {name}.".format(name=name))
+        return ticker_symbol
+
+    @staticmethod
+    def _buy_sell_indicator(name: str) -> BuySellIndicator:
+        try:
+            return BuySellIndicator[name]
+        except KeyError:
+            raise ValueError("Unknown buy/sell indicator {name}.".format(name=name)) from None
+
+    @staticmethod
+    def _value(value: float) -> str:
+        if value is None:
+            return 'VALUE NONE'
+        else:
+            return 'VALUE {value!r}'.format(value=value)
+
+    def _current_time(self, timestamp: str=None) -> datetime:
+        if timestamp is None:
+            return self.exchange.as_of
+        else:
+            return from_epoch_ns(int(timestamp))
+
+    def _price(self, ticker_name: str, timestamp: str=None) -> float:
+        stock = self.exchange.get_stock(self._ticker_symbol(ticker_name))
+        return stock.price(self._current_time(timestamp))
+
+    def _ticker_price(self, ticker_name: str) -> float:
+        return self.exchange.get_stock(self._ticker_symbol(ticker_name)).ticker_price
+
+    def _dividend_yield(self, ticker_name: str) -> float:
+        return self.exchange.get_stock(self._ticker_symbol(ticker_name)).dividend_yield
+
+    def _price_earnings_ratio(self, ticker_name: str) -> float:
+        return self.exchange.get_stock(self._ticker_symbol(ticker_name)).price_earnings_ratio
+
+    def _all_share_index(self, timestamp: str=None) -> float:
+        return self.exchange.all_share_index(self._current_time(timestamp))
+
+
+def generate_trade_requests(n: int,
+                            seed: int=0) -> [bytes]:
+    """
+    :param n: The number of requests to generate
+    :param seed: The seed of the random values
+    :return: n TRADE request lines for random trades of the sample stocks, starting now
+    """
+    rng = random.Random(seed)
+    start = to_epoch_ns(datetime.now())
+    ticker_names = [ticker_symbol.name for ticker_symbol in TickerSymbol]
+    indicator_names = [indicator.name for indicator in BuySellIndicator]
+
+    return ['TRADE {0} {1} {2} {3:.2f} {4}\n'.format(rng.choice(ticker_names),
+                                                      start + i * 1000,
+                                                      rng.randint(1, 1000),
+                                                      rng.uniform(50.0, 150.0),
+                                                      rng.choice(indicator_names)).encode()
+            for i in range(n)]
+
+
+async def run_load(requests: [bytes],
+                   host: str=None,
+                   port: int=None,
+                   path: str=None,
+                   connections: int=4,
+                   window: int=1000) -> dict:
+    """Sends requests to a running server and measures how it copes with them.
+    :param requests: The request lines to send, spread among the connections
+    :param host: The host of the server
+    :param port: The TCP port of the server
+    :param path: The path of the Unix socket of the server, instead of host and port
+    :param connections: The number of concurrent connections
+    :param window: The maximum number of requests in flight per connection
+    :return: The number of requests, their throughput per second, and the p50, p99
+        and maximum latencies in seconds, plus the number of error responses
+    """
+    latencies = []
+    errors = 0
+
+    async def connection(requests):
+        nonlocal errors
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+
+        in_flight = asyncio.Semaphore(window)
+        sent_at = []
+
+        async def receive():
+            nonlocal errors
+            for i in range(len(requests)):
+                line = await reader.readline()
+                latencies.append(time.perf_counter() - sent_at[i])
+                if line.startswith(b'ERROR'):
+                    errors += 1
+                in_flight.release()
+
+        receiver = asyncio.ensure_future(receive())
+        for request in requests:
+            await in_flight.acquire()
+            sent_at.append(time.perf_counter())
+            writer.write(request)
+            if in_flight.locked():
+                await writer.drain()
+        await receiver
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(connection(requests[i::connections]) for i in range(connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        'requests': n,
+        'throughput': n / elapsed,
+        'p50_latency': latencies[n // 2] if n > 0 else None,
+        'p99_latency': latencies[min(n - 1, n * 99 // 100)] if n > 0 else None,
+        'max_latency': latencies[-1] if n > 0 else None,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    for command in ('serve', 'load'):
+        subparser = subparsers.add_parser(command)
+        subparser.add_argument('--host', default='127.0.0.1')
+        subparser.add_argument('--port', type=int, default=8888)
+        subparser.add_argument('--unix', dest='path', default=None,
+                               help='path of a Unix socket, instead of host and port')
+
+    serve_parser = subparsers.choices['serve']
+    serve_parser.add_argument('--batch-size', type=int, default=1000)
+    serve_parser.add_argument('--flush-interval', type=float, default=0.005)
+    serve_parser.add_argument('--max-pending', type=int, default=100000)
+
+    load_parser = subparsers.choices['load']
+    load_parser.add_argument('--trades', type=int, default=100000)
+    load_parser.add_argument('--connections', type=int, default=4)
+    load_parser.add_argument('--window', type=int, default=1000)
+
+    args = parser.parse_args()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    if args.command == 'serve':
+        server = TradeIngestionServer(GlobalBeverageCorporationExchange(sample_stocks()),
+                                      batch_size=args.batch_size,
+                                      flush_interval=args.flush_interval,
+                                      max_pending=args.max_pending)
+        loop.run_until_complete(server.start(args.host, args.port, args.path))
+        try:
+            loop.run_until_complete(server.serve_forever())
+        except KeyboardInterrupt:
+            loop.run_until_complete(server.close())
+    else:
+        requests = generate_trade_requests(args.trades)
+        results = loop.run_until_complete(run_load(requests,
+                                                   args.host,
+                                                   args.port,
+                                                   args.path,
+                                                   args.connections,
+                                                   args.window))
+        for name, value in results.items():
+            print('{name:<12} {value}'.format(name=name, value=value))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,346 @@
+"""A GBCE whose stocks are partitioned across worker processes
+
+A single GlobalBeverageCorporationExchange runs on a single core. The
+ShardedGlobalBeverageCorporationExchange in this module spreads its stocks among a
+number of shards, each one being a worker process that owns a
+GlobalBeverageCorporationExchange with its share of the stocks. Trades are validated
+in the calling process, and sent in batches to every shard, which picks the trades of
+its own stocks.
+
+The calling process validates and packs every trade by means of operations mapped over
+whole columns, which cost a fraction of what recording the trades costs in the shards.
+That fraction is paid serially, so it bounds the speedup of ingestion however many
+shards there are, see benchmarks.sharding.
+"""
+
+import multiprocessing
+import os
+import pickle
+from array import array
+from datetime import datetime
+from itertools import compress
+
+from super_simple_stocks import (TickerSymbol,
+                                 BuySellIndicator,
+                                 Stock,
+                                 Trade,
+                                 GlobalBeverageCorporationExchange,
+                                 combine_all_share_index_terms,
+                                 to_epoch_ns,
+                                 from_epoch_ns,
+                                 validate_trade_columns)
+
+
+def _columns(ticker_ids: [int]=(),
+             timestamps: [int]=(),
+             quantities: [int]=(),
+             prices: [float]=(),
+             sides: [int]=()) -> tuple:
+    """
+    :return: The columns of a batch of trades as arrays of machine values, in the order
+        of the arguments.
+    :raise TypeError:
+    :raise OverflowError:
+    """
+    return (array('I', ticker_ids),
+            array('q', timestamps),
+            array('q', quantities),
+            array('d', prices),
+            array('b', sides))
+
+
+def _unpack(packed: tuple) -> tuple:
+    columns = []
+    for typecode, data in zip('Iqqdb', packed):
+        column = array(typecode)
+        column.frombytes(data)
+        columns.append(column)
+    return tuple(columns)
+
+
+def _run_shard(connection,
+               stocks: [Stock],
+               ticker_ids: [int]):
+    """Serves the requests of a ShardedGlobalBeverageCorporationExchange for its stocks.
+    :param connection: The end of the pipe owned by the shard
+    :param stocks: The stocks owned by the shard
+    :param ticker_ids: The ids of the ticker symbols of the stocks in the calling
+        process, which are used in requests. They may differ from those in the shard.
+    .. note:: Every reply is a pair of whether the request succeeded and either its value
+        or the exception it raised. Batches of trades get no reply, so the exception
+        raised by one, if any, is the reply to the next request that expects one.
+    """
+    exchange = GlobalBeverageCorporationExchange(stocks)
+    ticker_symbols_by_id = {ticker_id: stock.ticker_symbol
+                            for ticker_id, stock in zip(ticker_ids, stocks)}
+    ingest_error = None
+
+    while True:
+        request = connection.recv()
+        name = request[0]
+
+        if name == 'stop':
+            connection.close()
+            return
+        elif name == 'ingest':
+            try:
+                ticker_ids, *columns = _unpack(request[1])
+                owned = list(map(ticker_symbols_by_id.__contains__, ticker_ids))
+                ticker_symbols = list(map(ticker_symbols_by_id.__getitem__,
+                                          compress(ticker_ids, owned)))
+                exchange._record_columns(ticker_symbols,
+                                         *(list(compress(column, owned))
+                                           for column in columns))
+            except Exception as error:
+                ingest_error = ingest_error or error
+            continue
+        elif ingest_error is not None:
+            connection.send((False, ingest_error))
+            ingest_error = None
+            continue
+
+        try:
+            if name == 'index':
+                value = exchange.all_share_index_terms(from_epoch_ns(request[1]))
+            else:
+                _, ticker_id, attribute, args = request
+                stock = exchange.get_stock(ticker_symbols_by_id[ticker_id])
+                value = getattr(stock, attribute)
+                if len(args) > 0:
+                    value = value(*(from_epoch_ns(arg) for arg in args))
+        except Exception as error:
+            connection.send((False, error))
+        else:
+            connection.send((True, value))
+
+
+class ShardedGlobalBeverageCorporationExchange:
+
+    """The whole exchange, with its stocks partitioned across worker processes
+
+    Stocks are assigned to shards in a round-robin fashion. Each shard is a process that
+    owns its stocks. Batches of trades are packed once as machine values and sent through
+    a pipe to every shard, which records those of its stocks, so that the calling process
+    does no routing. Ingestion is pipelined: the calling process does not wait for the
+    shards to record a batch before going on.
+
+    The All Share Index is obtained by gathering the sums of the log prices of every
+    shard, see GlobalBeverageCorporationExchange.all_share_index_terms.
+
+    .. note:: Instances are to be closed, either explicitly or by using them as context
+        managers, so that the worker processes are stopped.
+    """
+
+    def __init__(self,
+                 stocks: [Stock],
+                 shards: int=None,
+                 batch_size: int=10000):
+        """
+        :param stocks: The stocks traded at this exchange.
+        :param shards: The number of worker processes. By default, the number of CPUs.
+            It is capped at the number of stocks.
+        :param batch_size: The number of buffered trades that triggers sending them to
+            the shards.
+        :raise ValueError:
+        """
+        if len(stocks) == 0:
+            msg = "Argument stocks={stocks} should be a non empty sequence.".format(stocks=stocks)
+            raise ValueError(msg)
+        elif len({stock.ticker_symbol for stock in stocks}) != len(stocks):
+            msg = "Argument stocks={stocks} has repeated ticker symbols.".format(stocks=stocks)
+            raise ValueError(msg)
+        elif (shards is not None and shards <= 0) or batch_size <= 0:
+            msg = "Arguments shards and batch_size should be positive."
+            raise ValueError(msg)
+
+        shards = min(shards or os.cpu_count() or 1, len(stocks))
+
+        self.batch_size = batch_size
+        self._shard_of = {stock.ticker_symbol: i % shards for i, stock in enumerate(stocks)}
+        # Keyed by id(), since ticker symbols are unique per name and their hashes are
+        # computed in Python.
+        self._ticker_ids = {id(stock.ticker_symbol): stock.ticker_symbol.id
+                            for stock in stocks}
+        self._buffer = _columns()
+
+        self._connections = []
+        self._processes = []
+        for shard in range(shards):
+            shard_stocks = [stock for stock in stocks
+                            if self._shard_of[stock.ticker_symbol] == shard]
+            connection, shard_connection = multiprocessing.Pipe()
+            shard_ticker_ids = [stock.ticker_symbol.id for stock in shard_stocks]
+            process = multiprocessing.Process(target=_run_shard,
+                                              args=(shard_connection,
+                                                    shard_stocks,
+                                                    shard_ticker_ids),
+                                              daemon=True)
+            process.start()
+            shard_connection.close()
+            self._connections.append(connection)
+            self._processes.append(process)
+
+    @property
+    def shards(self) -> int:
+        return len(self._processes)
+
+    def _shard(self,
+               ticker_symbol: TickerSymbol) -> int:
+        try:
+            return self._shard_of[ticker_symbol]
+        except KeyError:
+            msg = "No stock with ticker symbol {ticker_symbol} is listed.".format(
+                ticker_symbol=ticker_symbol)
+            raise ValueError(msg) from None
+
+    def record_trade(self,
+                     trade: Trade):
+        """Records a trade for the proper stock.
+        :param trade: The trade to record.
+        :raise ValueError:
+        """
+        self.record_trades([trade])
+
+    def record_trades(self,
+                      trades: [Trade]):
+        """Records a batch of trades, each one for its proper stock.
+        :param trades: The trades to record.
+        :raise ValueError:
+        """
+        trades = list(trades)
+        self.ingest([trade.ticker_symbol for trade in trades],
+                    [to_epoch_ns(trade.timestamp) for trade in trades],
+                    [trade.quantity for trade in trades],
+                    [trade.price_per_share for trade in trades],
+                    [trade.buy_sell_indicator for trade in trades])
+
+    def ingest(self,
+               ticker_symbols: [TickerSymbol],
+               timestamps: [int],
+               quantities: [int],
+               prices: [float],
+               buy_sell_indicators: [BuySellIndicator]):
+        """Records a batch of trades given as columns, each one for its proper stock.
+        :raise ValueError:
+        :raise TypeError:
+        :raise OverflowError:
+        .. note:: See GlobalBeverageCorporationExchange.ingest. The batch is validated
+            and converted to machine values as a whole before it is buffered, so nothing
+            is recorded if any value is wrong.
+        """
+        sides = validate_trade_columns(ticker_symbols,
+                                       timestamps,
+                                       quantities,
+                                       prices,
+                                       buy_sell_indicators)
+        if len(sides) == 0:
+            return
+
+        ticker_ids = list(map(self._ticker_ids.get, map(id, ticker_symbols)))
+        if None in ticker_ids:
+            self._shard(ticker_symbols[ticker_ids.index(None)])
+        columns = _columns(ticker_ids, timestamps, quantities, prices, sides)
+
+        for column, batch_column in zip(self._buffer, columns):
+            column.extend(batch_column)
+        if len(self._buffer[0]) >= self.batch_size:
+            self.flush()
+
+    @staticmethod
+    def _result(reply: tuple):
+        succeeded, value = reply
+        if succeeded:
+            return value
+        else:
+            raise value
+
+    def flush(self):
+        """Sends the buffered trades to the shards."""
+        buffer = self._buffer
+        if len(buffer[0]) > 0:
+            self._buffer = _columns()
+            # Pickled once rather than by every Connection.send.
+            request = pickle.dumps(('ingest', tuple(column.tobytes() for column in buffer)))
+            for connection in self._connections:
+                connection.send_bytes(request)
+
+    def _stock_request(self,
+                       ticker_symbol: TickerSymbol,
+                       attribute: str,
+                       *args):
+        shard = self._shard(ticker_symbol)
+        self.flush()
+        connection = self._connections[shard]
+        connection.send(('stock', ticker_symbol.id, attribute, args))
+        return self._result(connection.recv())
+
+    def price(self,
+              ticker_symbol: TickerSymbol,
+              current_time: datetime) -> float:
+        """
+        :return: Stock.price for the stock identified by ticker_symbol.
+        :raise ValueError:
+        """
+        return self._stock_request(ticker_symbol, 'price', to_epoch_ns(current_time))
+
+    def ticker_price(self,
+                     ticker_symbol: TickerSymbol) -> float:
+        """
+        :return: Stock.ticker_price for the stock identified by ticker_symbol.
+        :raise AttributeError:
+        :raise ValueError:
+        """
+        return self._stock_request(ticker_symbol, 'ticker_price')
+
+    def dividend_yield(self,
+                       ticker_symbol: TickerSymbol) -> float:
+        """
+        :return: Stock.dividend_yield for the stock identified by ticker_symbol.
+        :raise AttributeError:
+        :raise ValueError:
+        """
+        return self._stock_request(ticker_symbol, 'dividend_yield')
+
+    def price_earnings_ratio(self,
+                             ticker_symbol: TickerSymbol) -> float:
+        """
+        :return: Stock.price_earnings_ratio for the stock identified by ticker_symbol.
+        :raise AttributeError:
+        :raise ValueError:
+        """
+        return self._stock_request(ticker_symbol, 'price_earnings_ratio')
+
+    def all_share_index(self,
+                        current_time: datetime) -> float:
+        """
+        :param current_time: The point of time for which we want to obtain the index.
+        :return: The geometric mean of all stock prices. Returns None if any of them is
+            None.
+        .. note:: Every shard computes the terms for its stocks at the same time.
+        """
+        self.flush()
+        current_time = to_epoch_ns(current_time)
+        for connection in self._connections:
+            connection.send(('index', current_time))
+        replies = [connection.recv() for connection in self._connections]
+        return combine_all_share_index_terms([self._result(reply) for reply in replies])
+
+    def close(self):
+        """Records the buffered trades and stops the worker processes."""
+        if len(self._processes) == 0:
+            return
+
+        self.flush()
+        for connection in self._connections:
+            connection.send(('stop',))
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
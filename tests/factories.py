@@ -1,13 +1,24 @@
-from datetime import datetime
+import random
+from datetime import datetime, timedelta
 
-from super_simple_stocks import (TickerSymbol,
+from super_simple_stocks import (BuySellIndicator,
+                                 TickerSymbol,
                                  Trade,
                                  Stock,
                                  CommonStock,
-                                 PreferredStock)
+                                 PreferredStock,
+                                 intern_ticker_symbol)
 from .fixture_data import STOCKS, TRADES
 
 
+class CommonStockWithBars(CommonStock):
+
+    bar_resolutions = (timedelta(hours=1), timedelta(minutes=1), timedelta(seconds=1))
+
+
+START = datetime(1929, 10, 24, 9, 30)
+
+
 class TradeFactory:
 
     @staticmethod
@@ -34,12 +45,43 @@ class TradeFactory:
     def get_trade_for_stock(ticker_symbol: TickerSymbol):
         return next(iter(TradeFactory.get_trades_for_stock(ticker_symbol)))
 
+    @staticmethod
+    def get_buy_trade(ticker_symbol: TickerSymbol,
+                      timestamp: datetime,
+                      price_per_share: float=100.0,
+                      quantity: int=10) -> Trade:
+        return Trade(ticker_symbol=ticker_symbol,
+                     timestamp=timestamp,
+                     quantity=quantity,
+                     price_per_share=price_per_share,
+                     buy_sell_indicator=BuySellIndicator.BUY)
+
+    @staticmethod
+    def get_sequential_trades(ticker_symbols: [TickerSymbol],
+                              n: int) -> [Trade]:
+        return [Trade(ticker_symbol=ticker_symbols[i % len(ticker_symbols)],
+                      timestamp=START + timedelta(seconds=i),
+                      quantity=1 + i % 7,
+                      price_per_share=50.0 + i % 11,
+                      buy_sell_indicator=BuySellIndicator.BUY)
+                for i in range(n)]
+
+    @staticmethod
+    def get_random_trades(ticker_symbol: TickerSymbol,
+                          n: int,
+                          seed: int=0) -> [Trade]:
+        rng = random.Random(seed)
+        return [Trade(ticker_symbol=ticker_symbol,
+                      timestamp=START + timedelta(seconds=rng.randint(0, 7200)),
+                      quantity=rng.randint(1, 10**6),
+                      price_per_share=rng.randint(1, 10**7) / 10**4,
+                      buy_sell_indicator=rng.choice(list(BuySellIndicator)))
+                for _ in range(n)]
+
     @staticmethod
     def from_tuple(trade_data: tuple) -> Trade:
-        datetime_str_format = '%Y-%m-%dT%H:%M:%S'
         return Trade(ticker_symbol=trade_data[0],
-                     timestamp=datetime.strptime(trade_data[1],
-                                                 datetime_str_format),
+                     timestamp=datetime.fromisoformat(trade_data[1]),
                      quantity=trade_data[2],
                      price_per_share=trade_data[3],
                      buy_sell_indicator=trade_data[4])
@@ -71,6 +113,10 @@ class StockFactory:
 
         return stocks
 
+    @staticmethod
+    def get_interned_stocks(names: [str]) -> [CommonStock]:
+        return [CommonStock(intern_ticker_symbol(name), 100.0, 8.0) for name in names]
+
     @staticmethod
     def get_stock() -> Stock:
         return next(iter(StockFactory.get_stocks(1)))
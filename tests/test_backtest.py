@@ -0,0 +1,134 @@
+import io
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (BuySellIndicator,
+                                 GlobalBeverageCorporationExchange,
+                                 TickerSymbol,
+                                 Trade,
+                                 TradeLogWriter,
+                                 to_epoch_ns)
+from super_simple_stocks_backtest import backtest, replay_day, trade_days, write_samples
+from .factories import StockFactory
+
+
+def day_trades(day: datetime, n: int) -> [Trade]:
+    ticker_symbols = list(TickerSymbol)
+    return [Trade(ticker_symbol=ticker_symbols[i % len(ticker_symbols)],
+                  timestamp=day + timedelta(seconds=37 * i),
+                  quantity=1 + i % 13,
+                  price_per_share=50.0 + i % 17 + day.day,
+                  buy_sell_indicator=list(BuySellIndicator)[i % 2])
+            for i in range(n)]
+
+
+def write_day(path: str, trades: [Trade]):
+    writer = TradeLogWriter(path)
+    writer.write([trade.ticker_symbol for trade in trades],
+                 [to_epoch_ns(trade.timestamp) for trade in trades],
+                 [trade.quantity for trade in trades],
+                 [trade.price_per_share for trade in trades],
+                 [trade.buy_sell_indicator.value for trade in trades])
+    writer.close()
+
+
+class BacktestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.days = {}
+        for day in range(24, 27):
+            start = datetime(1929, 10, day, 9, 30)
+            trades = day_trades(start, 200)
+            name = start.strftime('%Y-%m-%d')
+            self.days[name] = trades
+            write_day(os.path.join(self.directory.name, name + '.log'), trades[::-1])
+        open(os.path.join(self.directory.name, 'README'), 'w').close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def expected_samples(self, name: str, trades: [Trade], interval: timedelta) -> list:
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        current_time = trades[0].timestamp.replace(second=0) + interval
+        samples = []
+        pending = list(trades)
+        while len(pending) > 0:
+            while len(pending) > 0 and pending[0].timestamp <= current_time:
+                gbce.record_trade(pending.pop(0))
+            prices = {stock.ticker_symbol: stock.price(current_time) for stock in gbce.stocks}
+            ticker_prices = {stock.ticker_symbol: None if stock._last_trade is None
+                             else stock.ticker_price for stock in gbce.stocks}
+            samples.append((name, current_time, gbce.all_share_index(current_time),
+                            prices, ticker_prices))
+            current_time += interval
+        return samples
+
+    def test_trade_days(self):
+        self.assertEqual([os.path.basename(path)
+                          for path in trade_days(self.directory.name)],
+                         ['1929-10-24.log', '1929-10-25.log', '1929-10-26.log'])
+
+    def test_replay_day(self):
+        interval = timedelta(minutes=5)
+        path = trade_days(self.directory.name)[0]
+        samples = replay_day(path, StockFactory.get_stocks(), interval)
+        expected = self.expected_samples('1929-10-24', self.days['1929-10-24'], interval)
+        self.assertEqual(len(samples), len(expected))
+        for sample, expected_sample in zip(samples, expected):
+            self.assertEqual(sample[:2], expected_sample[:2])
+            self.assertAlmostEqual(sample.all_share_index, expected_sample[2])
+            self.assertEqual(sample.prices.keys(), expected_sample[3].keys())
+            for ticker_symbol, price in expected_sample[3].items():
+                if price is None:
+                    self.assertIsNone(sample.prices[ticker_symbol])
+                else:
+                    self.assertAlmostEqual(sample.prices[ticker_symbol], price)
+            self.assertEqual(sample.ticker_prices, expected_sample[4])
+
+    def test_backtest_matches_sequential_replays(self):
+        interval = timedelta(minutes=1)
+        stocks = StockFactory.get_stocks()
+        sequential = [sample
+                      for path in trade_days(self.directory.name)
+                      for sample in replay_day(path, stocks, interval)]
+        parallel = list(backtest(self.directory.name, stocks, interval, processes=2))
+        self.assertEqual(parallel, sequential)
+        self.assertEqual([sample.day for sample in parallel],
+                         sorted(sample.day for sample in parallel))
+        self.assertTrue(all(len(stock.trades) == 0 for stock in stocks))
+
+    def test_early_close(self):
+        samples = backtest(self.directory.name, StockFactory.get_stocks(), processes=1)
+        first = next(samples)
+        self.assertEqual(first.day, '1929-10-24')
+        samples.close()
+
+    def test_empty_day(self):
+        write_day(os.path.join(self.directory.name, '1929-10-27.log'), [])
+        samples = list(backtest(self.directory.name, StockFactory.get_stocks(), processes=2))
+        self.assertNotIn('1929-10-27', {sample.day for sample in samples})
+
+    def test_wrong_arguments(self):
+        with self.assertRaises(ValueError):
+            list(backtest(self.directory.name, StockFactory.get_stocks(), timedelta(0)))
+        with self.assertRaises(ValueError):
+            list(backtest(self.directory.name, StockFactory.get_stocks(), processes=0))
+
+    def test_write_samples(self):
+        stocks = StockFactory.get_stocks()
+        ticker_symbols = [stock.ticker_symbol for stock in stocks]
+        samples = replay_day(trade_days(self.directory.name)[0], stocks, timedelta(hours=1))
+        file = io.StringIO()
+        write_samples(samples, ticker_symbols, file)
+        lines = file.getvalue().splitlines()
+        self.assertEqual(len(lines), len(samples) + 1)
+        self.assertEqual(lines[0].split(',')[:5],
+                         ['day', 'time', 'all_share_index', 'TEA_price', 'TEA_ticker_price'])
+        self.assertTrue(lines[1].startswith('1929-10-24,1929-10-24T10:00:00,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
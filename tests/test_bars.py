@@ -0,0 +1,111 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (Bar,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 RetentionPolicy,
+                                 TickerSymbol,
+                                 Trade)
+from .factories import CommonStockWithBars
+
+
+class BarMergeTestCase(unittest.TestCase):
+
+    def test_merge(self):
+        rows = ((3, 10, 5.0), (1, 20, 4.0), (2, 10, 7.0), (3, 10, 6.0), (0, 5, 3.0))
+        whole = Bar(0)
+        first = Bar(0)
+        second = Bar(0)
+        for i, row in enumerate(rows):
+            whole.add(*row)
+            (first if i % 2 == 0 else second).add(*row)
+        first.merge(second)
+        first.merge(Bar(0))
+
+        self.assertEqual((first.open, first.high, first.low, first.close,
+                          first.volume, first.count),
+                         (whole.open, whole.high, whole.low, whole.close,
+                          whole.volume, whole.count))
+        self.assertAlmostEqual(first.vwap, whole.vwap)
+
+
+class StockBarTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.random = random.Random(14)
+        self.start = datetime(1929, 10, 24, 9, 30)
+        self.trades = [Trade(ticker_symbol=TickerSymbol.ALE,
+                             timestamp=self.start + timedelta(
+                                 milliseconds=self.random.randrange(3 * 3600 * 1000)),
+                             quantity=self.random.randint(1, 100),
+                             price_per_share=round(self.random.uniform(50.0, 150.0), 2),
+                             buy_sell_indicator=BuySellIndicator.SELL)
+                       for _ in range(2000)]
+        self.trades.sort(key=lambda trade: trade.timestamp)
+
+    def random_range(self) -> (datetime, datetime):
+        start = self.start + timedelta(milliseconds=self.random.randrange(-60000,
+                                                                          3 * 3600 * 1000))
+        return start, start + timedelta(milliseconds=self.random.randrange(4 * 3600 * 1000))
+
+    def assertBarOf(self, bar: Bar, trades: [Trade]):
+        self.assertEqual(bar.count, len(trades))
+        self.assertEqual(bar.volume, sum(trade.quantity for trade in trades))
+        if len(trades) == 0:
+            self.assertIsNone(bar.vwap)
+            return
+        prices = [trade.price_per_share for trade in trades]
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close),
+                         (prices[0], max(prices), min(prices), prices[-1]))
+        self.assertAlmostEqual(bar.vwap,
+                               sum(trade.total_price for trade in trades) /
+                               sum(trade.quantity for trade in trades))
+
+    def test_bar_matches_a_full_scan(self):
+        stock = CommonStockWithBars(TickerSymbol.ALE, 100.0, 23.0)
+        shuffled = list(self.trades)
+        self.random.shuffle(shuffled)
+        for trade in shuffled[:1000]:
+            stock.record_trade(trade)
+        stock.record_trades(shuffled[1000:])
+
+        for _ in range(200):
+            start, end = self.random_range()
+            with self.subTest(start=start, end=end):
+                self.assertBarOf(stock.bar(start, end),
+                                 [trade for trade in self.trades
+                                  if start <= trade.timestamp < end])
+
+    def test_bar_without_resolutions(self):
+        stock = CommonStock(TickerSymbol.ALE, 100.0, 23.0)
+        stock.record_trades(self.trades)
+
+        start, end = self.start + timedelta(minutes=7), self.start + timedelta(minutes=71)
+        self.assertBarOf(stock.bar(start, end),
+                         [trade for trade in self.trades if start <= trade.timestamp < end])
+
+    def test_bar_after_retention(self):
+        stock = CommonStockWithBars(TickerSymbol.ALE, 100.0, 23.0)
+        stock.retention_policy = RetentionPolicy(min_batch=10)
+        stock.record_trades(self.trades)
+        self.assertLess(len(stock.trades), len(self.trades))
+
+        horizon = self.trades[-1].timestamp - timedelta(minutes=20)
+        for _ in range(200):
+            start, end = self.random_range()
+            start = start.replace(second=0, microsecond=0)
+            if end.replace(second=0, microsecond=0) < horizon:
+                end = end.replace(second=0, microsecond=0)
+            with self.subTest(start=start, end=end):
+                self.assertBarOf(stock.bar(start, end),
+                                 [trade for trade in self.trades
+                                  if start <= trade.timestamp < end])
+
+    def test_no_bars_by_default(self):
+        stock = CommonStock(TickerSymbol.ALE, 100.0, 23.0)
+        stock.record_trades(self.trades[:1000])
+        for trade in self.trades[1000:]:
+            stock.record_trade(trade)
+        self.assertEqual(stock.bars, {})
@@ -0,0 +1,126 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from super_simple_stocks import (CommonStock,
+                                 GlobalBeverageCorporationExchange,
+                                 SimulatedClock,
+                                 TickerSymbol,
+                                 TradeClock,
+                                 WALL_CLOCK,
+                                 WallClock)
+from .factories import START, StockFactory, TradeFactory
+
+
+trade = TradeFactory.get_buy_trade
+
+
+class WallClockTestCase(unittest.TestCase):
+
+    def test_now(self):
+        clock = WallClock()
+        before = datetime.now()
+        first = clock.now()
+        second = clock.now()
+        self.assertLessEqual(first, second)
+        self.assertLess(abs(first - before), timedelta(seconds=1))
+
+    def test_follows_system_time_steps(self):
+        clock = WallClock()
+        system_times = [START, START + timedelta(hours=1), START + timedelta(minutes=30),
+                        START + timedelta(hours=2)]
+        with mock.patch('super_simple_stocks.datetime') as system_datetime:
+            system_datetime.now.side_effect = system_times
+            times = [clock.now() for _ in system_times]
+        self.assertEqual(times, [START, START + timedelta(hours=1),
+                                 START + timedelta(hours=1), START + timedelta(hours=2)])
+
+    def test_default(self):
+        stock = CommonStock(TickerSymbol.TEA, 100.0, 8.0)
+        self.assertIs(stock.clock, WALL_CLOCK)
+        stock.record_trade(trade(TickerSymbol.TEA, datetime.now() - timedelta(minutes=1)))
+        self.assertEqual(stock.price(), 100.0)
+        stock.record_trade(trade(TickerSymbol.TEA, datetime.now() - timedelta(hours=1), 50.0))
+        self.assertEqual(stock.price(), 100.0)
+
+
+class SimulatedClockTestCase(unittest.TestCase):
+
+    def test_advance(self):
+        clock = SimulatedClock(START)
+        ticks = []
+        clock.add_observer(ticks.append)
+        self.assertEqual(clock.now(), START)
+        self.assertEqual(clock.advance(timedelta(minutes=1)), START + timedelta(minutes=1))
+        self.assertEqual(clock.advance_to(START + timedelta(hours=1)),
+                         START + timedelta(hours=1))
+        self.assertEqual(clock.now(), START + timedelta(hours=1))
+        self.assertEqual(ticks, [START + timedelta(minutes=1), START + timedelta(hours=1)])
+
+        clock.remove_observer(ticks.append)
+        clock.advance(timedelta(seconds=1))
+        self.assertEqual(len(ticks), 2)
+
+    def test_backwards(self):
+        clock = SimulatedClock(START)
+        with self.assertRaises(ValueError):
+            clock.advance(timedelta(seconds=-1))
+        with self.assertRaises(ValueError):
+            clock.advance_to(START - timedelta(seconds=1))
+        self.assertEqual(clock.now(), START)
+
+    def test_exchange(self):
+        clock = SimulatedClock(START)
+        stocks = StockFactory.get_stocks()
+        exchange = GlobalBeverageCorporationExchange(stocks, clock=clock)
+        self.assertEqual(exchange.as_of, START)
+        for stock in stocks:
+            self.assertIs(stock.clock, clock)
+            exchange.record_trade(trade(stock.ticker_symbol, START - timedelta(minutes=10)))
+
+        self.assertAlmostEqual(exchange.all_share_index(), 100.0)
+        self.assertEqual(stocks[0].price(), 100.0)
+
+        clock.advance(timedelta(minutes=10))
+        self.assertIsNone(exchange.all_share_index())
+        self.assertIsNone(stocks[0].price())
+
+        delisted = exchange.delist_stock(stocks[0].ticker_symbol)
+        self.assertIs(delisted.clock, WALL_CLOCK)
+
+
+class TradeClockTestCase(unittest.TestCase):
+
+    def test_follows_latest_trade(self):
+        clock = TradeClock()
+        stocks = StockFactory.get_stocks()
+        exchange = GlobalBeverageCorporationExchange(stocks, clock=clock)
+        ticks = []
+        clock.add_observer(ticks.append)
+        with self.assertRaises(ValueError):
+            exchange.as_of
+
+        exchange.record_trade(trade(TickerSymbol.TEA, START))
+        exchange.record_trades([trade(TickerSymbol.POP, START + timedelta(minutes=5), 50.0),
+                                trade(TickerSymbol.POP, START + timedelta(minutes=1), 50.0)])
+        self.assertEqual(exchange.as_of, START + timedelta(minutes=5))
+
+        exchange.record_trade(trade(TickerSymbol.TEA, START + timedelta(minutes=2)))
+        self.assertEqual(exchange.as_of, START + timedelta(minutes=5))
+        self.assertEqual(ticks, [START, START + timedelta(minutes=5)])
+        self.assertEqual(exchange.get_stock(TickerSymbol.TEA).price(), 100.0)
+
+        exchange.record_trade(trade(TickerSymbol.GIN, START + timedelta(minutes=20)))
+        self.assertIsNone(exchange.get_stock(TickerSymbol.TEA).price())
+
+    def test_start(self):
+        clock = TradeClock(START)
+        self.assertEqual(clock.now(), START)
+        stock = CommonStock(TickerSymbol.TEA, 100.0, 8.0)
+        stock.record_trade(trade(TickerSymbol.TEA, START + timedelta(seconds=1)))
+        GlobalBeverageCorporationExchange([stock], clock=clock)
+        self.assertEqual(clock.now(), START + timedelta(seconds=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
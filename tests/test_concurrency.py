@@ -0,0 +1,135 @@
+import sys
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (GlobalBeverageCorporationExchange,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 PreferredStock,
+                                 TickerSymbol,
+                                 Trade)
+
+
+class ThreadSafeStockStressTestCase(unittest.TestCase):
+
+    """Records trades from several writer threads while reader threads query the stocks
+
+    Every trade of a stock has the same price, so any consistent view of it has that
+    price as its ticker price and its average price.
+    """
+
+    writers = 4
+    readers = 4
+    trades_per_writer = 2000
+    prices = {TickerSymbol.TEA: 80.0, TickerSymbol.GIN: 100.0}
+
+    def setUp(self):
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, switch_interval)
+
+        self.stocks = [CommonStock(TickerSymbol.TEA, 100.0, 0.0, thread_safe=True),
+                       PreferredStock(TickerSymbol.GIN, 100.0, 0.02, thread_safe=True)]
+        self.gbce = GlobalBeverageCorporationExchange(self.stocks)
+        self.start = datetime(1929, 10, 24, 9, 30)
+        self.current_time = self.start + timedelta(seconds=self.trades_per_writer)
+        self.errors = []
+        self.done = threading.Event()
+
+    def write(self, writer):
+        try:
+            for i in range(self.trades_per_writer):
+                ticker_symbol = list(self.prices)[(i + writer) % 2]
+                trade = Trade(ticker_symbol=ticker_symbol,
+                              timestamp=self.start + timedelta(seconds=i, microseconds=writer),
+                              quantity=1 + i % 7,
+                              price_per_share=self.prices[ticker_symbol],
+                              buy_sell_indicator=BuySellIndicator.BUY)
+                if i % 10 == 0:
+                    self.gbce.record_trades([trade])
+                else:
+                    self.gbce.record_trade(trade)
+        except Exception as error:
+            self.errors.append(error)
+
+    def read(self):
+        try:
+            sizes = {ticker_symbol: 0 for ticker_symbol in self.prices}
+            while not self.done.is_set():
+                for ticker_symbol, snapshot in self.gbce.snapshot().items():
+                    price = self.prices[ticker_symbol]
+                    timestamps = snapshot.trades.timestamps
+                    self.assertEqual(len(timestamps), len(snapshot.trades.prices))
+                    self.assertGreaterEqual(len(timestamps), sizes[ticker_symbol])
+                    sizes[ticker_symbol] = len(timestamps)
+                    if len(timestamps) > 0:
+                        self.assertEqual(snapshot.ticker_price, price)
+                        self.assertIn(snapshot.price(self.current_time), (None, price))
+                        self.assertEqual(snapshot.price(self.start), price)
+
+                for stock in self.stocks:
+                    stock_price = stock.price(self.current_time)
+                    if stock_price is not None:
+                        self.assertAlmostEqual(stock_price, self.prices[stock.ticker_symbol])
+
+                index = self.gbce.all_share_index(self.current_time)
+                if index is not None:
+                    self.assertAlmostEqual(index, (80.0 * 100.0) ** 0.5)
+        except Exception as error:
+            self.errors.append(error)
+
+    def test_concurrent_writers_and_readers(self):
+        writers = [threading.Thread(target=self.write, args=(writer,))
+                   for writer in range(self.writers)]
+        readers = [threading.Thread(target=self.read) for _ in range(self.readers)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        self.done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(self.errors, [])
+        total = sum(len(stock.trades) for stock in self.stocks)
+        self.assertEqual(total, self.writers * self.trades_per_writer)
+        for stock in self.stocks:
+            timestamps = list(stock.trades.timestamps)
+            self.assertEqual(timestamps, sorted(timestamps))
+            self.assertAlmostEqual(stock.price(self.current_time),
+                                   self.prices[stock.ticker_symbol])
+        self.assertAlmostEqual(self.gbce.all_share_index(self.current_time),
+                               (80.0 * 100.0) ** 0.5)
+
+
+class StockSnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stock = CommonStock(TickerSymbol.POP, 100.0, 8.0)
+
+    def test_snapshot_is_reused_until_trades_are_recorded(self):
+        snapshot = self.stock.snapshot()
+        self.assertIs(self.stock.snapshot(), snapshot)
+
+        trade = Trade(TickerSymbol.POP, datetime(1929, 10, 24), 10, 90.0, BuySellIndicator.SELL)
+        self.stock.record_trade(trade)
+        new_snapshot = self.stock.snapshot()
+        self.assertIsNot(new_snapshot, snapshot)
+        self.assertEqual(len(snapshot.trades), 0)
+        self.assertEqual(len(new_snapshot.trades), 1)
+
+    def test_snapshot_values(self):
+        trade = Trade(TickerSymbol.POP, datetime(1929, 10, 24), 10, 90.0, BuySellIndicator.SELL)
+        self.stock.record_trade(trade)
+        snapshot = self.stock.snapshot()
+        self.assertEqual(snapshot.price(trade.timestamp), self.stock.price(trade.timestamp))
+        self.assertEqual(snapshot.ticker_price, self.stock.ticker_price)
+        self.assertEqual(snapshot.dividend_yield, self.stock.dividend_yield)
+        self.assertEqual(snapshot.price_earnings_ratio, self.stock.price_earnings_ratio)
+
+    def test_empty_snapshot(self):
+        snapshot = self.stock.snapshot()
+        self.assertIsNone(snapshot.price(datetime(1929, 10, 24)))
+        with self.assertRaises(AttributeError):
+            snapshot.ticker_price
@@ -0,0 +1,174 @@
+import unittest
+from datetime import datetime, timedelta
+from fractions import Fraction
+
+from super_simple_stocks import (BuySellIndicator,
+                                 CommonStock,
+                                 GlobalBeverageCorporationExchange,
+                                 PreferredStock,
+                                 TickerSymbol,
+                                 Trade,
+                                 TradeRecord,
+                                 TradeStore,
+                                 geometric_mean,
+                                 to_epoch_ns,
+                                 to_ticks)
+from .factories import TradeFactory
+
+
+PRICE_SCALE = 10000
+
+
+class FixedPointCommonStock(CommonStock):
+    price_scale = PRICE_SCALE
+
+
+class FixedPointPreferredStock(PreferredStock):
+    price_scale = PRICE_SCALE
+
+
+def exact_price(trades, current_time, price_time_interval):
+    significant_trades = [trade for trade in trades
+                          if trade.timestamp >= current_time - price_time_interval]
+    if len(significant_trades) == 0:
+        return None
+    total_price = sum(Fraction(trade.total_price_ticks(PRICE_SCALE), PRICE_SCALE)
+                      for trade in significant_trades)
+    return float(total_price / sum(trade.quantity for trade in significant_trades))
+
+
+class FixedPointTradeTestCase(unittest.TestCase):
+
+    def test_to_ticks(self):
+        self.assertEqual(to_ticks(0.1, PRICE_SCALE), 1000)
+        self.assertEqual(to_ticks(150.37, PRICE_SCALE), 1503700)
+        self.assertEqual(to_ticks(0.00006, PRICE_SCALE), 1)
+
+    def test_total_price_ticks(self):
+        trade = TradeFactory.get_random_trades(TickerSymbol.TEA, 1)[0]
+        self.assertEqual(trade.total_price_ticks(PRICE_SCALE),
+                         trade.quantity * round(trade.price_per_share * PRICE_SCALE))
+
+    def test_store_keeps_ticks(self):
+        store = TradeStore(TickerSymbol.TEA, PRICE_SCALE)
+        trades = sorted(TradeFactory.get_random_trades(TickerSymbol.TEA, 50),
+                        key=lambda t: t.timestamp)
+        for trade in trades[:25]:
+            store.add(trade)
+        store.extend([to_epoch_ns(trade.timestamp) for trade in trades[25:]],
+                     [trade.quantity for trade in trades[25:]],
+                     [trade.price_per_share for trade in trades[25:]],
+                     [trade.buy_sell_indicator.value for trade in trades[25:]])
+
+        self.assertEqual(store.prices.typecode, 'q')
+        self.assertEqual(sorted(store.prices),
+                         sorted(to_ticks(trade.price_per_share, PRICE_SCALE)
+                                for trade in trades))
+        self.assertEqual(list(store), trades)
+        self.assertEqual(store.copy().price_scale, PRICE_SCALE)
+
+
+class FixedPointStockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stock = FixedPointCommonStock(TickerSymbol.TEA, 100.0, 8.0)
+        self.trades = TradeFactory.get_random_trades(TickerSymbol.TEA, 2000)
+
+    def test_price_is_exact(self):
+        self.stock.record_trades(self.trades[:1000])
+        for trade in self.trades[1000:]:
+            self.stock.record_trade(trade)
+
+        start = datetime(1929, 10, 24, 9, 30)
+        times = [start + timedelta(seconds=s) for s in range(-60, 7500, 37)]
+        times += times[::-1]
+        for current_time in times:
+            self.assertEqual(self.stock.price(current_time),
+                             exact_price(self.trades, current_time,
+                                         self.stock.price_time_interval))
+
+        series = self.stock.price_series(times)
+        snapshot = self.stock.snapshot()
+        for current_time, stock_price in zip(times, series):
+            self.assertEqual(stock_price, self.stock.price(current_time))
+            self.assertEqual(snapshot.price(current_time), stock_price)
+
+    def test_side_analytics_are_exact(self):
+        self.stock.record_trades(self.trades)
+        current_time = max(trade.timestamp for trade in self.trades)
+        buy_trades = [trade for trade in self.trades
+                      if trade.buy_sell_indicator is BuySellIndicator.BUY]
+
+        analytics = self.stock.side_analytics(current_time)
+        self.assertEqual(analytics.buy_vwap,
+                         exact_price(buy_trades, current_time,
+                                     self.stock.price_time_interval))
+        self.assertEqual(self.stock.snapshot().side_analytics(current_time), analytics)
+
+    def test_batch_recorded_after_a_price_query(self):
+        start = datetime(1929, 10, 24, 9, 30)
+        first = Trade(TickerSymbol.TEA, start, 1, 1.5, BuySellIndicator.BUY)
+        second = Trade(TickerSymbol.TEA, start, 1, 2.5, BuySellIndicator.SELL)
+        gbce = GlobalBeverageCorporationExchange([self.stock])
+        gbce.record_trade(first)
+        self.assertEqual(self.stock.price(start), 1.5)
+        self.assertEqual(gbce.all_share_index(start), 1.5)
+
+        gbce.record_trades([second])
+        self.assertEqual(self.stock.price(start), 2.0)
+        self.assertEqual(self.stock.side_analytics(start)[2:], (0.0, 1.5, 2.5))
+        self.assertAlmostEqual(gbce.all_share_index(start), 2.0)
+
+    def test_ingest_records(self):
+        trades = sorted(self.trades, key=lambda trade: trade.timestamp)
+        for price_scale in (PRICE_SCALE, 100):
+            with self.subTest(price_scale=price_scale):
+                stock = FixedPointCommonStock(TickerSymbol.TEA, 100.0, 8.0)
+                gbce = GlobalBeverageCorporationExchange([stock])
+                gbce.ingest_records([TradeRecord(trade.ticker_symbol.id,
+                                                 to_epoch_ns(trade.timestamp),
+                                                 trade.quantity,
+                                                 to_ticks(trade.price_per_share, price_scale),
+                                                 trade.buy_sell_indicator.value)
+                                     for trade in trades],
+                                    price_scale)
+                self.assertEqual(list(stock.trades.prices),
+                                 [to_ticks(to_ticks(trade.price_per_share, price_scale) /
+                                           price_scale, PRICE_SCALE)
+                                  for trade in trades])
+
+    def test_ratios_are_exact(self):
+        self.stock.record_trade(self.trades[0])
+        ticks = to_ticks(self.trades[0].price_per_share, PRICE_SCALE)
+
+        self.assertEqual(self.stock.ticker_price, ticks / PRICE_SCALE)
+        self.assertEqual(self.stock.dividend_yield, 8 * PRICE_SCALE / ticks)
+        self.assertEqual(self.stock.price_earnings_ratio, ticks / (8 * PRICE_SCALE))
+
+    def test_ratios_with_sub_tick_denominators(self):
+        sub_tick = 0.4 / PRICE_SCALE
+        sub_tick_dividend_stock = FixedPointCommonStock(TickerSymbol.TEA, 100.0, sub_tick)
+        sub_tick_price_stock = FixedPointCommonStock(TickerSymbol.GIN, 100.0, 8.0)
+        gbce = GlobalBeverageCorporationExchange([sub_tick_dividend_stock,
+                                                  sub_tick_price_stock])
+        timestamp = self.trades[0].timestamp
+        gbce.record_trades([Trade(TickerSymbol.TEA, timestamp, 1, 10.0, BuySellIndicator.BUY),
+                            Trade(TickerSymbol.GIN, timestamp, 1, sub_tick,
+                                  BuySellIndicator.BUY)])
+
+        self.assertIsNone(sub_tick_dividend_stock.price_earnings_ratio)
+        self.assertIsNone(sub_tick_price_stock.dividend_yield)
+        stock_table = gbce.stock_table(timestamp)
+        self.assertEqual(stock_table.price_earnings_ratios, [None, 0.0])
+        self.assertEqual(stock_table.dividend_yields, [0.0, None])
+
+    def test_all_share_index(self):
+        stocks = [self.stock, FixedPointPreferredStock(TickerSymbol.GIN, 100.0, 0.02)]
+        gbce = GlobalBeverageCorporationExchange(stocks)
+        gbce.record_trades(self.trades +
+                           TradeFactory.get_random_trades(TickerSymbol.GIN, 2000, seed=1))
+
+        current_time = datetime(1929, 10, 24, 10, 30)
+        self.assertAlmostEqual(gbce.all_share_index(current_time),
+                               geometric_mean([stock.price(current_time)
+                                               for stock in stocks]))
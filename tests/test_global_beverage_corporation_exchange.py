@@ -1,6 +1,19 @@
+import math
+import random
 import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
-from super_simple_stocks import GlobalBeverageCorporationExchange, TickerSymbol
+from super_simple_stocks import (GlobalBeverageCorporationExchange,
+                                 BuySellIndicator,
+                                 SimulatedClock,
+                                 Stock,
+                                 Trade,
+                                 TickerSymbol,
+                                 TradeRecord,
+                                 geometric_mean,
+                                 to_epoch_ns,
+                                 to_ticks)
 from .factories import StockFactory, TradeFactory
 
 
@@ -10,6 +23,63 @@ class GlobalBeverageCorporationExchangeInitTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             gbce = GlobalBeverageCorporationExchange([])
 
+    def test_checks_duplicate_ticker_symbols(self):
+        stocks = StockFactory.get_stocks() + StockFactory.get_stocks(0)
+        with self.assertRaises(ValueError):
+            gbce = GlobalBeverageCorporationExchange(stocks)
+
+
+class GlobalBeverageCorporationExchangeListingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stocks = StockFactory.get_stocks(1)
+        self.gbce = GlobalBeverageCorporationExchange(self.stocks)
+
+    def test_get_stock(self):
+        for stock in self.stocks:
+            self.assertIs(self.gbce.get_stock(stock.ticker_symbol), stock)
+
+    def test_get_unknown_stock_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.gbce.get_stock(TickerSymbol.JOE)
+
+    def test_add_stock(self):
+        joe_stock = StockFactory.get_stock_by_ticker_symbol(TickerSymbol.JOE)
+        self.gbce.add_stock(joe_stock)
+        self.assertIs(self.gbce.get_stock(TickerSymbol.JOE), joe_stock)
+        self.assertEqual(self.gbce.stocks, self.stocks + [joe_stock])
+
+    def test_add_listed_stock_raises_value_error(self):
+        with self.assertRaises(ValueError):
+            self.gbce.add_stock(StockFactory.get_stock())
+
+    def test_delist_stock(self):
+        stock = self.stocks[0]
+        self.assertIs(self.gbce.delist_stock(stock.ticker_symbol), stock)
+        self.assertNotIn(stock, self.gbce.stocks)
+        with self.assertRaises(ValueError):
+            self.gbce.get_stock(stock.ticker_symbol)
+
+    def test_delist_last_stock_raises_value_error(self):
+        self.gbce.delist_stock(self.stocks[0].ticker_symbol)
+        with self.assertRaises(ValueError):
+            self.gbce.delist_stock(self.stocks[1].ticker_symbol)
+
+
+class GlobalBeverageCorporationExchangeRecordTradeTestCase(unittest.TestCase):
+
+    def test_trade_is_routed_to_its_stock(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.GIN)
+        gbce.record_trade(trade)
+        self.assertIn(trade, gbce.get_stock(TickerSymbol.GIN).trades)
+
+    def test_unknown_ticker_symbol_raises_value_error(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks(0))
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.GIN)
+        with self.assertRaises(ValueError):
+            gbce.record_trade(trade)
+
 
 class GlobalBeverageCorporationExchangeRecordAllShareIndexTestCase(unittest.TestCase):
 
@@ -44,9 +114,261 @@ class GlobalBeverageCorporationExchangeRecordAllShareIndexTestCase(unittest.Test
         gin_stock_price = gin_stock.price(current_time)
         expected_value = (tea_stock_price * gin_stock_price)**(1/2)
 
-        self.assertEqual(gbce.all_share_index(current_time), expected_value)
+        self.assertAlmostEqual(gbce.all_share_index(current_time), expected_value)
+
+
+class GlobalBeverageCorporationExchangeAllShareIndexCacheTestCase(unittest.TestCase):
+
+    """Compares the cached all_share_index against the prices computed from scratch"""
+
+    scenarios = 20
+    steps = 300
+
+    def setUp(self):
+        self.stocks = StockFactory.get_stocks()
+        self.gbce = GlobalBeverageCorporationExchange(self.stocks)
+
+    def expected_index(self, current_time):
+        return geometric_mean([stock.price_series([current_time])[0]
+                               for stock in self.gbce.stocks])
+
+    def run_scenario(self, seed):
+        rng = random.Random(seed)
+        current_time = datetime(1929, 10, 24, 9, 30)
+
+        for _ in range(self.steps):
+            event = rng.random()
+            if event < 0.5:
+                stock = rng.choice(self.gbce.stocks)
+                delay = timedelta(seconds=rng.randint(-1200, 60))
+                stock.record_trade(Trade(ticker_symbol=stock.ticker_symbol,
+                                         timestamp=current_time + delay,
+                                         quantity=rng.randint(1, 100),
+                                         price_per_share=rng.choice([0.0, 1.0, 50.0, 250.0]),
+                                         buy_sell_indicator=BuySellIndicator.BUY))
+            elif event < 0.55 and len(self.gbce.stocks) > 1:
+                self.gbce.delist_stock(rng.choice(self.gbce.stocks).ticker_symbol)
+            elif event < 0.6:
+                for stock in self.stocks:
+                    if stock not in self.gbce.stocks:
+                        self.gbce.add_stock(stock)
+                        break
+            else:
+                if rng.random() < 0.1:
+                    current_time -= timedelta(seconds=rng.randint(0, 1800))
+                else:
+                    current_time += timedelta(seconds=rng.randint(0, 120))
+
+                index = self.gbce.all_share_index(current_time)
+                expected_value = self.expected_index(current_time)
+                if expected_value is None:
+                    self.assertIsNone(index)
+                else:
+                    self.assertTrue(math.isclose(index, expected_value, rel_tol=1e-9))
+
+    def test_matches_prices_from_scratch(self):
+        for seed in range(self.scenarios):
+            with self.subTest(seed=seed):
+                self.setUp()
+                self.run_scenario(seed)
+
+    def test_only_changed_stocks_are_recomputed(self):
+        tea_stock = self.gbce.get_stock(TickerSymbol.TEA)
+        gin_stock = self.gbce.get_stock(TickerSymbol.GIN)
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        self.gbce.record_trades(TradeFactory.get_trades())
+        self.gbce.all_share_index(trade.timestamp)
+
+        with mock.patch.object(Stock, 'price', autospec=True,
+                               side_effect=Stock.price) as price:
+            self.gbce.all_share_index(trade.timestamp)
+            self.assertEqual(price.call_count, 0)
+
+            tea_stock.record_trade(trade)
+            self.gbce.all_share_index(trade.timestamp)
+            self.assertEqual([call.args[0] for call in price.call_args_list], [tea_stock])
+
+
+class GlobalBeverageCorporationExchangeAllShareIndexSeriesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tea_stock = StockFactory.get_stock_by_ticker_symbol(TickerSymbol.TEA)
+        self.gin_stock = StockFactory.get_stock_by_ticker_symbol(TickerSymbol.GIN)
+        self.gbce = GlobalBeverageCorporationExchange([self.tea_stock, self.gin_stock])
+        self.trades = TradeFactory.get_trades()
+        for trade in self.trades:
+            self.gbce.record_trade(trade)
+
+    def test_matches_all_share_index(self):
+        first_timestamp = min(trade.timestamp for trade in self.trades)
+        times = [first_timestamp + timedelta(minutes=m) for m in range(0, 60, 5)]
+        series = self.gbce.all_share_index_series(times)
+        for current_time, index in zip(times, series):
+            expected_value = self.gbce.all_share_index(current_time)
+            if expected_value is None:
+                self.assertIsNone(index)
+            else:
+                self.assertAlmostEqual(index, expected_value)
+
+    def test_price_series_per_stock(self):
+        times = [trade.timestamp for trade in self.trades]
+        series = self.gbce.price_series(times)
+        self.assertEqual(series[TickerSymbol.TEA], self.tea_stock.price_series(times))
+        self.assertEqual(series[TickerSymbol.GIN], self.gin_stock.price_series(times))
+
+
+class GlobalBeverageCorporationExchangeSideAnalyticsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = TradeFactory.get_trades()
+        self.current_time = max(trade.timestamp for trade in self.trades)
+        self.tea_stock = StockFactory.get_stock_by_ticker_symbol(TickerSymbol.TEA)
+        self.gin_stock = StockFactory.get_stock_by_ticker_symbol(TickerSymbol.GIN)
+        self.gbce = GlobalBeverageCorporationExchange([self.tea_stock, self.gin_stock],
+                                                      clock=SimulatedClock(self.current_time))
+        self.gbce.record_trades(self.trades)
+
+    def test_side_analytics_per_stock(self):
+        analytics = self.gbce.side_analytics(self.current_time)
+        self.assertEqual(analytics[TickerSymbol.TEA],
+                         self.tea_stock.side_analytics(self.current_time))
+        self.assertEqual(analytics[TickerSymbol.GIN],
+                         self.gin_stock.side_analytics(self.current_time))
+
+    def test_side_analytics_default_to_clock(self):
+        self.assertEqual(self.gbce.side_analytics(),
+                         self.gbce.side_analytics(self.current_time))
+        self.assertEqual(self.tea_stock.side_analytics(),
+                         self.tea_stock.side_analytics(self.current_time))
+
+
+class GlobalBeverageCorporationExchangeBulkRecordingTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        self.trades = TradeFactory.get_trades()
+
+    def assert_trades_recorded(self):
+        for ticker_symbol in (TickerSymbol.TEA, TickerSymbol.GIN):
+            expected_value = sorted(TradeFactory.get_trades_for_stock(ticker_symbol),
+                                    key=lambda t: t.timestamp)
+            stock = self.gbce.get_stock(ticker_symbol)
+            self.assertEqual(list(stock.trades), expected_value)
+
+    def test_record_trades(self):
+        self.gbce.record_trades(self.trades)
+        self.assert_trades_recorded()
+
+    def test_record_trades_checks_ticker_symbols_first(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks(0))
+        with self.assertRaises(ValueError):
+            gbce.record_trades(self.trades)
+        self.assertEqual(len(gbce.get_stock(TickerSymbol.TEA).trades), 0)
+
+    def test_ingest(self):
+        self.gbce.ingest(*self.columns(self.trades))
+        self.assert_trades_recorded()
+
+    def test_ingest_checks_values(self):
+        ticker_symbols, timestamps, quantities, prices, sides = self.columns(self.trades)
+        bad_batches = (
+            (ticker_symbols, timestamps, quantities[:-1], prices, sides),
+            (ticker_symbols, timestamps, [0] + quantities[1:], prices, sides),
+            (ticker_symbols, timestamps, quantities[:-1] + [1.5], prices, sides),
+            (ticker_symbols, timestamps, quantities, [-1.0] + prices[1:], sides),
+            (ticker_symbols, timestamps, quantities, prices[:-1] + [float('nan')], sides),
+            (ticker_symbols, timestamps, quantities, [float('nan')] + prices[1:], sides),
+            (ticker_symbols, timestamps, quantities, prices, [3] + sides[1:]),
+        )
+        for batch in bad_batches:
+            with self.assertRaises(ValueError):
+                self.gbce.ingest(*batch)
+        for stock in self.gbce.stocks:
+            self.assertEqual(len(stock.trades), 0)
+
+    def test_ingest_records(self):
+        for validated in (False, True):
+            with self.subTest(validated=validated):
+                self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+                self.gbce.ingest_records(self.records(self.trades), 100, validated)
+                self.assert_trades_recorded()
+
+    def test_ingest_records_checks_values(self):
+        records = self.records(self.trades)
+        unlisted = GlobalBeverageCorporationExchange(StockFactory.get_stocks(0))
+        bad_batches = (
+            (self.gbce, [records[0]._replace(ticker_id=-1)] + records[1:]),
+            (self.gbce, [records[0]._replace(quantity=0)] + records[1:]),
+            (self.gbce, records[:-1] + [records[-1]._replace(quantity=1.5)]),
+            (self.gbce, [records[0]._replace(price=-1)] + records[1:]),
+            (self.gbce, [records[0]._replace(side=3)] + records[1:]),
+            (unlisted, records),
+        )
+        for gbce, batch in bad_batches:
+            with self.assertRaises(ValueError):
+                gbce.ingest_records(batch, 100)
+            for stock in gbce.stocks:
+                self.assertEqual(len(stock.trades), 0)
+
+    @staticmethod
+    def records(trades):
+        return [TradeRecord(trade.ticker_symbol.id,
+                            to_epoch_ns(trade.timestamp),
+                            trade.quantity,
+                            to_ticks(trade.price_per_share, 100),
+                            trade.buy_sell_indicator.value)
+                for trade in trades]
+
+    @staticmethod
+    def columns(trades):
+        return ([trade.ticker_symbol for trade in trades],
+                [to_epoch_ns(trade.timestamp) for trade in trades],
+                [trade.quantity for trade in trades],
+                [trade.price_per_share for trade in trades],
+                [trade.buy_sell_indicator for trade in trades])
+
+
+class GlobalBeverageCorporationExchangeStockTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        self.trades = TradeFactory.get_trades()
+        self.gbce.record_trades(self.trades)
+
+    def test_matches_stock_properties(self):
+        self.gbce.get_stock(TickerSymbol.GIN).record_trade(
+            Trade(TickerSymbol.GIN, self.trades[0].timestamp, 10, 0.0, BuySellIndicator.BUY))
+
+        for minutes in (0, 10, 30, 10):
+            current_time = self.trades[0].timestamp + timedelta(minutes=minutes)
+            table = self.gbce.stock_table(current_time)
+            self.assertEqual(table.ticker_symbols,
+                             [stock.ticker_symbol for stock in self.gbce.stocks])
+            for row, stock in zip(zip(*table[1:]), self.gbce.stocks):
+                dividend, ticker_price, dividend_yield, price_earnings_ratio, price = row
+                self.assertEqual(dividend, stock.dividend)
+                self.assertEqual(price, stock.price(current_time))
+                try:
+                    self.assertEqual(ticker_price, stock.ticker_price)
+                except AttributeError:
+                    self.assertIsNone(ticker_price)
+                    self.assertIsNone(dividend_yield)
+                    self.assertIsNone(price_earnings_ratio)
+                    continue
+                self.assertEqual(price_earnings_ratio, stock.price_earnings_ratio)
+                if ticker_price == 0:
+                    self.assertIsNone(dividend_yield)
+                else:
+                    self.assertEqual(dividend_yield, stock.dividend_yield)
 
 
+class GeometricMeanTestCase(unittest.TestCase):
 
+    def test_large_values_do_not_overflow(self):
+        self.assertAlmostEqual(geometric_mean([1e300] * 4) / 1e300, 1.0)
 
+    def test_none_value(self):
+        self.assertIsNone(geometric_mean([1.0, None]))
 
+    def test_zero_value(self):
+        self.assertEqual(geometric_mean([1.0, 0.0]), 0.0)
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import unittest
+import urllib.request
+
+from super_simple_stocks import (Stock,
+                                 CommonStock,
+                                 GlobalBeverageCorporationExchange,
+                                 intern_ticker_symbol)
+from super_simple_stocks_metrics import Histogram, Instrumentation
+from .factories import StockFactory, TradeFactory
+
+
+class HistogramTestCase(unittest.TestCase):
+
+    def test_observe(self):
+        histogram = Histogram(buckets=(1e-6, 1e-3))
+        for latency in (500, 1000, 2000, 2 * 10**6):
+            histogram.observe(latency)
+        histogram.observe(10, failed=True)
+
+        self.assertEqual(histogram.counts, [3, 1, 1])
+        self.assertEqual((histogram.count, histogram.errors), (5, 1))
+        self.assertAlmostEqual(histogram.total, 0.0020035100)
+        self.assertEqual(histogram.quantile(0.5), 1e-6)
+        self.assertEqual(histogram.quantile(1.0), float('inf'))
+
+    def test_empty_quantile(self):
+        self.assertIsNone(Histogram().quantile(0.5))
+
+
+class InstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        self.trades = TradeFactory.get_trades()
+        self.instrumentation = Instrumentation()
+        self.instrumentation.watch(self.gbce)
+
+    def tearDown(self):
+        self.instrumentation.disable()
+
+    def record(self):
+        for trade in self.trades:
+            self.gbce.record_trade(trade)
+        current_time = max(trade.timestamp for trade in self.trades)
+        self.gbce.all_share_index(current_time)
+        self.gbce.get_stock(self.trades[0].ticker_symbol).ticker_price
+        return current_time
+
+    def test_disabled_installs_nothing(self):
+        original = Stock.__dict__['record_trade']
+        with self.instrumentation:
+            self.assertIsNot(Stock.__dict__['record_trade'], original)
+        self.assertIs(Stock.__dict__['record_trade'], original)
+
+        self.record()
+        self.assertEqual(self.instrumentation.histograms['stock_record_trade'].count, 0)
+
+    def test_counts(self):
+        with self.instrumentation:
+            self.record()
+            with self.assertRaises(AttributeError):
+                StockFactory.get_stock().ticker_price
+
+        histograms = self.instrumentation.histograms
+        self.assertEqual(histograms['exchange_record_trade'].count, len(self.trades))
+        self.assertEqual(histograms['stock_record_trade'].count, len(self.trades))
+        self.assertEqual(histograms['all_share_index'].count, 1)
+        self.assertEqual(histograms['price'].count, len(self.gbce.stocks))
+        self.assertEqual((histograms['ticker_price'].count,
+                          histograms['ticker_price'].errors), (2, 1))
+
+    def test_only_one_enabled(self):
+        with self.instrumentation:
+            with self.assertRaises(ValueError):
+                Instrumentation().enable()
+
+    def test_gauges(self):
+        current_time = self.record()
+        gauges = self.instrumentation.gauges()
+        for stock in self.gbce.stocks:
+            name = stock.ticker_symbol.name
+            window_trades = stock.trades.since(current_time - stock.price_time_interval)
+            self.assertEqual(gauges['store_trades'][name], len(stock.trades))
+            self.assertEqual(gauges['window_trades'][name], len(window_trades))
+
+    def test_render(self):
+        with self.instrumentation:
+            self.record()
+        text = self.instrumentation.render()
+
+        self.assertIn('# TYPE super_simple_stocks_latency_seconds histogram\n', text)
+        self.assertIn('super_simple_stocks_calls_total{{operation="stock_record_trade"}} '
+                      '{}\n'.format(len(self.trades)), text)
+        self.assertIn('super_simple_stocks_latency_seconds_bucket'
+                      '{{operation="exchange_record_trade",le="+Inf"}} '
+                      '{}\n'.format(len(self.trades)), text)
+        self.assertIn('super_simple_stocks_store_trades{ticker_symbol="TEA"}', text)
+
+    def test_render_escapes_label_values(self):
+        ticker_symbol = intern_ticker_symbol('A\\B"C\nD')
+        self.gbce.add_stock(CommonStock(ticker_symbol, 100.0, 8.0))
+        text = self.instrumentation.render()
+        self.assertIn('super_simple_stocks_store_trades{ticker_symbol="A\\\\B\\"C\\nD"} 0\n',
+                      text)
+
+    def test_write(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.prom')
+            self.instrumentation.write(path)
+            with open(path) as file:
+                self.assertEqual(file.read(), self.instrumentation.render())
+            self.assertEqual(os.listdir(directory), ['metrics.prom'])
+
+    def test_serve(self):
+        server = self.instrumentation.serve()
+        try:
+            url = 'http://{}:{}/metrics'.format(*server.server_address)
+            with urllib.request.urlopen(url, timeout=5) as response:
+                self.assertEqual(response.read().decode(), self.instrumentation.render())
+        finally:
+            server.shutdown()
+            server.server_close()
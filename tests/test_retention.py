@@ -0,0 +1,127 @@
+import unittest
+from datetime import datetime, timedelta
+
+from super_simple_stocks import (Bar,
+                                 BuySellIndicator,
+                                 CommonStock,
+                                 RetentionPolicy,
+                                 TickerSymbol,
+                                 Trade,
+                                 to_epoch_ns)
+from .factories import CommonStockWithBars
+
+
+class BarTestCase(unittest.TestCase):
+
+    def test_values(self):
+        bar = Bar(0)
+        for timestamp, quantity, price in ((3, 10, 5.0), (1, 20, 4.0), (2, 10, 7.0),
+                                           (3, 10, 6.0)):
+            bar.add(timestamp, quantity, price)
+
+        self.assertEqual((bar.open, bar.high, bar.low, bar.close), (4.0, 7.0, 4.0, 6.0))
+        self.assertEqual(bar.volume, 50)
+        self.assertEqual(bar.count, 4)
+        self.assertEqual(bar.vwap, (50.0 + 80.0 + 70.0 + 60.0) / 50)
+
+    def test_empty_bar(self):
+        self.assertIsNone(Bar(0).vwap)
+
+
+class StockRetentionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.spilled = []
+        self.stock = CommonStockWithBars(TickerSymbol.POP, 100.0, 8.0)
+        self.stock.retention_policy = RetentionPolicy(grace_period=timedelta(minutes=5),
+                                                      min_batch=10,
+                                                      spill=self.spill)
+        self.start = datetime(1929, 10, 24, 9, 30)
+        self.trades = [Trade(ticker_symbol=TickerSymbol.POP,
+                             timestamp=self.start + timedelta(seconds=10 * i),
+                             quantity=1 + i % 5,
+                             price_per_share=100.0 + i % 3,
+                             buy_sell_indicator=BuySellIndicator.BUY)
+                       for i in range(360)]
+
+    def spill(self, ticker_symbol, timestamps, quantities, prices, sides):
+        self.assertIs(ticker_symbol, TickerSymbol.POP)
+        self.spilled.extend(zip(timestamps, quantities, prices, sides))
+
+    def test_old_trades_are_removed(self):
+        for trade in self.trades:
+            self.stock.record_trade(trade)
+
+        horizon = self.trades[-1].timestamp - timedelta(minutes=20)
+        self.assertLessEqual(len(self.stock.trades), 121 + 9)
+        self.assertGreaterEqual(self.stock.trades[0].timestamp, horizon - timedelta(seconds=90))
+        self.assertEqual(len(self.spilled) + len(self.stock.trades), len(self.trades))
+
+    def test_price_and_ticker_price_are_kept(self):
+        reference_stock = CommonStock(TickerSymbol.POP, 100.0, 8.0)
+        current_time = self.trades[-1].timestamp
+        for trade in self.trades:
+            self.stock.record_trade(trade)
+            reference_stock.record_trade(trade)
+            self.assertAlmostEqual(self.stock.price(trade.timestamp),
+                                   reference_stock.price(trade.timestamp))
+
+        self.assertAlmostEqual(self.stock.price(current_time),
+                               reference_stock.price(current_time))
+        self.assertEqual(self.stock.ticker_price, reference_stock.ticker_price)
+
+    def test_removed_trades_are_compacted_into_minute_bars(self):
+        self.stock.record_trades(self.trades[:200])
+        self.stock.record_trades(self.trades[200:])
+
+        self.assertGreater(len(self.spilled), 0)
+        minute_bars = self.stock.bars[timedelta(minutes=1)]
+        for start, bar in minute_bars.items():
+            minute_trades = [trade for trade in self.trades
+                             if start <= to_epoch_ns(trade.timestamp) < start + 60 * 10**9]
+            self.assertEqual(bar.count, len(minute_trades))
+            self.assertEqual(bar.volume, sum(trade.quantity for trade in minute_trades))
+            self.assertEqual(bar.open, minute_trades[0].price_per_share)
+            self.assertEqual(bar.close, minute_trades[-1].price_per_share)
+            self.assertEqual(bar.high, max(trade.price_per_share for trade in minute_trades))
+        self.assertEqual(sum(bar.count for bar in minute_bars.values()), len(self.trades))
+
+    def test_second_bars_are_removed_with_their_trades(self):
+        self.stock.record_trades(self.trades)
+
+        first_kept = to_epoch_ns(self.stock.trades[0].timestamp)
+        second_bars = self.stock.bars[timedelta(seconds=1)]
+        self.assertEqual(sum(bar.count for bar in second_bars.values()),
+                         len(self.stock.trades))
+        self.assertTrue(all(start >= first_kept for start in second_bars))
+
+    def test_late_trades_are_compacted(self):
+        for trade in self.trades[::-1]:
+            self.stock.record_trade(trade)
+        minute_bars = self.stock.bars[timedelta(minutes=1)]
+        self.assertEqual(sum(bar.count for bar in minute_bars.values()), len(self.trades))
+        self.assertEqual(len(self.spilled) + len(self.stock.trades), len(self.trades))
+
+    def test_no_retention_by_default(self):
+        stock = CommonStockWithBars(TickerSymbol.POP, 100.0, 8.0)
+        stock.record_trades(self.trades)
+        self.assertEqual(len(stock.trades), len(self.trades))
+        self.assertEqual(sum(bar.count for bar in stock.bars[timedelta(seconds=1)].values()),
+                         len(self.trades))
+
+    def test_minute_bars_are_set_up_without_bar_resolutions(self):
+        stock = CommonStock(TickerSymbol.POP, 100.0, 8.0)
+        stock.retention_policy = self.stock.retention_policy
+        self.assertEqual(stock.bars, {})
+
+        stock.record_trades(self.trades[:200])
+        for trade in self.trades[200:]:
+            stock.record_trade(trade)
+
+        self.assertGreater(len(self.spilled), 0)
+        minute_bars = stock.bars[timedelta(minutes=1)]
+        self.assertEqual(sum(bar.count for bar in minute_bars.values()), len(self.trades))
+        bar = stock.bar(self.start, self.trades[-1].timestamp + timedelta(seconds=1))
+        self.assertEqual(bar.count, len(self.trades))
+        self.assertEqual(bar.volume, sum(trade.quantity for trade in self.trades))
+
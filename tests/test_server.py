@@ -0,0 +1,150 @@
+import asyncio
+import math
+import unittest
+from unittest import mock
+
+from super_simple_stocks import GlobalBeverageCorporationExchange, TickerSymbol, to_epoch_ns
+from super_simple_stocks_server import (TradeIngestionServer,
+                                        generate_trade_requests,
+                                        run_load)
+from .factories import StockFactory, TradeFactory
+
+
+class TradeIngestionServerTestCase(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        self.server = TradeIngestionServer(self.gbce, batch_size=4, flush_interval=0.01,
+                                           max_pending=16)
+        await self.server.start('127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        await self.server.close()
+
+    async def request(self, lines: [str]) -> [str]:
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(''.join(line + '\n' for line in lines).encode())
+        responses = [(await reader.readline()).decode().strip() for _ in lines]
+        writer.close()
+        return responses
+
+    async def test_trades_are_recorded(self):
+        trades = TradeFactory.get_trades()
+        lines = ['TRADE {0} {1} {2} {3} {4}'.format(trade.ticker_symbol.name,
+                                                    to_epoch_ns(trade.timestamp),
+                                                    trade.quantity,
+                                                    trade.price_per_share,
+                                                    trade.buy_sell_indicator.name)
+                 for trade in trades]
+        responses = await self.request(lines)
+        self.assertEqual(responses, ['OK'] * len(trades))
+
+        for ticker_symbol in (TickerSymbol.TEA, TickerSymbol.GIN):
+            expected_value = sorted(TradeFactory.get_trades_for_stock(ticker_symbol),
+                                    key=lambda t: t.timestamp)
+            self.assertEqual(list(self.gbce.get_stock(ticker_symbol).trades),
+                             expected_value)
+
+    async def test_queries_see_previous_trades(self):
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        timestamp = to_epoch_ns(trade.timestamp)
+        responses = await self.request([
+            'TICKER_PRICE TEA',
+            'TRADE TEA {0} 100 80.0 BUY'.format(timestamp),
+            'TICKER_PRICE TEA',
+            'PRICE TEA {0}'.format(timestamp),
+            'PE_RATIO TEA',
+            'INDEX {0}'.format(timestamp),
+        ])
+        self.assertEqual(responses, ['ERROR The last ticker price is not yet available.',
+                                     'OK',
+                                     'VALUE 80.0',
+                                     'VALUE 80.0',
+                                     'VALUE NONE',
+                                     'VALUE NONE'])
+
+    async def test_wrong_requests(self):
+        responses = await self.request(['FOO',
+                                        'TRADE XXX 1 1 1.0 BUY',
+                                        'TRADE TEA 1 0 1.0 BUY',
+                                        'TRADE TEA 1 1',
+                                        'PRICE'])
+        self.assertTrue(all(response.startswith('ERROR') for response in responses))
+        self.assertEqual(len(self.gbce.get_stock(TickerSymbol.TEA).trades), 0)
+
+    async def test_wrong_trades_fail_their_own_requests(self):
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        timestamp = to_epoch_ns(trade.timestamp)
+        lines = ['TRADE TEA {0} 100 80.0 BUY'.format(timestamp),
+                 'TRADE TEA {0} 100 nan BUY'.format(timestamp),
+                 'TRADE TEA {0} 100 inf BUY'.format(timestamp),
+                 'TRADE TEA {0} {1} 80.0 BUY'.format(timestamp, 2 ** 63),
+                 'TRADE TEA {0} 100 80.0 BUY'.format(2 ** 63),
+                 'TRADE GIN {0} 100 90.0 SELL'.format(timestamp)]
+        responses = await asyncio.gather(self.request(lines[:3]), self.request(lines[3:]))
+        self.assertEqual([response.split()[0] for response in sum(responses, [])],
+                         ['OK', 'ERROR', 'ERROR', 'ERROR', 'ERROR', 'OK'])
+        self.assertEqual(len(self.gbce.get_stock(TickerSymbol.TEA).trades), 1)
+        self.assertEqual(len(self.gbce.get_stock(TickerSymbol.GIN).trades), 1)
+
+    async def test_rejected_batches_are_recorded_trade_by_trade(self):
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        timestamp = to_epoch_ns(trade.timestamp)
+        ingest = self.gbce.ingest
+
+        def ingest_without_nan(*columns):
+            if any(map(math.isnan, columns[3])):
+                raise ValueError("The price per share has to be finite.")
+            ingest(*columns)
+
+        with mock.patch.object(self.gbce, 'ingest', ingest_without_nan):
+            self.server._buffer_trade(['TEA', str(timestamp), '100', '80.0', 'BUY'],
+                                      asyncio.get_running_loop().create_future())
+            self.server._columns[3][-1] = float('nan')
+            responses = await self.request(['TRADE GIN {0} 100 90.0 SELL'.format(timestamp),
+                                            'INDEX'])
+        self.assertEqual(responses, ['OK', 'VALUE NONE'])
+        self.assertEqual(len(self.gbce.get_stock(TickerSymbol.TEA).trades), 0)
+        self.assertEqual(len(self.gbce.get_stock(TickerSymbol.GIN).trades), 1)
+
+    async def test_failed_queries_answer_errors(self):
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        responses = await self.request([
+            'TRADE TEA {0} 100 0.0 BUY'.format(to_epoch_ns(trade.timestamp)),
+            'DIVIDEND_YIELD TEA',
+            'TICKER_PRICE TEA',
+        ])
+        self.assertEqual(responses[0], 'OK')
+        self.assertTrue(responses[1].startswith('ERROR'))
+        self.assertEqual(responses[2], 'VALUE 0.0')
+
+    async def test_reads_pause_at_max_pending(self):
+        trade = TradeFactory.get_trade_for_stock(TickerSymbol.TEA)
+        lines = ['TRADE TEA {0} 100 80.0 BUY\n'.format(to_epoch_ns(trade.timestamp) + i)
+                 for i in range(self.server.max_pending)]
+
+        with mock.patch.object(self.server, 'flush'):
+            trader, trade_writer = await asyncio.open_connection('127.0.0.1', self.port)
+            trade_writer.write(''.join(lines).encode())
+            while len(self.server._acknowledgements) < self.server.max_pending:
+                await asyncio.sleep(0.001)
+
+            reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+            writer.write(b'TICKER_PRICE TEA\n')
+            response = asyncio.ensure_future(reader.readline())
+            done, _ = await asyncio.wait([response], timeout=0.05)
+            self.assertEqual(done, set())
+
+        self.server.flush()
+        self.assertEqual(await response, b'VALUE 80.0\n')
+        self.assertEqual([await trader.readline() for _ in lines], [b'OK\n'] * len(lines))
+        trade_writer.close()
+        writer.close()
+
+    async def test_load(self):
+        requests = generate_trade_requests(200)
+        results = await run_load(requests, '127.0.0.1', self.port, connections=2, window=8)
+        self.assertEqual(results['requests'], 200)
+        self.assertEqual(results['errors'], 0)
+        self.assertEqual(sum(len(stock.trades) for stock in self.gbce.stocks), 200)
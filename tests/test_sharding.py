@@ -0,0 +1,102 @@
+import unittest
+
+from super_simple_stocks import (TickerSymbol,
+                                 BuySellIndicator,
+                                 Trade,
+                                 GlobalBeverageCorporationExchange,
+                                 to_epoch_ns)
+from super_simple_stocks_sharding import ShardedGlobalBeverageCorporationExchange
+from .factories import StockFactory, TradeFactory
+
+
+class ShardedGlobalBeverageCorporationExchangeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = TradeFactory.get_trades()
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        self.gbce.record_trades(self.trades)
+        self.sharded_gbce = ShardedGlobalBeverageCorporationExchange(
+            StockFactory.get_stocks(), shards=2, batch_size=3)
+        self.addCleanup(self.sharded_gbce.close)
+
+    def test_checks_arguments(self):
+        with self.assertRaises(ValueError):
+            ShardedGlobalBeverageCorporationExchange([])
+        with self.assertRaises(ValueError):
+            ShardedGlobalBeverageCorporationExchange(StockFactory.get_stocks(), shards=0)
+
+    def test_shards_are_capped_at_number_of_stocks(self):
+        with ShardedGlobalBeverageCorporationExchange(StockFactory.get_stocks(1),
+                                                      shards=8) as sharded_gbce:
+            self.assertEqual(sharded_gbce.shards, 2)
+
+    def test_matches_single_process_exchange(self):
+        self.sharded_gbce.record_trades(self.trades[:4])
+        for trade in self.trades[4:]:
+            self.sharded_gbce.record_trade(trade)
+
+        current_time = max(trade.timestamp for trade in self.trades)
+        self.assertIsNone(self.sharded_gbce.all_share_index(current_time))
+
+        for ticker_symbol in (TickerSymbol.TEA, TickerSymbol.GIN):
+            stock = self.gbce.get_stock(ticker_symbol)
+            self.assertEqual(self.sharded_gbce.price(ticker_symbol, current_time),
+                             stock.price(current_time))
+            self.assertEqual(self.sharded_gbce.ticker_price(ticker_symbol),
+                             stock.ticker_price)
+            self.assertEqual(self.sharded_gbce.dividend_yield(ticker_symbol),
+                             stock.dividend_yield)
+            self.assertEqual(self.sharded_gbce.price_earnings_ratio(ticker_symbol),
+                             stock.price_earnings_ratio)
+
+    def test_all_share_index(self):
+        stocks = [StockFactory.get_stock_by_ticker_symbol(ticker_symbol)
+                  for ticker_symbol in (TickerSymbol.TEA, TickerSymbol.GIN)]
+        gbce = GlobalBeverageCorporationExchange(stocks)
+        gbce.record_trades(self.trades)
+        current_time = max(trade.timestamp for trade in self.trades)
+
+        with ShardedGlobalBeverageCorporationExchange(stocks, shards=2) as sharded_gbce:
+            sharded_gbce.record_trades(self.trades)
+            self.assertAlmostEqual(sharded_gbce.all_share_index(current_time),
+                                   gbce.all_share_index(current_time))
+
+    def test_errors(self):
+        with self.assertRaises(AttributeError):
+            self.sharded_gbce.ticker_price(TickerSymbol.ALE)
+
+        stocks = StockFactory.get_stocks(0)
+        with ShardedGlobalBeverageCorporationExchange(stocks, shards=1) as sharded_gbce:
+            with self.assertRaises(ValueError):
+                sharded_gbce.record_trades(self.trades)
+            with self.assertRaises(ValueError):
+                sharded_gbce.ticker_price(TickerSymbol.GIN)
+
+    def test_rejected_batches_are_not_buffered(self):
+        trade = self.trades[0]
+        with self.assertRaises(TypeError):
+            self.sharded_gbce.ingest([trade.ticker_symbol],
+                                     [float(to_epoch_ns(trade.timestamp))],
+                                     [trade.quantity],
+                                     [trade.price_per_share],
+                                     [trade.buy_sell_indicator])
+        with self.assertRaises(ValueError):
+            self.sharded_gbce.ingest([trade.ticker_symbol],
+                                     [to_epoch_ns(trade.timestamp)],
+                                     [1.5],
+                                     [trade.price_per_share],
+                                     [trade.buy_sell_indicator])
+
+        self.sharded_gbce.record_trades(self.trades)
+        for ticker_symbol in (TickerSymbol.TEA, TickerSymbol.GIN):
+            self.assertEqual(self.sharded_gbce.ticker_price(ticker_symbol),
+                             self.gbce.get_stock(ticker_symbol).ticker_price)
+
+    def test_shards_survive_errors(self):
+        trade = Trade(TickerSymbol.TEA, self.trades[0].timestamp, 1, 0.0,
+                      BuySellIndicator.BUY)
+        self.sharded_gbce.record_trade(trade)
+        with self.assertRaises(ZeroDivisionError):
+            self.sharded_gbce.dividend_yield(TickerSymbol.TEA)
+        self.assertEqual(self.sharded_gbce.ticker_price(TickerSymbol.TEA), 0.0)
+
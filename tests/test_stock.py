@@ -1,10 +1,15 @@
+import random
 import unittest
-from datetime import timedelta
+from datetime import datetime, timedelta
 
-from super_simple_stocks import TickerSymbol, Stock
+from super_simple_stocks import TickerSymbol, Stock, CommonStock, Trade, BuySellIndicator
 from .factories import StockFactory, TradeFactory
 
 
+class FixedPointCommonStock(CommonStock):
+    price_scale = 100
+
+
 class StockInitTestCase(unittest.TestCase):
 
     def test_not_instantiable(self):
@@ -40,6 +45,41 @@ class StockRecordTradeTestCase(unittest.TestCase):
             ale_stock.record_trade(tea_trade)
 
 
+class StockRecordTradesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stock = StockFactory.get_stock()
+        self.trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+
+    def test_trades_are_recorded(self):
+        self.stock.record_trades(reversed(self.trades))
+        self.assertEqual(list(self.stock.trades),
+                         sorted(self.trades, key=lambda t: t.timestamp))
+        self.assertEqual(self.stock.ticker_price, self.trades[-1].price_per_share)
+
+    def test_matches_one_by_one_recording(self):
+        stock = StockFactory.get_stock()
+        current_time = self.trades[2].timestamp
+        stock.price(current_time)
+        self.stock.price(current_time)
+
+        for trade in self.trades:
+            stock.record_trade(trade)
+        self.stock.record_trades(self.trades[3:])
+        self.stock.record_trades(self.trades[:3])
+
+        self.assertEqual(list(self.stock.trades), list(stock.trades))
+        self.assertEqual(self.stock.price(current_time), stock.price(current_time))
+
+    def test_checks_whole_batch_before_recording(self):
+        gin_trade = TradeFactory.get_trade_for_stock(TickerSymbol.GIN)
+        with self.assertRaises(ValueError):
+            self.stock.record_trades(self.trades + [gin_trade])
+        with self.assertRaises(TypeError):
+            self.stock.record_trades(self.trades + [('wrong', 'value')])
+        self.assertEqual(len(self.stock.trades), 0)
+
+
 class StockTickerPriceTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -61,6 +101,23 @@ class StockTickerPriceTestCase(unittest.TestCase):
             self.stock.record_trade(trade)
         self.assertEqual(last_trade.price_per_share, self.stock.ticker_price)
 
+    def test_late_trade_does_not_change_price(self):
+        trades = TradeFactory.get_trades(3)
+        for trade in reversed(trades):
+            self.stock.record_trade(trade)
+        self.assertEqual(trades[-1].price_per_share, self.stock.ticker_price)
+
+    def test_equal_timestamp_trade_recorded_last_wins(self):
+        trade = TradeFactory.get_trade()
+        self.stock.record_trade(trade)
+        same_time_trade = Trade(ticker_symbol=trade.ticker_symbol,
+                                timestamp=trade.timestamp,
+                                quantity=trade.quantity,
+                                price_per_share=trade.price_per_share + 1.0,
+                                buy_sell_indicator=trade.buy_sell_indicator)
+        self.stock.record_trade(same_time_trade)
+        self.assertEqual(same_time_trade.price_per_share, self.stock.ticker_price)
+
 
 class StockPriceEarningsRatioTestCase(unittest.TestCase):
 
@@ -113,6 +170,139 @@ class StockPriceTestCase(unittest.TestCase):
         self.assertEqual(self.stock.price(last_trade.timestamp), expected_value)
 
 
+class StockPriceIncrementalTestCase(unittest.TestCase):
+
+    """Compares Stock.price and Stock.side_analytics against a full scan of the trades
+
+    Each scenario records randomly generated trades, some of them late, and queries
+    the price at a clock that mostly moves forward but occasionally jumps back.
+
+    The answers are required to be exactly those of the full scan. With float prices,
+    the prices are whole numbers, so that every sum of total prices is an exact
+    integer whatever the order in which it is accumulated. In fixed-point mode, prices
+    have cents and the sums are exact integers of ticks.
+    """
+
+    scenarios = 50
+    steps = 200
+
+    @staticmethod
+    def vwap(trades, price_scale):
+        volume = sum(trade.quantity for trade in trades)
+        if volume == 0:
+            return None
+        elif price_scale is None:
+            return sum(trade.total_price for trade in trades) / volume
+        else:
+            return (sum(trade.total_price_ticks(price_scale) for trade in trades) /
+                    (volume * price_scale))
+
+    def scan_price(self, trades, current_time, stock):
+        return self.vwap([trade for trade in trades
+                          if trade.timestamp >= current_time - stock.price_time_interval],
+                         stock.price_scale)
+
+    def scan_side_analytics(self, trades, current_time, stock):
+        significant_trades = [trade for trade in trades
+                              if trade.timestamp >= current_time - stock.price_time_interval]
+        sides = {}
+        for indicator in BuySellIndicator:
+            side_trades = [trade for trade in significant_trades
+                           if trade.buy_sell_indicator is indicator]
+            sides[indicator] = (sum(trade.quantity for trade in side_trades),
+                                self.vwap(side_trades, stock.price_scale))
+        return sides
+
+    @staticmethod
+    def random_trade(rng, stock, current_time):
+        delay = timedelta(seconds=rng.randint(-1800, 60))
+        if stock.price_scale is None:
+            price_per_share = float(rng.randint(0, 200))
+        else:
+            price_per_share = rng.randint(0, 20000) / 100
+        return Trade(ticker_symbol=stock.ticker_symbol,
+                     timestamp=current_time + delay,
+                     quantity=rng.randint(1, 1000),
+                     price_per_share=price_per_share,
+                     buy_sell_indicator=rng.choice(list(BuySellIndicator)))
+
+    def run_scenario(self, seed, stock):
+        rng = random.Random(seed)
+        recorded_trades = []
+        current_time = datetime(1929, 10, 24, 9, 30)
+
+        for _ in range(self.steps):
+            if rng.random() < 0.5:
+                trade = self.random_trade(rng, stock, current_time)
+                stock.record_trade(trade)
+                recorded_trades.append(trade)
+            elif rng.random() < 0.2:
+                trades = [self.random_trade(rng, stock, current_time)
+                          for _ in range(rng.randint(0, 10))]
+                stock.record_trades(trades)
+                recorded_trades.extend(trades)
+            else:
+                if rng.random() < 0.1:
+                    current_time -= timedelta(seconds=rng.randint(0, 3600))
+                else:
+                    current_time += timedelta(seconds=rng.randint(0, 300))
+
+                self.assertEqual(stock.price(current_time),
+                                 self.scan_price(recorded_trades, current_time, stock))
+
+                expected_sides = self.scan_side_analytics(recorded_trades,
+                                                          current_time,
+                                                          stock)
+                analytics = stock.side_analytics(current_time)
+                buy_volume, buy_vwap = expected_sides[BuySellIndicator.BUY]
+                sell_volume, sell_vwap = expected_sides[BuySellIndicator.SELL]
+                self.assertEqual((analytics.buy_volume, analytics.sell_volume),
+                                 (buy_volume, sell_volume))
+                self.assertEqual((analytics.buy_vwap, analytics.sell_vwap),
+                                 (buy_vwap, sell_vwap))
+                if buy_volume + sell_volume == 0:
+                    self.assertIsNone(analytics.order_flow_imbalance)
+                else:
+                    self.assertAlmostEqual(analytics.order_flow_imbalance,
+                                           (buy_volume - sell_volume) /
+                                           (buy_volume + sell_volume))
+                self.assertEqual(stock.snapshot().side_analytics(current_time)[:2],
+                                 (buy_volume, sell_volume))
+
+    def test_matches_full_scan(self):
+        for seed in range(self.scenarios):
+            with self.subTest(seed=seed):
+                self.run_scenario(seed, StockFactory.get_stock())
+
+    def test_matches_full_scan_in_fixed_point_mode(self):
+        for seed in range(self.scenarios):
+            with self.subTest(seed=seed):
+                self.run_scenario(seed, FixedPointCommonStock(TickerSymbol.TEA, 100.0, 0.0))
+
+
+class StockPriceSeriesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stock = StockFactory.get_stock()
+        self.trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+        for trade in reversed(self.trades):
+            self.stock.record_trade(trade)
+
+    def test_matches_price(self):
+        first_timestamp = min(trade.timestamp for trade in self.trades)
+        times = [first_timestamp + timedelta(minutes=m) for m in range(-5, 70, 3)]
+        expected_value = [self.stock.price(current_time) for current_time in times]
+        series = self.stock.price_series(times)
+        for stock_price, expected_price in zip(series, expected_value):
+            if expected_price is None:
+                self.assertIsNone(stock_price)
+            else:
+                self.assertAlmostEqual(stock_price, expected_price)
+
+    def test_empty_times(self):
+        self.assertEqual(self.stock.price_series([]), [])
+
+
 class CommonStockDividendTestCase(unittest.TestCase):
 
     def setUp(self):
@@ -0,0 +1,210 @@
+import asyncio
+import threading
+import unittest
+from datetime import timedelta
+
+from super_simple_stocks import (GlobalBeverageCorporationExchange,
+                                 SimulatedClock,
+                                 TickerSymbol,
+                                 TradeClock,
+                                 WALL_CLOCK)
+from .factories import START, StockFactory, TradeFactory
+
+
+trade = TradeFactory.get_buy_trade
+
+
+class SubscriptionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = SimulatedClock(START)
+        self.gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks(),
+                                                      clock=self.clock)
+
+    def test_first_update_holds_current_values(self):
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START))
+        with self.gbce.subscribe() as subscription:
+            update = subscription.get(timeout=0)
+            self.assertEqual(update.time, START)
+            self.assertEqual(set(update.prices), set(TickerSymbol))
+            self.assertEqual(update.prices[TickerSymbol.TEA], 100.0)
+            self.assertIsNone(update.prices[TickerSymbol.POP])
+            self.assertEqual(update.ticker_prices[TickerSymbol.TEA], 100.0)
+            self.assertIsNone(update.ticker_prices[TickerSymbol.POP])
+            self.assertIsNone(update.all_share_index)
+            self.assertIsNone(subscription.get(timeout=0))
+
+    def test_only_changes_are_pushed(self):
+        subscription = self.gbce.subscribe()
+        subscription.get(timeout=0)
+
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START))
+        update = subscription.get(timeout=0)
+        self.assertEqual(update.prices, {TickerSymbol.TEA: 100.0})
+        self.assertEqual(update.ticker_prices, {TickerSymbol.TEA: 100.0})
+
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START, quantity=5))
+        self.assertIsNone(subscription.get(timeout=0))
+
+        for ticker_symbol in TickerSymbol:
+            self.gbce.record_trade(trade(ticker_symbol, START, 25.0))
+        subscription.get(timeout=0)
+        self.gbce.record_trade(trade(TickerSymbol.POP, START, 75.0, 20))
+        update = subscription.get(timeout=0)
+        self.assertEqual(set(update.prices), {TickerSymbol.POP})
+        self.assertAlmostEqual(update.prices[TickerSymbol.POP], 1750.0 / 30)
+        self.assertEqual(update.ticker_prices, {TickerSymbol.POP: 75.0})
+        self.assertAlmostEqual(update.all_share_index, self.gbce.all_share_index(START))
+
+    def test_window_expiry(self):
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START))
+        subscription = self.gbce.subscribe()
+        subscription.get(timeout=0)
+
+        self.clock.advance(timedelta(minutes=10))
+        self.assertIsNone(subscription.get(timeout=0))
+
+        self.clock.advance(timedelta(minutes=10))
+        update = subscription.get(timeout=0)
+        self.assertEqual(update.time, START + timedelta(minutes=20))
+        self.assertEqual(update.prices, {TickerSymbol.TEA: None})
+        self.assertEqual(update.ticker_prices, {})
+
+    def test_coalescing(self):
+        subscription = self.gbce.subscribe()
+        subscription.get(timeout=0)
+        for i in range(100):
+            self.gbce.record_trade(trade(TickerSymbol.TEA, START, 1.0 + i, 1))
+            self.gbce.record_trade(trade(TickerSymbol.GIN, START, 1.0 + i, 1))
+
+        update = subscription.get(timeout=0)
+        self.assertEqual(update.prices, {TickerSymbol.TEA: 50.5, TickerSymbol.GIN: 50.5})
+        self.assertEqual(update.ticker_prices, {TickerSymbol.TEA: 100.0,
+                                                TickerSymbol.GIN: 100.0})
+        self.assertEqual(subscription.coalesced, 199)
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_ticker_symbols(self):
+        subscription = self.gbce.subscribe(ticker_symbols=[TickerSymbol.GIN])
+        self.assertEqual(set(subscription.get(timeout=0).prices), {TickerSymbol.GIN})
+
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START))
+        self.assertIsNone(subscription.get(timeout=0))
+        self.gbce.record_trade(trade(TickerSymbol.GIN, START))
+        self.assertEqual(subscription.get(timeout=0).prices, {TickerSymbol.GIN: 100.0})
+
+    def test_close(self):
+        subscription = self.gbce.subscribe()
+        subscription.close()
+        self.assertEqual(self.gbce._publisher.subscriptions, [])
+        self.gbce.record_trade(trade(TickerSymbol.TEA, START))
+        self.assertIsNone(subscription.get(timeout=0))
+        self.assertEqual(list(subscription), [])
+
+    def test_clock_is_observed_while_subscribed(self):
+        observers = len(self.clock._observers)
+        subscriptions = [self.gbce.subscribe(), self.gbce.subscribe()]
+        self.assertEqual(len(self.clock._observers), observers + 1)
+        for subscription in subscriptions:
+            subscription.close()
+        self.assertEqual(len(self.clock._observers), observers)
+
+        observers = len(WALL_CLOCK._observers)
+        for _ in range(3):
+            GlobalBeverageCorporationExchange(StockFactory.get_stocks()).subscribe().close()
+        self.assertEqual(len(WALL_CLOCK._observers), observers)
+
+    def test_listing_changes(self):
+        stocks = StockFactory.get_stocks()
+        gbce = GlobalBeverageCorporationExchange(stocks[1:], clock=self.clock)
+        subscription = gbce.subscribe()
+        subscription.get(timeout=0)
+
+        gbce.add_stock(stocks[0])
+        stocks[0].record_trade(trade(stocks[0].ticker_symbol, START))
+        self.assertEqual(subscription.get(timeout=0).prices,
+                         {stocks[0].ticker_symbol: 100.0})
+
+        gbce.delist_stock(stocks[0].ticker_symbol)
+        stocks[0].record_trade(trade(stocks[0].ticker_symbol, START, 50.0))
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_trade_clock(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks(),
+                                                 clock=TradeClock())
+        subscription = gbce.subscribe()
+        self.assertIsNone(subscription.get(timeout=0))
+
+        gbce.record_trade(trade(TickerSymbol.TEA, START))
+        update = subscription.get(timeout=0)
+        self.assertEqual(update.time, START)
+        self.assertEqual(update.prices[TickerSymbol.TEA], 100.0)
+
+        gbce.record_trade(trade(TickerSymbol.POP, START + timedelta(minutes=20)))
+        update = subscription.get(timeout=0)
+        self.assertEqual(update.prices, {TickerSymbol.TEA: None, TickerSymbol.POP: 100.0})
+
+    def test_callback(self):
+        updates = []
+        received = threading.Event()
+
+        def callback(update):
+            updates.append(update)
+            if update.prices.get(TickerSymbol.ALE) is not None:
+                received.set()
+
+        subscription = self.gbce.subscribe(callback, ticker_symbols=[TickerSymbol.ALE])
+        self.gbce.record_trade(trade(TickerSymbol.ALE, START))
+        self.assertTrue(received.wait(timeout=5))
+        subscription.close()
+        self.assertEqual(updates[-1].prices[TickerSymbol.ALE], 100.0)
+
+    def test_async_iteration(self):
+        async def consume():
+            subscription = self.gbce.subscribe(ticker_symbols=[TickerSymbol.JOE])
+            await asyncio.wait_for(subscription.__anext__(), timeout=5)
+
+            loop = asyncio.get_running_loop()
+            loop.call_soon(lambda: threading.Thread(
+                target=self.gbce.record_trade,
+                args=(trade(TickerSymbol.JOE, START),)).start())
+            update = await asyncio.wait_for(subscription.__anext__(), timeout=5)
+
+            loop.call_soon(subscription.close)
+            remaining = [update async for update in subscription]
+            return update, remaining
+
+        update, remaining = asyncio.run(consume())
+        self.assertEqual(update.prices, {TickerSymbol.JOE: 100.0})
+        self.assertEqual(remaining, [])
+
+    def test_cancelled_async_iteration(self):
+        subscription = self.gbce.subscribe(ticker_symbols=[TickerSymbol.JOE])
+
+        async def consume():
+            await subscription.__anext__()
+            task = asyncio.ensure_future(subscription.__anext__())
+            await asyncio.sleep(0)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(consume())
+        self.assertEqual(subscription._waiters, [])
+        self.gbce.record_trade(trade(TickerSymbol.JOE, START))
+        self.assertEqual(subscription.get(timeout=5).prices, {TickerSymbol.JOE: 100.0})
+
+    def test_waiter_of_a_closed_loop(self):
+        subscription = self.gbce.subscribe(ticker_symbols=[TickerSymbol.JOE])
+        subscription.get(timeout=5)
+        loop = asyncio.new_event_loop()
+        subscription._waiters.append((loop, loop.create_future()))
+        loop.close()
+
+        self.gbce.record_trade(trade(TickerSymbol.JOE, START))
+        self.assertEqual(subscription._waiters, [])
+        self.assertEqual(subscription.get(timeout=5).prices, {TickerSymbol.JOE: 100.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
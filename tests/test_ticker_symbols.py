@@ -0,0 +1,107 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from super_simple_stocks import (DynamicTickerSymbol,
+                                 GlobalBeverageCorporationExchange,
+                                 TICKER_SYMBOLS,
+                                 TickerSymbol,
+                                 TradeLogWriter,
+                                 intern_ticker_symbol,
+                                 read_trade_log)
+from super_simple_stocks_sharding import ShardedGlobalBeverageCorporationExchange
+from .factories import StockFactory, TradeFactory
+
+
+class TickerSymbolRegistryTestCase(unittest.TestCase):
+
+    def test_enum_members_come_first(self):
+        for ticker_symbol in TickerSymbol:
+            self.assertIs(TICKER_SYMBOLS[ticker_symbol.id], ticker_symbol)
+            self.assertIs(intern_ticker_symbol(ticker_symbol.name), ticker_symbol)
+
+    def test_intern(self):
+        ticker_symbol = intern_ticker_symbol('REGISTRY_A')
+        self.assertIsInstance(ticker_symbol, DynamicTickerSymbol)
+        self.assertIs(intern_ticker_symbol('REGISTRY_A'), ticker_symbol)
+        self.assertIs(TICKER_SYMBOLS[ticker_symbol.id], ticker_symbol)
+        self.assertIs(TICKER_SYMBOLS.get('REGISTRY_A'), ticker_symbol)
+        self.assertIs(pickle.loads(pickle.dumps(ticker_symbol)), ticker_symbol)
+
+    def test_ids_are_dense(self):
+        first = intern_ticker_symbol('REGISTRY_B')
+        second = intern_ticker_symbol('REGISTRY_C')
+        self.assertEqual(second.id, first.id + 1)
+        self.assertEqual(len(TICKER_SYMBOLS), second.id + 1)
+
+    def test_unknown_name(self):
+        self.assertIsNone(TICKER_SYMBOLS.get('REGISTRY_UNKNOWN'))
+        with self.assertRaises(ValueError):
+            intern_ticker_symbol('')
+        with self.assertRaises(IndexError):
+            TICKER_SYMBOLS[len(TICKER_SYMBOLS)]
+
+
+class DynamicTickerSymbolExchangeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.stocks = StockFactory.get_interned_stocks(['DYN{}'.format(i)
+                                                        for i in range(50)])
+        self.ticker_symbols = [stock.ticker_symbol for stock in self.stocks]
+        self.gbce = GlobalBeverageCorporationExchange(self.stocks)
+        self.trades = TradeFactory.get_sequential_trades(self.ticker_symbols, 500)
+
+    def test_trades_are_routed(self):
+        self.gbce.record_trades(self.trades[:250])
+        for trade in self.trades[250:]:
+            self.gbce.record_trade(trade)
+        for stock in self.stocks:
+            self.assertEqual(list(stock.trades),
+                             [trade for trade in self.trades
+                              if trade.ticker_symbol is stock.ticker_symbol])
+
+    def test_get_stock_by_id(self):
+        for stock in self.stocks:
+            self.assertIs(self.gbce.get_stock_by_id(stock.ticker_symbol.id), stock)
+        self.gbce.delist_stock(self.ticker_symbols[0])
+        with self.assertRaises(ValueError):
+            self.gbce.get_stock_by_id(self.ticker_symbols[0].id)
+        with self.assertRaises(ValueError):
+            self.gbce.get_stock_by_id(len(TICKER_SYMBOLS))
+
+    def test_trade_log(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'trades.log')
+            with TradeLogWriter(path) as log:
+                log.write([TickerSymbol.TEA, self.ticker_symbols[0]], [1, 2], [10, 20],
+                          [1.5, 2.5], [1, 2])
+            with TradeLogWriter(path) as log:
+                log.write([self.ticker_symbols[1]], [3], [30], [3.5], [1])
+
+            self.assertEqual(read_trade_log(path),
+                             ([TickerSymbol.TEA] + self.ticker_symbols[:2],
+                              [1, 2, 3], [10, 20, 30], [1.5, 2.5, 3.5], [1, 2, 1]))
+
+            self.gbce.open_trade_log(path)
+            self.gbce.record_trades(self.trades)
+            self.gbce.close_trade_log()
+            self.assertEqual(read_trade_log(path)[0][3:],
+                             [trade.ticker_symbol for trade in self.trades])
+
+    def test_long_name_can_not_be_logged(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with TradeLogWriter(os.path.join(directory, 'trades.log')) as log:
+                with self.assertRaises(ValueError):
+                    log.write([intern_ticker_symbol('X' * 22)], [1], [1], [1.0], [1])
+
+    def test_sharded_exchange(self):
+        self.gbce.record_trades(self.trades)
+        stocks = StockFactory.get_interned_stocks(['DYN{}'.format(i) for i in range(50)])
+        with ShardedGlobalBeverageCorporationExchange(stocks, shards=3) as sharded_gbce:
+            sharded_gbce.record_trades(self.trades)
+            current_time = self.trades[-1].timestamp
+            self.assertAlmostEqual(sharded_gbce.all_share_index(current_time),
+                                   self.gbce.all_share_index(current_time))
+            self.assertEqual(sharded_gbce.ticker_price(self.ticker_symbols[7]),
+                             self.stocks[7].ticker_price)
@@ -1,6 +1,10 @@
 import unittest
 
-from super_simple_stocks import Trade
+from super_simple_stocks import (Trade,
+                                 TradeRecord,
+                                 to_epoch_ns,
+                                 to_ticks,
+                                 validate_trade_records)
 from .factories import TradeFactory
 
 
@@ -17,6 +21,14 @@ class TradeInitTestCase(unittest.TestCase):
                               price_per_share=self.trade.price_per_share,
                               buy_sell_indicator=self.trade.buy_sell_indicator)
 
+    def test_raises_value_error_on_non_integral_qty(self):
+        with self.assertRaises(ValueError):
+            Trade(ticker_symbol=self.trade.ticker_symbol,
+                  timestamp=self.trade.timestamp,
+                  quantity=1.5,
+                  price_per_share=self.trade.price_per_share,
+                  buy_sell_indicator=self.trade.buy_sell_indicator)
+
     def test_raises_value_error_on_negative_price_per_share(self):
         with self.assertRaises(ValueError):
             bad_trade = Trade(ticker_symbol=self.trade.ticker_symbol,
@@ -25,6 +37,14 @@ class TradeInitTestCase(unittest.TestCase):
                               price_per_share=-25.0,
                               buy_sell_indicator=self.trade.buy_sell_indicator)
 
+    def test_raises_value_error_on_nan_price_per_share(self):
+        with self.assertRaises(ValueError):
+            Trade(ticker_symbol=self.trade.ticker_symbol,
+                  timestamp=self.trade.timestamp,
+                  quantity=self.trade.quantity,
+                  price_per_share=float('nan'),
+                  buy_sell_indicator=self.trade.buy_sell_indicator)
+
 
 class TradeTotalPriceTestCase(unittest.TestCase):
 
@@ -33,3 +53,66 @@ class TradeTotalPriceTestCase(unittest.TestCase):
         trade = TradeFactory.get_trade()
         expected_value = trade.quantity * trade.price_per_share
         self.assertEqual(trade.total_price, expected_value)
+
+
+class TradeSlotsTestCase(unittest.TestCase):
+
+    def test_has_no_instance_dict(self):
+        trade = TradeFactory.get_trade()
+        self.assertFalse(hasattr(trade, '__dict__'))
+
+
+class TradeEqualityTestCase(unittest.TestCase):
+
+    def test_equal_values_are_equal(self):
+        self.assertEqual(TradeFactory.get_trade(), TradeFactory.get_trade())
+        self.assertEqual(hash(TradeFactory.get_trade()), hash(TradeFactory.get_trade()))
+
+    def test_different_values_are_not_equal(self):
+        trades = TradeFactory.get_trades(1)
+        self.assertNotEqual(trades[0], trades[1])
+
+
+class TradeUncheckedTestCase(unittest.TestCase):
+
+    def test_unchecked_equals_checked(self):
+        for trade in TradeFactory.get_trades():
+            self.assertEqual(Trade.unchecked(*trade._key()), trade)
+
+    def test_unchecked_skips_checks(self):
+        trade = TradeFactory.get_trade()
+        self.assertEqual(Trade.unchecked(trade.ticker_symbol,
+                                         trade.timestamp,
+                                         0,
+                                         trade.price_per_share,
+                                         trade.buy_sell_indicator).quantity, 0)
+
+    def test_from_record(self):
+        for trade in TradeFactory.get_trades():
+            record = TradeRecord(trade.ticker_symbol.id,
+                                 to_epoch_ns(trade.timestamp),
+                                 trade.quantity,
+                                 to_ticks(trade.price_per_share, 10000),
+                                 trade.buy_sell_indicator.value)
+            self.assertEqual(Trade.from_record(record, 10000), trade)
+
+
+class ValidateTradeRecordsTestCase(unittest.TestCase):
+
+    def test_valid_records(self):
+        validate_trade_records([])
+        validate_trade_records([TradeRecord(0, 0, 1, 0, 1), TradeRecord(4, 1, 2, 3, 2)])
+
+    def test_invalid_records(self):
+        record = TradeRecord(0, 0, 1, 100, 1)
+        for bad_record in (record._replace(ticker_id=-1),
+                           record._replace(ticker_id=10**9),
+                           record._replace(quantity=0),
+                           record._replace(quantity=float('nan')),
+                           record._replace(quantity=1.5),
+                           record._replace(price=-1),
+                           record._replace(price=float('nan')),
+                           record._replace(side=0)):
+            with self.subTest(record=bad_record):
+                with self.assertRaises(ValueError):
+                    validate_trade_records([record, bad_record])
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+
+from super_simple_stocks import (GlobalBeverageCorporationExchange,
+                                 TickerSymbol,
+                                 TradeLogWriter,
+                                 read_trade_log,
+                                 to_epoch_ns)
+from .factories import StockFactory, TradeFactory
+
+
+class TradeLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'trades.log')
+        self.trades = TradeFactory.get_trades()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def assert_same_trades(self, gbce, other_gbce):
+        for stock in gbce.stocks:
+            other_stock = other_gbce.get_stock(stock.ticker_symbol)
+            self.assertEqual(list(stock.trades), list(other_stock.trades))
+
+    def test_replay_restores_recorded_trades(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        gbce.open_trade_log(self.path)
+        gbce.record_trade(self.trades[0])
+        gbce.record_trades(self.trades[1:5])
+        gbce.ingest(*zip(*((trade.ticker_symbol,
+                            to_epoch_ns(trade.timestamp),
+                            trade.quantity,
+                            trade.price_per_share,
+                            trade.buy_sell_indicator) for trade in self.trades[5:])))
+        gbce.close_trade_log()
+
+        restored_gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        restored_gbce.replay_trade_log(self.path)
+        self.assert_same_trades(gbce, restored_gbce)
+
+    def test_replay_is_not_logged_again(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        gbce.open_trade_log(self.path)
+        gbce.record_trades(self.trades)
+        gbce.replay_trade_log(self.path)
+        gbce.close_trade_log()
+        self.assertEqual(len(read_trade_log(self.path)[0]), len(self.trades))
+
+    def test_reopened_log_is_appended_to(self):
+        gbce = GlobalBeverageCorporationExchange(StockFactory.get_stocks())
+        gbce.open_trade_log(self.path)
+        gbce.record_trades(self.trades[:3])
+        gbce.open_trade_log(self.path)
+        gbce.record_trades(self.trades[3:])
+        gbce.close_trade_log()
+
+        ticker_symbols = read_trade_log(self.path)[0]
+        self.assertEqual(ticker_symbols, [trade.ticker_symbol for trade in self.trades])
+
+    def test_incomplete_record_is_ignored(self):
+        with TradeLogWriter(self.path) as log:
+            log.write([TickerSymbol.TEA] * 2, [1, 2], [10, 20], [1.5, 2.5], [1, 2])
+        with open(self.path, 'ab') as log:
+            log.write(b'\x01\x00')
+
+        columns = read_trade_log(self.path)
+        self.assertEqual(columns, ([TickerSymbol.TEA] * 2, [1, 2], [10, 20],
+                                   [1.5, 2.5], [1, 2]))
+
+    def test_empty_log(self):
+        TradeLogWriter(self.path).close()
+        self.assertEqual(read_trade_log(self.path), ([], [], [], [], []))
+
+    def test_other_file_raises_value_error(self):
+        with open(self.path, 'wb') as other_file:
+            other_file.write(b'1929-10-24T09:30:01,TEA,500,80.0,BUY\n')
+        with self.assertRaises(ValueError):
+            read_trade_log(self.path)
+        with self.assertRaises(ValueError):
+            TradeLogWriter(self.path)
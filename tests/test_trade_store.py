@@ -0,0 +1,179 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from super_simple_stocks import (TickerSymbol,
+                                 Trade,
+                                 TradeStore,
+                                 to_epoch_ns,
+                                 from_epoch_ns)
+from .factories import TradeFactory
+
+
+class EpochNsTestCase(unittest.TestCase):
+
+    def test_round_trip(self):
+        timestamp = datetime(1929, 10, 24, 9, 30, 1, 250)
+        self.assertEqual(from_epoch_ns(to_epoch_ns(timestamp)), timestamp)
+
+    def test_epoch_is_zero(self):
+        self.assertEqual(to_epoch_ns(datetime(1970, 1, 1)), 0)
+
+    def test_aware_timestamp_is_converted_to_utc(self):
+        timestamp = datetime(1970, 1, 1, 1, tzinfo=timezone(timedelta(hours=1)))
+        self.assertEqual(to_epoch_ns(timestamp), 0)
+
+
+class TradeStoreAddTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = TradeStore(TickerSymbol.TEA)
+
+    def test_trade_is_added(self):
+        trade = TradeFactory.get_trade()
+        self.store.add(trade)
+        self.assertIn(trade, self.store)
+        self.assertEqual(len(self.store), 1)
+
+    def test_stored_trade_is_equal_to_added_one(self):
+        trade = TradeFactory.get_trade()
+        self.store.add(trade)
+        self.assertEqual(self.store[0], trade)
+        self.assertEqual(self.store[-1], trade)
+
+    def test_out_of_order_trades_are_sorted(self):
+        trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+        for trade in reversed(trades):
+            self.store.add(trade)
+
+        expected_timestamps = sorted(trade.timestamp for trade in trades)
+        self.assertEqual([trade.timestamp for trade in self.store],
+                         expected_timestamps)
+
+    def test_equal_timestamps_keep_insertion_order(self):
+        trade = TradeFactory.get_trade()
+        later_trade = Trade(ticker_symbol=trade.ticker_symbol,
+                            timestamp=trade.timestamp,
+                            quantity=trade.quantity + 1,
+                            price_per_share=trade.price_per_share,
+                            buy_sell_indicator=trade.buy_sell_indicator)
+        self.store.add(trade)
+        self.store.add(later_trade)
+        self.assertEqual(self.store[0], trade)
+        self.assertEqual(self.store[1], later_trade)
+
+    def test_index_out_of_range(self):
+        with self.assertRaises(IndexError):
+            trade = self.store[0]
+
+
+class TradeStoreSinceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+        self.store = TradeStore(TickerSymbol.TEA)
+        for trade in self.trades:
+            self.store.add(trade)
+
+    def test_since_returns_trades_from_timestamp_on(self):
+        timestamp = self.trades[2].timestamp
+        expected_value = sorted((trade for trade in self.trades
+                                 if trade.timestamp >= timestamp),
+                                key=lambda t: t.timestamp)
+        self.assertEqual(self.store.since(timestamp), expected_value)
+
+    def test_since_after_last_trade_is_empty(self):
+        last_timestamp = max(trade.timestamp for trade in self.trades)
+        self.assertEqual(self.store.since(last_timestamp + timedelta(seconds=1)), [])
+
+    def test_trade_that_does_not_fit_is_not_added(self):
+        trades = sorted(self.trades, key=lambda trade: trade.timestamp)
+        for timestamp in (trades[0].timestamp, trades[-1].timestamp):
+            bad_trade = Trade.unchecked(TickerSymbol.TEA, timestamp, 1.5, 10.0,
+                                        trades[0].buy_sell_indicator)
+            with self.subTest(timestamp=timestamp):
+                with self.assertRaises(TypeError):
+                    self.store.add(bad_trade)
+                self.assertEqual(list(self.store), trades)
+                self.assertEqual(len(self.store.prices), len(trades))
+
+
+class TradeStoreExtendTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+        self.store = TradeStore(TickerSymbol.TEA)
+
+    @staticmethod
+    def columns(trades):
+        return ([to_epoch_ns(trade.timestamp) for trade in trades],
+                [trade.quantity for trade in trades],
+                [trade.price_per_share for trade in trades],
+                [trade.buy_sell_indicator.value for trade in trades])
+
+    def test_in_order_batch_is_appended(self):
+        self.store.extend(*self.columns(self.trades[:2]))
+        self.store.extend(*self.columns(self.trades[2:]))
+        self.assertEqual(list(self.store), self.trades)
+
+    def test_out_of_order_batch_is_merged(self):
+        for trade in self.trades[::2]:
+            self.store.add(trade)
+        self.store.extend(*self.columns(list(reversed(self.trades[1::2]))))
+        self.assertEqual(list(self.store), self.trades)
+
+    def test_equal_timestamps_keep_insertion_order(self):
+        trade = self.trades[-1]
+        same_time_trade = Trade(ticker_symbol=trade.ticker_symbol,
+                                timestamp=trade.timestamp,
+                                quantity=trade.quantity + 1,
+                                price_per_share=trade.price_per_share,
+                                buy_sell_indicator=trade.buy_sell_indicator)
+        self.store.add(trade)
+        self.store.extend(*self.columns([same_time_trade, self.trades[0]]))
+        self.assertEqual(list(self.store), [self.trades[0], trade, same_time_trade])
+
+    def test_batch_that_does_not_fit_is_not_added(self):
+        self.store.extend(*self.columns(self.trades[1:]))
+        for batch in (self.trades[:1], self.trades[-1:]):
+            timestamps, quantities, prices, sides = self.columns(batch)
+            with self.subTest(batch=batch):
+                with self.assertRaises(TypeError):
+                    self.store.extend(timestamps, [1.5], prices, sides)
+                self.assertEqual(list(self.store), self.trades[1:])
+
+
+class TradeStoreFreezeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trades = TradeFactory.get_trades_for_stock(TickerSymbol.TEA)
+        self.store = TradeStore(TickerSymbol.TEA)
+
+    def test_view_holds_stored_trades(self):
+        for trade in self.trades:
+            self.store.add(trade)
+        view = self.store.freeze()
+        self.assertEqual(list(view), self.trades)
+        self.assertEqual(view.timestamps, self.store.timestamps)
+        self.assertEqual(view.index_since(self.trades[1].timestamp), 1)
+
+    def test_appended_trades_are_shared(self):
+        self.store.add(self.trades[0])
+        view = self.store.freeze()
+        for trade in self.trades[1:]:
+            self.store.add(trade)
+        new_view = self.store.freeze()
+        self.assertIs(new_view._columns, view._columns)
+        self.assertEqual(list(view), self.trades[:1])
+        self.assertEqual(list(new_view), self.trades)
+
+    def test_view_is_unchanged_by_inserted_and_removed_trades(self):
+        for trade in self.trades[1:]:
+            self.store.add(trade)
+        view = self.store.freeze()
+        self.store.add(self.trades[0])
+        self.assertEqual(list(view), self.trades[1:])
+        self.assertEqual(list(self.store.freeze()), self.trades)
+
+        self.store.remove_oldest(2)
+        self.assertEqual(list(view), self.trades[1:])
+        self.assertEqual(list(self.store.freeze()), self.trades[2:])